@@ -1,5 +1,13 @@
+import uuid
+
 import pytest
-from rest_framework.status import HTTP_403_FORBIDDEN
+from django.urls import reverse
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_403_FORBIDDEN,
+)
 from rest_framework.test import APIClient
 from core.models import (
     ComplianceAssessment,
@@ -10,7 +18,7 @@ from core.models import (
 from core.models import Project, AppliedControl
 from iam.models import Folder
 
-from test_utils import EndpointTestsQueries
+from test_utils import EndpointTestsQueries, EndpointTestsUtils
 
 # Generic requirement assessment data for tests
 REQUIREMENT_ASSESSMENT_STATUS = "to_do"
@@ -225,3 +233,102 @@ class TestRequirementAssessmentsAuthenticated:
             RequirementAssessment.Status.choices,
             user_group=test.user_group,
         )
+
+
+@pytest.mark.django_db
+class TestRequirementAssessmentsBatchUpdate:
+    """Perform tests on the batch update of Requirement Assessments API endpoint"""
+
+    def create_requirement_assessments(self, authenticated_client, folder):
+        EndpointTestsQueries.Auth.import_object(authenticated_client, "Framework")
+        compliance_assessment = ComplianceAssessment.objects.create(
+            name="test",
+            project=Project.objects.create(name="test", folder=folder),
+            framework=Framework.objects.all()[0],
+        )
+        compliance_assessment.create_requirement_assessments()
+        return list(
+            compliance_assessment.requirement_assessments.order_by("created_at")[:2]
+        )
+
+    def test_batch_update_with_errors(self, authenticated_client):
+        """test that the valid entries of a batch are saved and the invalid ones reported"""
+
+        folder = Folder.objects.create(name="test")
+        requirement_assessments = self.create_requirement_assessments(
+            authenticated_client, folder
+        )
+        applied_control = AppliedControl.objects.create(name="test", folder=folder)
+        unknown_id = str(uuid.uuid4())
+
+        response = authenticated_client.patch(
+            reverse("requirement-assessments-batch-update"),
+            [
+                {
+                    "id": str(requirement_assessments[0].id),
+                    "result": "compliant",
+                    "observation": REQUIREMENT_ASSESSMENT_OBSERVATION,
+                    "applied_controls": [str(applied_control.id)],
+                },
+                {"id": str(requirement_assessments[1].id), "result": "unknown"},
+                {"id": unknown_id, "status": REQUIREMENT_ASSESSMENT_STATUS2},
+            ],
+            format="json",
+        )
+
+        assert response.status_code == HTTP_200_OK, response.json()
+        assert response.json()["results"] == [str(requirement_assessments[0].id)]
+        assert [
+            (error["index"], error["id"], list(error["errors"]))
+            for error in response.json()["errors"]
+        ] == [
+            (1, str(requirement_assessments[1].id), ["result"]),
+            (2, unknown_id, ["id"]),
+        ]
+        requirement_assessments[0].refresh_from_db()
+        assert requirement_assessments[0].result == "compliant"
+        assert (
+            requirement_assessments[0].observation == REQUIREMENT_ASSESSMENT_OBSERVATION
+        )
+        assert list(requirement_assessments[0].applied_controls.all()) == [
+            applied_control
+        ]
+        requirement_assessments[1].refresh_from_db()
+        assert requirement_assessments[1].result != "unknown"
+
+    def test_batch_update_unauthorized(self, authenticated_client):
+        """test that a batch is rejected for requirement assessments the user cannot change"""
+
+        client, folder, _ = EndpointTestsUtils.get_test_client_and_folder(
+            authenticated_client, "BI-UG-AUD", "test"
+        )
+        requirement_assessments = self.create_requirement_assessments(
+            authenticated_client, folder
+        )
+
+        response = client.patch(
+            reverse("requirement-assessments-batch-update"),
+            [
+                {"id": str(requirement_assessment.id), "result": "compliant"}
+                for requirement_assessment in requirement_assessments
+            ],
+            format="json",
+        )
+
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert response.json()["results"] == []
+        assert [error["errors"] for error in response.json()["errors"]] == [
+            {"id": "Requirement assessment not found"}
+        ] * len(requirement_assessments)
+        for requirement_assessment in requirement_assessments:
+            requirement_assessment.refresh_from_db()
+            assert requirement_assessment.result != "compliant"
+
+    def test_batch_update_unauthenticated(self):
+        """test that a batch cannot be sent without authentication"""
+
+        response = APIClient().patch(
+            reverse("requirement-assessments-batch-update"), [], format="json"
+        )
+
+        assert response.status_code == HTTP_401_UNAUTHORIZED
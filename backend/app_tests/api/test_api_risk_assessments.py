@@ -1,6 +1,10 @@
+import json
+
 import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
 from rest_framework.test import APIClient
-from core.models import Project, RiskAssessment, RiskMatrix
+from core.models import Project, RiskAssessment, RiskMatrix, RiskScenario
 from iam.models import Folder
 
 from test_utils import EndpointTestsQueries
@@ -237,3 +241,58 @@ class TestRiskAssessmentAuthenticated:
     #     """test to get risk assessments status choices from the API with authentication"""
 
     #     EndpointTestsQueries.get_object_options_auth(test.client, "Risk Assessment", "lc_status", Project.PRJ_LC_STATUS)
+
+
+@pytest.mark.django_db
+class TestRiskAssessmentQuantification:
+    """Perform tests on the quantification of Risk Assessments API endpoint"""
+
+    def create_risk_assessment(self, authenticated_client):
+        EndpointTestsQueries.Auth.import_object(authenticated_client, "Risk matrix")
+        risk_assessment = RiskAssessment.objects.create(
+            name=RISK_ASSESSMENT_NAME,
+            project=Project.objects.create(
+                name="test", folder=Folder.objects.create(name="test")
+            ),
+            risk_matrix=RiskMatrix.objects.all()[0],
+        )
+        RiskScenario.objects.create(
+            name="test",
+            risk_assessment=risk_assessment,
+            current_proba=1,
+            current_impact=1,
+        )
+        return risk_assessment
+
+    def test_quantification(self, authenticated_client):
+        """test that the simulated and requested iterations are both reported"""
+
+        risk_assessment = self.create_risk_assessment(authenticated_client)
+
+        response = authenticated_client.get(
+            reverse("risk-assessments-quantification", args=[risk_assessment.id]),
+            {"iterations": 1000, "seed": 42},
+        )
+
+        assert response.status_code == HTTP_200_OK, response.json()
+        assert response.json()["iterations"] == 1000
+        assert response.json()["requested_iterations"] == 1000
+        assert response.json()["capped"] is False
+        assert response.json()["seed"] == 42
+
+    def test_quantification_with_invalid_magnitudes(self, authenticated_client):
+        """test that a risk matrix with an invalid magnitude is reported as a bad request"""
+
+        risk_assessment = self.create_risk_assessment(authenticated_client)
+        risk_matrix = risk_assessment.risk_matrix
+        definition = json.loads(risk_matrix.json_definition)
+        definition["impact"][1]["magnitude"] = {"low": 0, "high": 1000}
+        risk_matrix.json_definition = json.dumps(definition)
+        risk_matrix.save()
+
+        response = authenticated_client.get(
+            reverse("risk-assessments-quantification", args=[risk_assessment.id])
+        )
+
+        assert response.status_code == HTTP_400_BAD_REQUEST
+        assert "impact level 1" in response.json()["error"]
@@ -73,7 +73,12 @@ class AbstractBaseModel(models.Model):
             return self.__class__.objects.filter(risk_assessment=self.risk_assessment)
         if hasattr(self, "project") and self.project is not None:
             return self.__class__.objects.filter(project=self.project)
-        if hasattr(self, "folder") and self.folder is not None:
+        if (
+            hasattr(self, "folder")
+            and self.folder is not None
+            # a denormalized folder (see FolderPathMixin) does not define a scope
+            and self._meta.get_field("folder").editable
+        ):
             return self.__class__.objects.filter(folder=self.folder)
         if hasattr(self, "parent_folder") and self.parent_folder is not None:
             return self.__class__.objects.filter(parent_folder=self.parent_folder)
@@ -1,17 +1,24 @@
+import copy
 import json
+import uuid
+from collections import defaultdict
 from collections.abc import MutableMapping
 from datetime import date, timedelta
 from typing import Optional
 
+from django.core.cache import cache
 from django.core.exceptions import NON_FIELD_ERRORS as DJ_NON_FIELD_ERRORS
 from django.core.exceptions import ValidationError as DjValidationError
+from django.db import transaction
 from django.db.models import Count
 from django.shortcuts import get_object_or_404
+from django.utils import translation
+from django.utils.translation import get_language
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.views import api_settings
 from rest_framework.views import exception_handler as drf_exception_handler
 
-from iam.models import Folder, Permission, RoleAssignment, User
+from iam.models import Folder, Permission, RoleAssignment, User, get_permission
 from library.helpers import get_referential_translation
 
 from .models import *
@@ -19,6 +26,8 @@ from .utils import camel_case
 
 DRF_NON_FIELD_ERRORS = api_settings.NON_FIELD_ERRORS_KEY
 
+FRAMEWORK_TREE_CACHE_TTL = 60 * 60  # s
+
 
 def flatten_dict(
     d: MutableMapping, parent_key: str = "", sep: str = "."
@@ -165,7 +174,7 @@ def compile_project_for_composer(user: User, projects_list: list):
         "applied_control_status": applied_control_status,
         "change_usergroup": RoleAssignment.is_access_allowed(
             user=user,
-            perm=Permission.objects.get(codename="change_usergroup"),
+            perm=get_permission("change_usergroup"),
             folder=Folder.get_root_folder(),
         ),
     }
@@ -176,54 +185,71 @@ def get_compliance_assessment_stats(
 ) -> dict:
     """
     Function to calculate requirement groups statistics for a compliance assessment
-    Optimization by limiting the calls to the database
+    For each requirement node, returns the percentage of its descendant nodes per status
+    of their requirement assessment, as a list of (status, label, percentage)
+    Counts are rolled up from the leaves in a single traversal of the framework tree
     """
-
-    requirement_nodes_candidates = list(
-        RequirementNode.objects.filter(framework=compliance_assessment.framework)
+    requirement_nodes = list(
+        RequirementNode.objects.filter(
+            framework=compliance_assessment.framework
+        ).values_list("id", "urn", "parent_urn")
     )
-    requirement_assessment_candidates = list(
+    status_of_requirement = dict(
         RequirementAssessment.objects.filter(
             compliance_assessment=compliance_assessment
-        )
+        ).values_list("requirement_id", "status")
     )
-    requirement_assessment_candidates_per_status = {
-        st: [ra for ra in requirement_assessment_candidates if ra.status == st]
-        for st in RequirementAssessment.Status
-    }
-
-    def _get_all_requirement_nodes_id_in_requirement_node(
-        requirement_node: RequirementNode, candidates
-    ) -> list:
-        requirement_list = []
-        requirement_list.extend(
-            [req.id for req in candidates if req.parent_urn == requirement_node.urn]
-        )
-        for rg in [rg for rg in candidates if rg.parent_urn == requirement_node.urn]:
-            requirement_list += _get_all_requirement_nodes_id_in_requirement_node(
-                rg, candidates
-            )
-        return requirement_list
+    statuses = list(RequirementAssessment.Status)
+
+    children = defaultdict(list)
+    for node_id, _, parent_urn in requirement_nodes:
+        children[parent_urn].append(node_id)
+    urn_of_node = {node_id: urn for node_id, urn, _ in requirement_nodes}
+
+    # number of descendants, in total and per status, computed bottom-up
+    totals = {}
+    counts = {}
+    visiting = set()
+    for start in urn_of_node:
+        stack = [start]
+        while stack:
+            node_id = stack[-1]
+            if node_id in totals:
+                stack.pop()
+                continue
+            if node_id not in visiting:
+                visiting.add(node_id)
+                stack.extend(
+                    child
+                    for child in children[urn_of_node[node_id]]
+                    if child not in totals and child not in visiting
+                )
+                continue
+            stack.pop()
+            total = 0
+            count = dict.fromkeys(statuses, 0)
+            for child in children[urn_of_node[node_id]]:
+                if child not in totals:  # cycle in the framework tree
+                    continue
+                total += totals[child] + 1
+                for st in statuses:
+                    count[st] += counts[child][st]
+                if child in status_of_requirement:
+                    count[status_of_requirement[child]] += 1
+            totals[node_id] = total
+            counts[node_id] = count
 
     requirement_nodes_statistics = {}
-    for requirement_node in requirement_nodes_candidates:
-        requirement_nodes_statistics[requirement_node.id] = []
-        requirement_id_list = _get_all_requirement_nodes_id_in_requirement_node(
-            requirement_node, requirement_nodes_candidates
+    for node_id in urn_of_node:
+        total = totals[node_id]
+        requirement_nodes_statistics[node_id] = (
+            [
+                (st, st.label, round(counts[node_id][st] * 100 / total))
+                for st in statuses
+            ]
+            if total > 0
+            else []
         )
-        for st in RequirementAssessment.Status:
-            count = len(
-                [
-                    a
-                    for a in requirement_assessment_candidates_per_status[st]
-                    if a.requirement_id in requirement_id_list
-                ]
-            )
-            total = len(requirement_id_list)
-            if total > 0:
-                requirement_nodes_statistics[requirement_node.id].append(
-                    (st, st.label, round(count * 100 / total))
-                )
     return requirement_nodes_statistics
 
 
@@ -349,6 +375,116 @@ def get_sorted_requirement_nodes(
     return tree
 
 
+def get_framework_tree(framework: Framework) -> dict:
+    """
+    Returns the tree of the requirement nodes of a framework, as built by get_sorted_requirement_nodes
+    without requirement assessments
+    The tree only depends on the framework, so it is cached per framework, library version and locale
+    Each call returns a fresh copy that can be modified, e.g. by overlay_requirement_assessments
+    """
+    library_version = framework.library.version if framework.library_id else None
+    key = f"framework_tree:{framework.id}:{library_version}:{get_language()}"
+    tree = cache.get(key)
+    if tree is None:
+        tree = get_sorted_requirement_nodes(
+            list(RequirementNode.objects.filter(framework=framework)),
+            None,
+            framework.max_score,
+        )
+        cache.set(key, tree, FRAMEWORK_TREE_CACHE_TTL)
+    return tree
+
+
+def get_compliance_assessment_rows(compliance_assessment_id):
+    """
+    Returns an iterator over the header then one row per requirement assessment of the compliance assessment
+    Requirement assessments are read in chunks along with their requirement
+    Rows are translated in the language of the caller, as they are produced while the response
+    is streamed, once the language of the request has been deactivated
+    """
+    language = get_language()
+
+    def iter_rows():
+        with translation.override(language):
+            yield [
+                "ref_id",
+                "description",
+                "compliance_result",
+                "progress",
+                "score",
+                "observations",
+            ]
+            for req in (
+                RequirementAssessment.objects.filter(
+                    compliance_assessment=compliance_assessment_id
+                )
+                .select_related("requirement")
+                .order_by("requirement__order_id")
+                .iterator(chunk_size=2000)
+            ):
+                req_node = req.requirement
+                req_text = (
+                    req_node.get_description_translated
+                    if req_node.description
+                    else req_node.get_name_translated
+                )
+                row = [
+                    req_node.ref_id,
+                    req_text,
+                ]
+                if req_node.assessable:
+                    row += [
+                        req.result,
+                        req.status,
+                        req.score,
+                        req.observation,
+                    ]
+                yield row
+
+    return iter_rows()
+
+
+def overlay_requirement_assessments(
+    tree: dict,
+    requirements_assessed: list,
+    max_score: int = 0,
+) -> dict:
+    """
+    Fills a framework tree returned by get_framework_tree with the state of the requirement assessments,
+    giving the same result as get_sorted_requirement_nodes with these requirement assessments
+    The tree is modified in place and returned
+    """
+    requirement_assessment_from_requirement_id = {
+        str(ra.requirement_id): ra for ra in requirements_assessed
+    }
+
+    def overlay(nodes: dict) -> None:
+        for node_id, node in nodes.items():
+            req_as = requirement_assessment_from_requirement_id.get(node_id)
+            if req_as:
+                node.update(
+                    {
+                        "ra_id": str(req_as.id),
+                        "status": req_as.status,
+                        "result": req_as.result,
+                        "is_scored": req_as.is_scored,
+                        "score": req_as.score,
+                        "max_score": max_score,
+                        "question": req_as.answer,
+                        "mapping_inference": req_as.mapping_inference,
+                        "status_display": req_as.get_status_display(),
+                        "status_i18n": camel_case(req_as.status),
+                        "result_i18n": camel_case(req_as.result)
+                        if req_as.result is not None
+                        else None,
+                    }
+                )
+            overlay(node["children"])
+
+    overlay(tree)
+    return tree
+
+
 def filter_graph_by_implementation_groups(
     graph: dict[str, dict], implementation_groups: set[str] | None
 ) -> dict[str, dict]:
@@ -383,21 +519,14 @@ def get_parsed_matrices(user: User, risk_assessments: list | None = None):
     ) = RoleAssignment.get_accessible_object_ids(
         Folder.get_root_folder(), user, RiskScenario
     )
-    risk_matrices = list()
-    if risk_assessments is None:
-        risk_matrices = (
-            RiskScenario.objects.filter(id__in=object_ids_view)
-            .values_list("risk_assessment__risk_matrix__json_definition", flat=True)
-            .distinct()
-        )
-    else:
-        risk_matrices = (
-            RiskScenario.objects.filter(id__in=object_ids_view)
-            .filter(risk_assessment__in=risk_assessments)
-            .values_list("risk_assessment__risk_matrix__json_definition", flat=True)
-            .distinct()
-        )
-    parsed_matrices: list = [json.loads(m) for m in risk_matrices]
+    filters = {"riskassessment__risk_scenarios__id__in": object_ids_view}
+    if risk_assessments is not None:
+        filters["riskassessment__in"] = risk_assessments
+    # copies, as the compiled matrices are shared
+    parsed_matrices: list = [
+        copy.deepcopy(risk_matrix.compile().definition)
+        for risk_matrix in RiskMatrix.objects.filter(**filters).distinct()
+    ]
     return sorted(parsed_matrices, key=lambda m: len(m["risk"]), reverse=True)
 
 
@@ -630,26 +759,20 @@ def aggregate_risks_per_field(
     parsed_matrices: list = get_parsed_matrices(
         user=user, risk_assessments=risk_assessments
     )
+    level_field = "residual_level" if residual else "current_level"
+    count_per_level = dict(
+        RiskScenario.objects.filter(id__in=object_ids_view)
+        .values_list(level_field)
+        .annotate(count=Count("id"))
+        .order_by()
+    )
     values = dict()
     for m in parsed_matrices:
         for i in range(len(m["risk"])):
             if m["risk"][i][field] not in values:
                 values[m["risk"][i][field]] = dict()
 
-            if residual:
-                count = (
-                    RiskScenario.objects.filter(id__in=object_ids_view)
-                    .filter(residual_level=i)
-                    # .filter(risk_assessment__risk_matrix__name=["name"])
-                    .count()
-                )  # What the second filter does ? Is this useful ?
-            else:
-                count = (
-                    RiskScenario.objects.filter(id__in=object_ids_view)
-                    .filter(current_level=i)
-                    # .filter(risk_assessment__risk_matrix__name=["name"])
-                    .count()
-                )  # What the second filter does ? Is this useful ?
+            count = count_per_level.get(i, 0)
 
             if "count" not in values[m["risk"][i][field]]:
                 values[m["risk"][i][field]]["count"] = count
@@ -912,9 +1035,11 @@ def get_metrics(user: User):
 
 
 def risk_status(user: User, risk_assessment_list):
-    risk_color_map = get_risk_color_map(user)
+    # same values as get_risk_field, get_risk_color_map and get_rating_options, with the matrices parsed once
+    risks = [risk for m in get_parsed_matrices(user) for risk in m["risk"]]
+    risk_abbreviations: list = [risk["abbreviation"] for risk in risks]
+    risk_color_map = dict(zip(risk_abbreviations, [risk["hexcolor"] for risk in risks]))
     names = list()
-    risk_abbreviations: list = get_risk_field(user, "abbreviation")
     current_out = {abbr: list() for abbr in risk_abbreviations}
     residual_out = {abbr: list() for abbr in risk_abbreviations}
 
@@ -935,40 +1060,57 @@ def risk_status(user: User, risk_assessment_list):
     }
 
     max_tmp = list()
-    abbreviations = [x[0] for x in get_rating_options_abbr(user)]
+    abbreviations = risk_abbreviations
+    rating_options = [(i, risk["name"]) for i, risk in enumerate(risks)]
+    if isinstance(risk_assessment_list, models.QuerySet):
+        risk_assessment_list = risk_assessment_list.select_related("project__folder")
+    risk_assessment_list = list(risk_assessment_list)
+
+    # counts of all the risk assessments at once, pivoted below per risk assessment
+    scenarios = RiskScenario.objects.filter(
+        risk_assessment__in=risk_assessment_list
+    ).order_by()
+    counts = defaultdict(int)
+    for field in ("current_level", "residual_level", "treatment"):
+        for risk_assessment_id, value, count in scenarios.values_list(
+            "risk_assessment", field
+        ).annotate(count=Count("id")):
+            counts[(risk_assessment_id, field, value)] = count
+            if field == "treatment":
+                counts[(risk_assessment_id, "total")] += count
+    for risk_assessment_id, value, count in (
+        AppliedControl.objects.filter(
+            risk_scenarios__risk_assessment__in=risk_assessment_list
+        )
+        .values_list("risk_scenarios__risk_assessment", "status")
+        .annotate(count=Count("id"))
+        .order_by()
+    ):
+        counts[(risk_assessment_id, "status", value)] = count
+
     for risk_assessment in risk_assessment_list:
-        for lvl in get_rating_options(user):
+        for lvl in rating_options:
             abbr = abbreviations[lvl[0]]
-            cnt = RiskScenario.objects.filter(
-                risk_assessment=risk_assessment, current_level=lvl[0]
-            ).count()
+            cnt = counts[(risk_assessment.id, "current_level", lvl[0])]
             current_out[abbr].append(
                 {"value": cnt, "itemStyle": {"color": risk_color_map[abbr]}}
             )
 
-            cnt = RiskScenario.objects.filter(
-                risk_assessment=risk_assessment, residual_level=lvl[0]
-            ).count()
+            cnt = counts[(risk_assessment.id, "residual_level", lvl[0])]
             residual_out[abbr].append(
                 {"value": cnt, "itemStyle": {"color": risk_color_map[abbr]}}
             )
 
-            max_tmp.append(
-                RiskScenario.objects.filter(risk_assessment=risk_assessment).count()
-            )
+            max_tmp.append(counts[(risk_assessment.id, "total")])
 
         for option in RiskScenario.TREATMENT_OPTIONS:
-            cnt = RiskScenario.objects.filter(
-                risk_assessment=risk_assessment, treatment=option[0]
-            ).count()
+            cnt = counts[(risk_assessment.id, "treatment", option[0])]
             rsk_status_out[option[0]].append(
                 {"value": cnt, "itemStyle": {"color": STATUS_COLOR_MAP[option[0]]}}
             )
 
         for status in AppliedControl.Status.choices:
-            cnt = AppliedControl.objects.filter(
-                risk_scenarios__risk_assessment=risk_assessment, status=status[0]
-            ).count()
+            cnt = counts[(risk_assessment.id, "status", status[0])]
             mtg_status_out[status[0]].append(
                 {"value": cnt, "itemStyle": {"color": STATUS_COLOR_MAP[status[0]]}}
             )
@@ -1007,8 +1149,7 @@ def acceptances_to_review(user: User):
 
 
 def build_scenario_clusters(risk_assessment: RiskAssessment):
-    risk_matrix = risk_assessment.risk_matrix.parse_json()
-    grid = risk_matrix["grid"]
+    grid = risk_assessment.risk_matrix.compile().grid
     risk_matrix_current = [
         [set() for _ in range(len(grid[0]))] for _ in range(len(grid))
     ]
@@ -1176,92 +1317,162 @@ def handle(exc, context):
     return drf_exception_handler(exc, context)
 
 
-def duplicate_related_objects(
-    source_object: models.Model,
-    duplicate_object: models.Model,
-    target_folder: Folder,
-    field_name: str,
-):
+def resolve_related_objects(
+    objects: list[models.Model], target_folder: Folder, model_class: type[models.Model]
+) -> dict:
     """
-    Duplicates related objects from a source object to a duplicate object, avoiding duplicates in the target folder.
+    Resolves the objects to link in the target folder in place of the given related objects.
+
+    Each object is resolved once:
+    - an object with the same name in the target folder is linked,
+    - a published object of a parent folder or an object of a subfolder is linked as is,
+    - otherwise the object is duplicated in the target folder, copies are created in bulk.
 
     Parameters:
-    - source_object (object): The source object containing related objects to duplicate.
-    - duplicate_object (object): The object where duplicated objects will be linked.
+    - objects (list): The related objects to resolve.
     - target_folder (Folder): The folder where duplicated objects will be stored.
-    - field_name (str): The field name representing the related objects in the source
-    """
-
-    def process_related_object(
-        obj,
-        duplicate_object,
-        target_folder,
-        target_parent_folders,
-        sub_folders,
-        field_name,
-        model_class,
-    ):
-        """
-        Process a single related object: add, link, or duplicate it based on folder and existence checks.
-        """
-
-        # Check if the object already exists in the target folder
-        existing_obj = get_existing_object(obj, target_folder, model_class)
-
-        if existing_obj:
-            # If the object exists in the target folder, link it to the duplicate object
-            link_existing_object(duplicate_object, existing_obj, field_name)
-
-        elif obj.folder in target_parent_folders and obj.is_published:
-            # If the object's folder is a parent and it's published, link it
-            link_existing_object(duplicate_object, obj, field_name)
-
-        elif obj.folder in sub_folders:
-            # If the object's folder is a subfolder of the target folder, link it
-            link_existing_object(duplicate_object, obj, field_name)
+    - model_class (Model): The model of the related objects.
 
+    Returns a dict mapping the id of each object to the object to link.
+    """
+    objects = list(objects)
+    if not objects:
+        return {}
+    existing_objects = {}
+    queryset = model_class.objects.filter(
+        folder=target_folder, name__in={obj.name for obj in objects}
+    )
+    for existing_obj in queryset if queryset.ordered else queryset.order_by("pk"):
+        existing_objects.setdefault(existing_obj.name, existing_obj)
+    target_parent_folders = {folder.id for folder in target_folder.get_parent_folders()}
+    sub_folders = {folder.id for folder in target_folder.sub_folders()}
+    is_root_folder = target_folder.id == Folder.get_root_folder_id()
+
+    resolved, duplicates = {}, []
+    for obj in objects:
+        if obj.name in existing_objects:
+            resolved[obj.id] = existing_objects[obj.name]
+        elif (
+            obj.folder_id in target_parent_folders and obj.is_published
+        ) or obj.folder_id in sub_folders:
+            resolved[obj.id] = obj
         else:
-            # Otherwise, duplicate the object and link it
-            duplicate_and_link_object(obj, duplicate_object, target_folder, field_name)
-
-    def get_existing_object(obj, target_folder, model_class):
-        """
-        Check if an object with the same name already exists in the target folder.
-        """
-        return model_class.objects.filter(name=obj.name, folder=target_folder).first()
-
-    def link_existing_object(duplicate_object, existing_obj, field_name):
-        """
-        Link an existing object to the duplicate object by adding it to the related field.
-        """
-        getattr(duplicate_object, field_name).add(existing_obj)
+            source_id = obj.id
+            obj.id = uuid.uuid4()
+            obj._state.adding = True
+            obj.folder = target_folder
+            if is_root_folder:
+                obj.is_published = True
+            # later objects with the same name are linked to this copy
+            existing_objects[obj.name] = resolved[source_id] = obj
+            duplicates.append(obj)
+    model_class.objects.bulk_create(duplicates, batch_size=1000)
+    return resolved
+
+
+@transaction.atomic
+def duplicate_risk_assessment(
+    risk_assessment: RiskAssessment,
+    name: str,
+    version: str,
+    project: Project,
+    description: str | None = None,
+) -> RiskAssessment:
+    """
+    Duplicates a risk assessment and its scenarios into a project.
 
-    def duplicate_and_link_object(new_obj, duplicate_object, target_folder, field_name):
-        """
-        Duplicate an object and link it to the duplicate object.
-        """
-        new_obj.pk = None
-        new_obj.folder = target_folder
-        new_obj.save()
-        link_existing_object(duplicate_object, new_obj, field_name)
-
-    model_class = getattr(type(source_object), field_name).field.related_model
-
-    # Get parent and sub-folders of the target folder
-    target_parent_folders = target_folder.get_parent_folders()
-    sub_folders = target_folder.sub_folders()
-
-    # Get all related objects for the specified field
-    related_objects = getattr(source_object, field_name).all()
-
-    # Process each related object
-    for obj in related_objects:
-        process_related_object(
-            obj,
-            duplicate_object,
-            target_folder,
-            target_parent_folders,
-            sub_folders,
-            field_name,
-            model_class,
+    Scenarios are created in bulk with their levels computed from the compiled risk matrix,
+    related applied controls, threats and assets are resolved once per distinct object
+    (see resolve_related_objects) and the links are inserted in bulk, so that the number
+    of queries does not depend on the number of scenarios.
+    Owners are kept when the target folder is the folder of the source project or one of its subfolders.
+    """
+    duplicate = RiskAssessment.objects.create(
+        name=name,
+        description=description,
+        project=project,
+        version=version,
+        risk_matrix=risk_assessment.risk_matrix,
+        eta=risk_assessment.eta,
+        due_date=risk_assessment.due_date,
+        status=risk_assessment.status,
+    )
+    duplicate.authors.set(risk_assessment.authors.all())
+    duplicate.reviewers.set(risk_assessment.reviewers.all())
+
+    compiled_matrix = risk_assessment.risk_matrix.compile()
+
+    def get_level(probability, impact):
+        if probability >= 0 and impact >= 0:
+            return compiled_matrix.score(probability, impact)
+        return -1
+
+    scenario_ids = {}
+    duplicate_scenarios = []
+    for scenario in risk_assessment.risk_scenarios.order_by("created_at"):
+        duplicate_scenario = RiskScenario(
+            risk_assessment=duplicate,
+            folder_id=project.folder_id,
+            name=scenario.name,
+            description=scenario.description,
+            existing_controls=scenario.existing_controls,
+            treatment=scenario.treatment,
+            qualifications=scenario.qualifications,
+            current_proba=scenario.current_proba,
+            current_impact=scenario.current_impact,
+            current_level=get_level(scenario.current_proba, scenario.current_impact),
+            residual_proba=scenario.residual_proba,
+            residual_impact=scenario.residual_impact,
+            residual_level=get_level(scenario.residual_proba, scenario.residual_impact),
+            strength_of_knowledge=scenario.strength_of_knowledge,
+            justification=scenario.justification,
+        )
+        scenario_ids[scenario.id] = duplicate_scenario.id
+        duplicate_scenarios.append(duplicate_scenario)
+    RiskScenario.objects.bulk_create(duplicate_scenarios, batch_size=1000)
+
+    source_folder = risk_assessment.project.folder
+    fields = ["applied_controls", "threats", "assets"]
+    if project.folder_id == source_folder.id or project.folder_id in {
+        folder.id for folder in source_folder.sub_folders()
+    }:
+        fields.append("owner")
+    for field_name in fields:
+        field = RiskScenario._meta.get_field(field_name)
+        through = field.remote_field.through
+        scenario_column = field.m2m_field_name() + "_id"
+        related_column = field.m2m_reverse_field_name() + "_id"
+        links = list(
+            through.objects.filter(
+                **{f"{field.m2m_field_name()}__risk_assessment": risk_assessment}
+            ).values_list(scenario_column, related_column)
+        )
+        if not links:
+            continue
+        if field_name == "owner":
+            # owners are users, they are kept as is
+            resolved_ids = {related_id: related_id for _, related_id in links}
+        else:
+            resolved_ids = {
+                related_id: obj.id
+                for related_id, obj in resolve_related_objects(
+                    field.related_model.objects.filter(
+                        id__in={related_id for _, related_id in links}
+                    ),
+                    project.folder,
+                    field.related_model,
+                ).items()
+            }
+        # distinct source objects may resolve to the same object
+        rows = {
+            (scenario_ids[scenario_id], resolved_ids[related_id])
+            for scenario_id, related_id in links
+        }
+        through.objects.bulk_create(
+            [
+                through(**{scenario_column: scenario_id, related_column: related_id})
+                for scenario_id, related_id in rows
+            ],
+            batch_size=1000,
         )
+    return duplicate
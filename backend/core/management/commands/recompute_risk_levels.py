@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.models import RiskScenario
+
+
+class Command(BaseCommand):
+    help = "Recomputes the current and residual levels of risk scenarios from their risk matrix"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--risk-matrix",
+            action="append",
+            default=[],
+            help="Only recompute the scenarios using this risk matrix (id, repeatable)",
+        )
+        parser.add_argument(
+            "--risk-assessment",
+            action="append",
+            default=[],
+            help="Only recompute the scenarios of this risk assessment (id, repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = RiskScenario.objects.all()
+        if options["risk_matrix"]:
+            scenarios = scenarios.filter(
+                risk_assessment__risk_matrix__in=options["risk_matrix"]
+            )
+        if options["risk_assessment"]:
+            scenarios = scenarios.filter(risk_assessment__in=options["risk_assessment"])
+        updated = RiskScenario.recompute_levels(scenarios)
+        self.stdout.write(f"updated_scenarios={updated}")
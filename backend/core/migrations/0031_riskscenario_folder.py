@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_risk_scenario_folder(apps, schema_editor):
+    RiskScenario = apps.get_model("core", "RiskScenario")
+    RiskAssessment = apps.get_model("core", "RiskAssessment")
+    RiskScenario.objects.update(
+        folder_id=Subquery(
+            RiskAssessment.objects.filter(id=OuterRef("risk_assessment_id")).values(
+                "project__folder_id"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0030_appliedcontrol_start_date"),
+        ("iam", "0009_folderclosure"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="riskscenario",
+            name="folder",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="%(class)s_folder",
+                to="iam.folder",
+                verbose_name="Folder",
+            ),
+        ),
+        migrations.RunPython(set_risk_scenario_folder, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0031_riskscenario_folder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ComplianceAssessmentSummary",
+            fields=[
+                (
+                    "compliance_assessment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="core.complianceassessment",
+                    ),
+                ),
+                ("counters", models.JSONField(default=dict)),
+            ],
+            options={
+                "verbose_name": "Compliance assessment summary",
+                "verbose_name_plural": "Compliance assessment summaries",
+            },
+        ),
+    ]
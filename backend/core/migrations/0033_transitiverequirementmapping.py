@@ -0,0 +1,128 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.utils import compose_requirement_mappings
+
+
+def build_transitive_requirement_mappings(apps, schema_editor):
+    RequirementMapping = apps.get_model("core", "RequirementMapping")
+    TransitiveRequirementMapping = apps.get_model(
+        "core", "TransitiveRequirementMapping"
+    )
+    composed = compose_requirement_mappings(
+        RequirementMapping.objects.values_list(
+            "source_requirement_id",
+            "target_requirement_id",
+            "relationship",
+            "mapping_set__source_framework_id",
+            "mapping_set__target_framework_id",
+        ),
+        3,
+    )
+    TransitiveRequirementMapping.objects.bulk_create(
+        [
+            TransitiveRequirementMapping(
+                source_requirement_id=source_requirement_id,
+                target_requirement_id=target_requirement_id,
+                relationship=relationship,
+                depth=depth,
+                source_framework_id=source_framework_id,
+                target_framework_id=target_framework_id,
+            )
+            for (source_requirement_id, target_requirement_id), (
+                relationship,
+                depth,
+                source_framework_id,
+                target_framework_id,
+            ) in composed.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0032_complianceassessmentsummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransitiveRequirementMapping",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "relationship",
+                    models.CharField(
+                        choices=[
+                            ("subset", "Subset"),
+                            ("intersect", "Intersect"),
+                            ("equal", "Equal"),
+                            ("superset", "Superset"),
+                            ("not_related", "Not related"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("depth", models.PositiveSmallIntegerField()),
+                (
+                    "source_framework",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.framework",
+                    ),
+                ),
+                (
+                    "source_requirement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.requirementnode",
+                    ),
+                ),
+                (
+                    "target_framework",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.framework",
+                    ),
+                ),
+                (
+                    "target_requirement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.requirementnode",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["source_framework", "target_framework"],
+                        name="core_transi_source__f16ccc_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source_requirement", "target_requirement"),
+                        name="unique_transitive_requirement_mapping",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            build_transitive_requirement_mappings, migrations.RunPython.noop
+        ),
+    ]
@@ -1,14 +1,20 @@
+import copy
 import json
 import os
 import re
+from collections import defaultdict
 from datetime import date, datetime
+from functools import reduce
+from operator import or_
 from pathlib import Path
 from typing import Self, Type, Union
+from uuid import UUID
 
 import yaml
 from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core import serializers
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
 from django.db import models, transaction
@@ -21,7 +27,7 @@ from django.utils.translation import gettext_lazy as _
 from structlog import get_logger
 from django.utils.timezone import now
 
-from iam.models import Folder, FolderMixin, PublishInRootFolderMixin
+from iam.models import Folder, FolderMixin, FolderPathMixin, PublishInRootFolderMixin
 from library.helpers import (
     get_referential_translation,
     update_translations,
@@ -29,8 +35,9 @@ from library.helpers import (
     update_translations_in_object,
 )
 
+from . import quantification
 from .base_models import AbstractBaseModel, ETADueDateMixin, NameDescriptionMixin
-from .utils import camel_case, sha256
+from .utils import camel_case, compose_requirement_mappings, sha256
 from .validators import validate_file_name, validate_file_size
 
 logger = get_logger(__name__)
@@ -568,6 +575,11 @@ class LibraryUpdater:
                             reference_control_to_add
                         )
 
+            # requirements may have been added, deleted or moved to other implementation groups
+            for compliance_assessment in compliance_assessments:
+                ComplianceAssessmentSummary.refresh(compliance_assessment)
+            TransitiveRequirementMapping.rebuild()
+
         if self.new_matrices is not None:
             for matrix in self.new_matrices:
                 json_definition_keys = {
@@ -686,6 +698,7 @@ class LoadedLibrary(LibraryMixin):
         StoredLibrary.objects.filter(urn=self.urn, locale=self.locale).update(
             is_loaded=False
         )
+        TransitiveRequirementMapping.rebuild()
 
 
 class Threat(ReferentialObjectMixin, I18nObjectMixin, PublishInRootFolderMixin):
@@ -793,6 +806,33 @@ class ReferenceControl(ReferentialObjectMixin, I18nObjectMixin):
             )
 
 
+RISK_MATRIX_CACHE_TTL = 60 * 60  # s
+
+
+class CompiledRiskMatrix:
+    """
+    Risk matrix definition parsed once, with its grid as tuples of risk levels
+    and its probability, impact and risk tables translated in one locale
+    Built and cached by RiskMatrix.compile and shared by all its callers, it must not be mutated:
+    copy definition or translated before handing them out
+    """
+
+    def __init__(self, definition: dict, locale: str | None):
+        self.locale = locale
+        self.definition = definition
+        self.grid = tuple(tuple(row) for row in definition["grid"])
+        self.translated = update_translations_in_object(
+            json.loads(json.dumps(definition))
+        )
+        self.probability = self.translated["probability"]
+        self.impact = self.translated["impact"]
+        self.risk = self.translated["risk"]
+        self.strength_of_knowledge = self.translated.get("strength_of_knowledge")
+
+    def score(self, probability: int, impact: int) -> int:
+        return self.grid[probability][impact]
+
+
 class RiskMatrix(ReferentialObjectMixin, I18nObjectMixin):
     library = models.ForeignKey(
         LoadedLibrary,
@@ -839,6 +879,33 @@ class RiskMatrix(ReferentialObjectMixin, I18nObjectMixin):
     def parse_json_translated(self) -> dict:
         return update_translations_in_object(json.loads(self.json_definition))
 
+    def compile(self) -> CompiledRiskMatrix:
+        """
+        Returns the compiled risk matrix in the current locale
+        It is kept on the instance and cached per matrix, update and locale,
+        so that the definition is parsed and translated once for all the scenarios using the matrix
+        """
+        locale = get_language()
+        compiled_matrices = self.__dict__.setdefault("_compiled_matrices", {})
+        if locale not in compiled_matrices:
+            key = f"risk_matrix:{self.id}:{self.updated_at.timestamp() if self.updated_at else None}:{locale}"
+            compiled = cache.get(key)
+            if compiled is None:
+                compiled = CompiledRiskMatrix(self.parse_json(), locale)
+                cache.set(key, compiled, RISK_MATRIX_CACHE_TTL)
+            compiled_matrices[locale] = compiled
+        return compiled_matrices[locale]
+
+    def save(self, *args, **kwargs) -> None:
+        adding = self._state.adding
+        self.__dict__.pop("_compiled_matrices", None)
+        super().save(*args, **kwargs)
+        if not adding:
+            # the grid may have changed, levels of the scenarios using the matrix follow it
+            RiskScenario.recompute_levels(
+                RiskScenario.objects.filter(risk_assessment__risk_matrix=self)
+            )
+
     @property
     def grid(self) -> list:
         risk_matrix = self.parse_json()
@@ -1102,6 +1169,93 @@ class RequirementMapping(models.Model):
         return RequirementMapping.Coverage.PARTIAL
 
 
+class TransitiveRequirementMapping(models.Model):
+    """
+    Mappings between requirements of two frameworks, composed along chains of mapping sets
+    (e.g. ISO 27001:2013 -> ISO 27001:2022 -> another framework), depth being the number of mappings of the chain
+    Direct mappings are included with a depth of 1
+    This table is derived from the requirement mappings, it is rebuilt when libraries are loaded, updated or deleted
+    """
+
+    MAX_DEPTH = 3
+
+    source_framework = models.ForeignKey(
+        Framework, on_delete=models.CASCADE, related_name="+"
+    )
+    target_framework = models.ForeignKey(
+        Framework, on_delete=models.CASCADE, related_name="+"
+    )
+    source_requirement = models.ForeignKey(
+        RequirementNode, on_delete=models.CASCADE, related_name="+"
+    )
+    target_requirement = models.ForeignKey(
+        RequirementNode, on_delete=models.CASCADE, related_name="+"
+    )
+    relationship = models.CharField(
+        max_length=20, choices=RequirementMapping.Relationship.choices
+    )
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_requirement", "target_requirement"],
+                name="unique_transitive_requirement_mapping",
+            )
+        ]
+        indexes = [models.Index(fields=["source_framework", "target_framework"])]
+
+    @property
+    def coverage(self) -> str:
+        if self.relationship in RequirementMapping.FULL_COVERAGE_RELATIONSHIPS:
+            return RequirementMapping.Coverage.FULL
+        return RequirementMapping.Coverage.PARTIAL
+
+    @staticmethod
+    def rebuild() -> None:
+        """Recomputes the whole table from the requirement mappings"""
+        composed = compose_requirement_mappings(
+            RequirementMapping.objects.values_list(
+                "source_requirement_id",
+                "target_requirement_id",
+                "relationship",
+                "mapping_set__source_framework_id",
+                "mapping_set__target_framework_id",
+            ),
+            TransitiveRequirementMapping.MAX_DEPTH,
+        )
+        with transaction.atomic():
+            TransitiveRequirementMapping.objects.all().delete()
+            TransitiveRequirementMapping.objects.bulk_create(
+                [
+                    TransitiveRequirementMapping(
+                        source_requirement_id=source_requirement_id,
+                        target_requirement_id=target_requirement_id,
+                        relationship=relationship,
+                        depth=depth,
+                        source_framework_id=source_framework_id,
+                        target_framework_id=target_framework_id,
+                    )
+                    for (source_requirement_id, target_requirement_id), (
+                        relationship,
+                        depth,
+                        source_framework_id,
+                        target_framework_id,
+                    ) in composed.items()
+                ],
+                batch_size=1000,
+            )
+
+    @staticmethod
+    def get_target_frameworks(framework: Framework) -> models.QuerySet:
+        """Returns the frameworks that can be inferred from a framework, directly or through other frameworks"""
+        return Framework.objects.filter(
+            id__in=TransitiveRequirementMapping.objects.filter(
+                source_framework=framework
+            ).values("target_framework")
+        )
+
+
 ########################### Domain objects #########################
 
 
@@ -1146,6 +1300,12 @@ class Project(NameDescriptionMixin, FolderMixin):
             return 0
         return round(count * 100 / total)
 
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        RiskScenario.objects.filter(risk_assessment__project=self).exclude(
+            folder=self.folder
+        ).update(folder=self.folder)
+
     def __str__(self):
         return self.folder.name + "/" + self.name
 
@@ -1438,6 +1598,96 @@ class Policy(AppliedControl):
 ########################### Secondary objects #########################
 
 
+QUALITY_CHECK_CACHE_TTL = 60 * 60  # s
+
+
+def collect_quality_findings(
+    findings: dict,
+    queryset: models.QuerySet,
+    rules: list[dict],
+    obj_type: str,
+    link: str,
+) -> None:
+    """
+    Appends to findings the objects of the queryset that break at least one of the rules
+    Each rule is a dict with a level (errors, warnings or info), a msgid, a msg formatted with the object name,
+    a condition (Q object) and optionally has_link=False
+    All the rules are evaluated by a single query that only returns the offending objects, which are
+    serialized with their many-to-many relations prefetched: the object of a finding holds the serialized
+    fields and the id of the offending object
+    Objects without a name field are named after str(), whose relations must then be selected by the queryset
+    """
+    flags = {
+        f"rule_{i}": models.ExpressionWrapper(
+            rule["condition"], output_field=models.BooleanField()
+        )
+        for i, rule in enumerate(rules)
+    }
+    offenders = list(
+        queryset.filter(reduce(or_, (rule["condition"] for rule in rules)))
+        .annotate(**flags)
+        .prefetch_related(
+            *(
+                field.name
+                for field in queryset.model._meta.many_to_many
+                if field.remote_field.through._meta.auto_created
+            )
+        )
+        .order_by("created_at")
+    )
+    for obj, serialized in zip(
+        offenders, json.loads(serializers.serialize("json", offenders))
+    ):
+        _object = serialized["fields"]
+        _object["id"] = serialized["pk"]
+        if "name" not in _object:
+            _object["name"] = str(obj)
+        for i, rule in enumerate(rules):
+            if not getattr(obj, f"rule_{i}"):
+                continue
+            finding = {
+                "msg": rule["msg"].format(_object["name"]),
+                "msgid": rule["msgid"],
+                "obj_type": obj_type,
+                "object": _object,
+            }
+            if rule.get("has_link", True):
+                finding["link"] = f"{link}/{obj.id}"
+            findings[rule["level"]].append(finding)
+
+
+def get_link_stamps(model: type[models.Model], lookup: str, ids: list) -> dict:
+    """
+    Returns, for each of the given assessment ids reached by the lookup from the objects of the model,
+    the latest update of these objects and the number of rows linking them to the assessment
+    m2m changes do not update the linked objects, so when the first relation of the lookup is
+    a many-to-many one the rows of its through table are aggregated instead, with their last id:
+    ids only grow, so that a link moved between two objects of the assessment changes it as well
+    """
+    link, _, rest = lookup.partition("__")
+    field = model._meta.get_field(link)
+    aggregates = {"latest": models.Max("updated_at"), "count": models.Count("id")}
+    if field.many_to_many:
+        m2m = field if isinstance(field, models.ManyToManyField) else field.field
+        source, target = m2m.m2m_field_name(), m2m.m2m_reverse_field_name()
+        if m2m is not field:
+            source, target = target, source
+        model = m2m.remote_field.through
+        lookup = f"{target}__{rest}" if rest else target
+        aggregates = {
+            "latest": models.Max(f"{source}__updated_at"),
+            "count": models.Count("id"),
+            "last": models.Max("id"),
+        }
+    rows = (
+        model.objects.filter(**{f"{lookup}__in": ids})
+        .values(lookup)
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row[lookup]: tuple(str(row[key]) for key in aggregates) for row in rows}
+
+
 class Assessment(NameDescriptionMixin, ETADueDateMixin, FolderMixin):
     class Status(models.TextChoices):
         PLANNED = "planned", _("Planned")
@@ -1481,14 +1731,69 @@ class Assessment(NameDescriptionMixin, ETADueDateMixin, FolderMixin):
 
     fields_to_check = ["name", "version"]
 
+    # objects checked by get_quality_findings, as (model, lookup to the assessment)
+    # their latest update and their links along the lookup invalidate the cached quality check
+    quality_check_dependencies: list[tuple[str, str]] = []
+
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs) -> None:
-        if not self.folder or self.folder == Folder.get_root_folder():
+        if not self.folder or self.folder_id == Folder.get_root_folder_id():
             self.folder = self.project.folder
         return super().save(*args, **kwargs)
 
+    def get_quality_findings(self) -> dict:
+        """
+        Computes the quality check findings of the assessment, see quality_check
+        """
+        return {"errors": [], "warnings": [], "info": []}
+
+    @classmethod
+    def get_quality_checks(cls, assessments: list) -> dict:
+        """
+        Returns the quality check of each assessment, by id
+        Findings are cached per assessment until the assessment, its authors or one of its
+        quality_check_dependencies is updated, created, deleted, linked or unlinked; the cache keys
+        of all the assessments are aggregated by the database, with one query for the authors and
+        one per dependency, see get_link_stamps
+        """
+        ids = [assessment.id for assessment in assessments]
+        dependencies = [(User, f"{cls._meta.model_name}_authors")] + [
+            (apps.get_model("core", model), lookup)
+            for model, lookup in cls.quality_check_dependencies
+        ]
+        stamps = {
+            assessment.id: [str(assessment.updated_at)] for assessment in assessments
+        }
+        for model, lookup in dependencies:
+            dependency_stamps = get_link_stamps(model, lookup, ids)
+            for assessment_id, stamp in stamps.items():
+                stamp.append(f"{model.__name__}:{dependency_stamps.get(assessment_id)}")
+        # rules compare dates with today and messages are translated
+        suffix = f"{date.today()}:{get_language()}"
+        keys = {
+            assessment.id: f"quality_check:{assessment.id}:"
+            + sha256(f"{stamps[assessment.id]}:{suffix}".encode())
+            for assessment in assessments
+        }
+        cached = cache.get_many(keys.values())
+        results, missing = {}, {}
+        for assessment in assessments:
+            findings = cached.get(keys[assessment.id])
+            if findings is None:
+                findings = assessment.get_quality_findings()
+                findings["count"] = sum(
+                    len(findings[level]) for level in ("errors", "warnings", "info")
+                )
+                missing[keys[assessment.id]] = findings
+            results[assessment.id] = findings
+        cache.set_many(missing, QUALITY_CHECK_CACHE_TTL)
+        return results
+
+    def quality_check(self) -> dict:
+        return self.get_quality_checks([self])[self.id]
+
 
 class RiskAssessment(Assessment):
     risk_matrix = models.ForeignKey(
@@ -1502,6 +1807,24 @@ class RiskAssessment(Assessment):
         verbose_name = _("Risk assessment")
         verbose_name_plural = _("Risk assessments")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keep the loaded risk matrix to recompute the levels of the scenarios when it changes
+        instance._loaded_risk_matrix_id = instance.__dict__.get("risk_matrix_id")
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        self.risk_scenarios.exclude(folder=self.project.folder_id).update(
+            folder=self.project.folder_id
+        )
+        if getattr(self, "_loaded_risk_matrix_id", self.risk_matrix_id) != (
+            self.risk_matrix_id
+        ):
+            RiskScenario.recompute_levels(self.risk_scenarios.all())
+        self._loaded_risk_matrix_id = self.risk_matrix_id
+
     def __str__(self) -> str:
         return f"{self.name} - {self.version}"
 
@@ -1514,15 +1837,70 @@ class RiskAssessment(Assessment):
         scenario_count = count
         return scenario_count
 
-    def quality_check(self) -> dict:
-        errors_lst = list()
-        warnings_lst = list()
-        info_lst = list()
+    def get_quantification(
+        self,
+        iterations: int = quantification.DEFAULT_ITERATIONS,
+        seed: int | None = None,
+        residual: bool = False,
+    ) -> dict:
+        """
+        Simulates the annual losses of the scenarios of the risk assessment, see core.quantification
+        Current levels are used unless residual is set
+        Seeded results are cached until a scenario or the risk matrix is updated, created or deleted;
+        without a seed a new draw is simulated, with a seed reported in the result to reproduce it
+        Raises ValueError if the risk matrix defines invalid magnitudes
+        """
+        if seed is None:
+            return self.simulate_losses(iterations, None, residual)
+        stamp = self.risk_scenarios.aggregate(
+            latest=models.Max("updated_at"), count=models.Count("id")
+        )
+        key = "risk_quantification:" + sha256(
+            f"{self.id}:{stamp['latest']}/{stamp['count']}:{self.risk_matrix.updated_at}:{iterations}:{seed}:{residual}".encode()
+        )
+        result = cache.get(key)
+        if result is None:
+            result = self.simulate_losses(iterations, seed, residual)
+            cache.set(key, result, RISK_MATRIX_CACHE_TTL)
+        return result
+
+    def simulate_losses(
+        self, iterations: int, seed: int | None, residual: bool
+    ) -> dict:
+        proba, impact = (
+            ("residual_proba", "residual_impact")
+            if residual
+            else ("current_proba", "current_impact")
+        )
+        scenarios = [
+            {"id": str(id), "name": name, "proba": p, "impact": i}
+            for id, name, p, i in self.risk_scenarios.order_by(
+                "created_at"
+            ).values_list("id", "name", proba, impact)
+        ]
+        definition = self.risk_matrix.compile().definition
+        result = quantification.quantify_scenarios(
+            scenarios,
+            definition["probability"],
+            definition["impact"],
+            iterations=iterations,
+            seed=seed,
+        )
+        result["residual"] = residual
+        return result
+
+    quality_check_dependencies = [
+        ("RiskScenario", "risk_assessment"),
+        ("AppliedControl", "risk_scenarios__risk_assessment"),
+        ("RiskAcceptance", "risk_scenarios__risk_assessment"),
+    ]
+
+    def get_quality_findings(self) -> dict:
+        findings = {"errors": [], "warnings": [], "info": []}
         # --- check on the risk risk_assessment:
-        _object = serializers.serialize("json", [self])
-        _object = json.loads(_object)
+        _object = json.loads(serializers.serialize("json", [self]))
         if self.status == Assessment.Status.IN_PROGRESS:
-            info_lst.append(
+            findings["info"].append(
                 {
                     "msg": _("{}: Risk assessment is still in progress").format(
                         str(self)
@@ -1532,8 +1910,8 @@ class RiskAssessment(Assessment):
                     "object": _object,
                 }
             )
-        if not self.authors.all():
-            info_lst.append(
+        if not _object[0]["fields"]["authors"]:
+            findings["info"].append(
                 {
                     "msg": _("{}: No author assigned to this risk assessment").format(
                         str(self)
@@ -1543,8 +1921,8 @@ class RiskAssessment(Assessment):
                     "object": _object,
                 }
             )
-        if not self.risk_scenarios.all():
-            warnings_lst.append(
+        if not self.risk_scenarios.exists():
+            findings["warnings"].append(
                 {
                     "msg": _(
                         "{}: RiskAssessment is empty. No risk scenario declared yet"
@@ -1557,226 +1935,154 @@ class RiskAssessment(Assessment):
         # ---
 
         # --- checks on the risk scenarios
-        # TODO: Refactor this
-        _scenarios = serializers.serialize(
-            "json", self.risk_scenarios.all().order_by("created_at")
+        lowered = (
+            Q(residual_level__lt=models.F("current_level"))
+            | Q(residual_proba__lt=models.F("current_proba"))
+            | Q(residual_impact__lt=models.F("current_impact"))
+        )
+        collect_quality_findings(
+            findings,
+            self.risk_scenarios.all(),
+            [
+                {
+                    "level": "warnings",
+                    "msgid": "riskScenarioNoCurrentLevel",
+                    "msg": _("{} current risk level has not been assessed"),
+                    "condition": Q(current_level__lt=0),
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskScenarioNoResidualLevel",
+                    "msg": _(
+                        "{} residual risk level has not been assessed. If no additional measures are applied, it should be at the same level as the current risk"
+                    ),
+                    "condition": Q(residual_level__lt=0, current_level__gte=0),
+                    "has_link": False,
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskScenarioResidualHigherThanCurrent",
+                    "msg": _("{} residual risk level is higher than the current one"),
+                    "condition": Q(residual_level__gt=models.F("current_level")),
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskScenarioResidualProbaHigherThanCurrent",
+                    "msg": _(
+                        "{} residual risk probability is higher than the current one"
+                    ),
+                    "condition": Q(residual_proba__gt=models.F("current_proba")),
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskScenarioResidualImpactHigherThanCurrent",
+                    "msg": _("{} residual risk impact is higher than the current one"),
+                    "condition": Q(residual_impact__gt=models.F("current_impact")),
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskScenarioResidualLoweredWithoutMeasures",
+                    "msg": _(
+                        "{}: residual risk level has been lowered without any specific measure"
+                    ),
+                    "condition": lowered
+                    & Q(residual_level__gte=0)
+                    & ~models.Exists(
+                        AppliedControl.objects.filter(
+                            risk_scenarios=models.OuterRef("pk")
+                        )
+                    ),
+                },
+                {
+                    "level": "warnings",
+                    "msgid": "riskScenarioAcceptedNoAcceptance",
+                    "msg": _("{} risk accepted but no risk acceptance attached"),
+                    "condition": Q(treatment="accept")
+                    & ~models.Exists(
+                        RiskAcceptance.objects.filter(
+                            risk_scenarios=models.OuterRef("pk")
+                        )
+                    ),
+                },
+            ],
+            "riskscenario",
+            "risk-scenarios",
         )
-        scenarios = [x["fields"] for x in json.loads(_scenarios)]
-        for i in range(len(scenarios)):
-            scenarios[i]["id"] = json.loads(_scenarios)[i]["pk"]
-        for ri in scenarios:
-            if ri["current_level"] < 0:
-                warnings_lst.append(
-                    {
-                        "msg": _("{} current risk level has not been assessed").format(
-                            ri["name"]
-                        ),
-                        "msgid": "riskScenarioNoCurrentLevel",
-                        "link": f"risk-scenarios/{ri['id']}",
-                        "obj_type": "riskscenario",
-                        "object": ri,
-                    }
-                )
-            if ri["residual_level"] < 0 and ri["current_level"] >= 0:
-                errors_lst.append(
-                    {
-                        "msg": _(
-                            "{} residual risk level has not been assessed. If no additional measures are applied, it should be at the same level as the current risk"
-                        ).format(ri["name"]),
-                        "msgid": "riskScenarioNoResidualLevel",
-                        "obj_type": "riskscenario",
-                        "object": ri,
-                    }
-                )
-            if ri["residual_level"] > ri["current_level"]:
-                errors_lst.append(
-                    {
-                        "msg": _(
-                            "{} residual risk level is higher than the current one"
-                        ).format(ri["name"]),
-                        "msgid": "riskScenarioResidualHigherThanCurrent",
-                        "link": f"risk-scenarios/{ri['id']}",
-                        "obj_type": "riskscenario",
-                        "object": ri,
-                    }
-                )
-            if ri["residual_proba"] > ri["current_proba"]:
-                errors_lst.append(
-                    {
-                        "msg": _(
-                            "{} residual risk probability is higher than the current one"
-                        ).format(ri["name"]),
-                        "msgid": "riskScenarioResidualProbaHigherThanCurrent",
-                        "link": f"risk-scenarios/{ri['id']}",
-                        "obj_type": "riskscenario",
-                        "object": ri,
-                    }
-                )
-            if ri["residual_impact"] > ri["current_impact"]:
-                errors_lst.append(
-                    {
-                        "msg": _(
-                            "{} residual risk impact is higher than the current one"
-                        ).format(ri["name"]),
-                        "msgid": "riskScenarioResidualImpactHigherThanCurrent",
-                        "link": f"risk-scenarios/{ri['id']}",
-                        "obj_type": "riskscenario",
-                        "object": ri,
-                    }
-                )
-
-            if (
-                ri["residual_level"] < ri["current_level"]
-                or ri["residual_proba"] < ri["current_proba"]
-                or ri["residual_impact"] < ri["current_impact"]
-            ):
-                if (
-                    len(ri.get("applied_controls", {})) == 0
-                    and ri["residual_level"] >= 0
-                ):
-                    errors_lst.append(
-                        {
-                            "msg": _(
-                                "{}: residual risk level has been lowered without any specific measure"
-                            ).format(ri["name"]),
-                            "msgid": "riskScenarioResidualLoweredWithoutMeasures",
-                            "link": f"risk-scenarios/{ri['id']}",
-                            "obj_type": "riskscenario",
-                            "object": ri,
-                        }
-                    )
-
-            if ri["treatment"] == "accepted":
-                if not ri.get("riskacceptance_set", {}).get("exists", lambda: False)():
-                    warnings_lst.append(
-                        {
-                            "msg": _(
-                                "{} risk accepted but no risk acceptance attached"
-                            ).format(ri),
-                            "msgid": "riskScenarioAcceptedNoAcceptance",
-                            "link": f"risk-scenarios/{ri['id']}",
-                            "obj_type": "riskscenario",
-                            "object": ri,
-                        }
-                    )
         # --- checks on the applied controls
-        _measures = serializers.serialize(
-            "json",
+        not_active = ~Q(status="active")
+        collect_quality_findings(
+            findings,
             AppliedControl.objects.filter(
                 risk_scenarios__risk_assessment=self
-            ).order_by("created_at"),
+            ).distinct(),
+            [
+                {
+                    "level": "warnings",
+                    "msgid": "appliedControlNoETA",
+                    "msg": _("{} does not have an ETA"),
+                    "condition": Q(eta__isnull=True) & not_active,
+                },
+                {
+                    "level": "errors",
+                    "msgid": "appliedControlETAInPast",
+                    "msg": _(
+                        "{} ETA is in the past now. Consider updating its status or the date"
+                    ),
+                    "condition": Q(eta__lt=date.today()) & not_active,
+                },
+                {
+                    "level": "warnings",
+                    "msgid": "appliedControlNoEffort",
+                    "msg": _(
+                        "{} does not have an estimated effort. This will help you for prioritization"
+                    ),
+                    "condition": Q(effort__isnull=True) | Q(effort=""),
+                },
+                {
+                    "level": "warnings",
+                    "msgid": "appliedControlNoCost",
+                    "msg": _(
+                        "{} does not have an estimated cost. This will help you for prioritization"
+                    ),
+                    "condition": Q(cost__isnull=True) | Q(cost=0),
+                },
+                {
+                    "level": "info",
+                    "msgid": "appliedControlNoLink",
+                    "msg": _(
+                        "{}: Applied control does not have an external link attached. This will help you for follow-up"
+                    ),
+                    "condition": Q(link__isnull=True) | Q(link=""),
+                },
+            ],
+            "appliedcontrol",
+            "applied-controls",
         )
-        measures = [x["fields"] for x in json.loads(_measures)]
-        for i in range(len(measures)):
-            measures[i]["id"] = json.loads(_measures)[i]["pk"]
-
-        for mtg in measures:
-            if not mtg["eta"] and not mtg["status"] == "active":
-                warnings_lst.append(
-                    {
-                        "msg": _("{} does not have an ETA").format(mtg["name"]),
-                        "msgid": "appliedControlNoETA",
-                        "link": f"applied-controls/{mtg['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": {"name": mtg["name"], "id": mtg["id"]},
-                    }
-                )
-            elif mtg["eta"] and not mtg["status"] == "active":
-                if date.today() > datetime.strptime(mtg["eta"], "%Y-%m-%d").date():
-                    errors_lst.append(
-                        {
-                            "msg": _(
-                                "{} ETA is in the past now. Consider updating its status or the date"
-                            ).format(mtg["name"]),
-                            "msgid": "appliedControlETAInPast",
-                            "link": f"applied-controls/{mtg['id']}",
-                            "obj_type": "appliedcontrol",
-                            "object": {"name": mtg["name"], "id": mtg["id"]},
-                        }
-                    )
-
-            if not mtg["effort"]:
-                warnings_lst.append(
-                    {
-                        "msg": _(
-                            "{} does not have an estimated effort. This will help you for prioritization"
-                        ).format(mtg["name"]),
-                        "msgid": "appliedControlNoEffort",
-                        "link": f"applied-controls/{mtg['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": {"name": mtg["name"], "id": mtg["id"]},
-                    }
-                )
-
-            if not mtg["cost"]:
-                warnings_lst.append(
-                    {
-                        "msg": _(
-                            "{} does not have an estimated cost. This will help you for prioritization"
-                        ).format(mtg["name"]),
-                        "msgid": "appliedControlNoCost",
-                        "link": f"applied-controls/{mtg['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": {"name": mtg["name"], "id": mtg["id"]},
-                    }
-                )
-
-            if not mtg["link"]:
-                info_lst.append(
-                    {
-                        "msg": _(
-                            "{}: Applied control does not have an external link attached. This will help you for follow-up"
-                        ).format(mtg["name"]),
-                        "msgid": "appliedControlNoLink",
-                        "link": f"applied-controls/{mtg['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": {"name": mtg["name"], "id": mtg["id"]},
-                    }
-                )
-
         # --- checks on the risk acceptances
-        _acceptances = serializers.serialize(
-            "json",
-            RiskAcceptance.objects.filter(risk_scenarios__risk_assessment=self)
-            .distinct()
-            .order_by("created_at"),
+        collect_quality_findings(
+            findings,
+            RiskAcceptance.objects.filter(
+                risk_scenarios__risk_assessment=self
+            ).distinct(),
+            [
+                {
+                    "level": "warnings",
+                    "msgid": "riskAcceptanceNoExpiryDate",
+                    "msg": _("{}: Acceptance has no expiry date"),
+                    "condition": Q(expiry_date__isnull=True),
+                },
+                {
+                    "level": "errors",
+                    "msgid": "riskAcceptanceExpired",
+                    "msg": _(
+                        "{}: Acceptance has expired. Consider updating the status or the date"
+                    ),
+                    "condition": Q(expiry_date__lt=date.today()),
+                },
+            ],
+            "riskacceptance",
+            "risk-acceptances",
         )
-        acceptances = [x["fields"] for x in json.loads(_acceptances)]
-        for i in range(len(acceptances)):
-            acceptances[i]["id"] = json.loads(_acceptances)[i]["pk"]
-        for ra in acceptances:
-            if not ra["expiry_date"]:
-                warnings_lst.append(
-                    {
-                        "msg": _("{}: Acceptance has no expiry date").format(
-                            ra["name"]
-                        ),
-                        "msgid": "riskAcceptanceNoExpiryDate",
-                        "link": f"risk-acceptances/{ra['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": ra,
-                    }
-                )
-                continue
-            if date.today() > datetime.strptime(ra["expiry_date"], "%Y-%m-%d").date():
-                errors_lst.append(
-                    {
-                        "msg": _(
-                            "{}: Acceptance has expired. Consider updating the status or the date"
-                        ).format(ra["name"]),
-                        "msgid": "riskAcceptanceExpired",
-                        "link": f"risk-acceptances/{ra['id']}",
-                        "obj_type": "riskacceptance",
-                        "object": ra,
-                    }
-                )
-
-        findings = {
-            "errors": errors_lst,
-            "warnings": warnings_lst,
-            "info": info_lst,
-            "count": sum([len(errors_lst), len(warnings_lst), len(info_lst)]),
-        }
         return findings
 
     # NOTE: if your save() method throws an exception, you might want to override the clean() method to prevent
@@ -1784,12 +2090,12 @@ class RiskAssessment(Assessment):
 
 
 def risk_scoring(probability, impact, risk_matrix: RiskMatrix) -> int:
-    fields = json.loads(risk_matrix.json_definition)
-    risk_index = fields["grid"][probability][impact]
-    return risk_index
+    return risk_matrix.compile().score(probability, impact)
+
 
+class RiskScenario(NameDescriptionMixin, FolderPathMixin):
+    folder_path = "risk_assessment__project__folder"
 
-class RiskScenario(NameDescriptionMixin):
     TREATMENT_OPTIONS = [
         ("open", _("Open")),
         ("mitigate", _("Mitigate")),
@@ -1943,7 +2249,8 @@ class RiskScenario(NameDescriptionMixin):
     parent_project.short_description = _("Project")
 
     def get_matrix(self):
-        return self.risk_assessment.risk_matrix.parse_json_translated()
+        """Returns a copy of the translated risk matrix, the compiled one being shared"""
+        return copy.deepcopy(self.risk_assessment.risk_matrix.compile().translated)
 
     def get_current_risk(self):
         if self.current_level < 0:
@@ -1954,13 +2261,10 @@ class RiskScenario(NameDescriptionMixin):
                 "hexcolor": "#A9A9A9",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
-        current_risk = {
-            **risk_matrix["risk"][self.current_level],
+        return {
+            **self.risk_assessment.risk_matrix.compile().risk[self.current_level],
             "value": self.current_level,
         }
-        update_translations_in_object(current_risk)
-        return current_risk
 
     def get_current_impact(self):
         if self.current_impact < 0:
@@ -1970,9 +2274,8 @@ class RiskScenario(NameDescriptionMixin):
                 "description": "not rated",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
         return {
-            **risk_matrix["impact"][self.current_impact],
+            **self.risk_assessment.risk_matrix.compile().impact[self.current_impact],
             "value": self.current_impact,
         }
 
@@ -1984,9 +2287,10 @@ class RiskScenario(NameDescriptionMixin):
                 "description": "not rated",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
         return {
-            **risk_matrix["probability"][self.current_proba],
+            **self.risk_assessment.risk_matrix.compile().probability[
+                self.current_proba
+            ],
             "value": self.current_proba,
         }
 
@@ -1999,13 +2303,10 @@ class RiskScenario(NameDescriptionMixin):
                 "hexcolor": "#A9A9A9",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
-        residual_risk = {
-            **risk_matrix["risk"][self.residual_level],
+        return {
+            **self.risk_assessment.risk_matrix.compile().risk[self.residual_level],
             "value": self.residual_level,
         }
-        update_translations_in_object(residual_risk)
-        return residual_risk
 
     def get_residual_impact(self):
         if self.residual_impact < 0:
@@ -2015,9 +2316,8 @@ class RiskScenario(NameDescriptionMixin):
                 "description": "not rated",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
         return {
-            **risk_matrix["impact"][self.residual_impact],
+            **self.risk_assessment.risk_matrix.compile().impact[self.residual_impact],
             "value": self.residual_impact,
         }
 
@@ -2029,9 +2329,10 @@ class RiskScenario(NameDescriptionMixin):
                 "description": "not rated",
                 "value": -1,
             }
-        risk_matrix = self.get_matrix()
         return {
-            **risk_matrix["probability"][self.residual_proba],
+            **self.risk_assessment.risk_matrix.compile().probability[
+                self.residual_proba
+            ],
             "value": self.residual_proba,
         }
 
@@ -2048,6 +2349,73 @@ class RiskScenario(NameDescriptionMixin):
         """return associated risk assessment id"""
         return f"R.{self.scoped_id(scope=RiskScenario.objects.filter(risk_assessment=self.risk_assessment))}"
 
+    @staticmethod
+    def recompute_levels(queryset: models.QuerySet | None = None) -> int:
+        """
+        Recomputes the current and residual levels of the scenarios from the grid of their risk matrix
+        The (probability, impact) pairs of all the scenarios are read in one query, mapped through
+        the compiled grids and only the scenarios whose levels changed are written back with bulk_update
+        Pairs outside of the grid are considered as not rated
+        Returns the number of updated scenarios
+        """
+        queryset = RiskScenario.objects.all() if queryset is None else queryset
+        rows = list(
+            queryset.values_list(
+                "id",
+                "risk_assessment__risk_matrix",
+                "current_proba",
+                "current_impact",
+                "current_level",
+                "residual_proba",
+                "residual_impact",
+                "residual_level",
+            )
+        )
+        grids = {
+            risk_matrix.id: risk_matrix.compile().grid
+            for risk_matrix in RiskMatrix.objects.filter(
+                id__in={row[1] for row in rows}
+            )
+        }
+
+        def get_level(grid, probability, impact):
+            if 0 <= probability < len(grid) and 0 <= impact < len(grid[probability]):
+                return grid[probability][impact]
+            return -1
+
+        timestamp = now()
+        scenarios = []
+        for (
+            id,
+            risk_matrix_id,
+            current_proba,
+            current_impact,
+            current_level,
+            residual_proba,
+            residual_impact,
+            residual_level,
+        ) in rows:
+            grid = grids[risk_matrix_id]
+            levels = (
+                get_level(grid, current_proba, current_impact),
+                get_level(grid, residual_proba, residual_impact),
+            )
+            if levels != (current_level, residual_level):
+                scenarios.append(
+                    RiskScenario(
+                        id=id,
+                        current_level=levels[0],
+                        residual_level=levels[1],
+                        updated_at=timestamp,
+                    )
+                )
+        RiskScenario.objects.bulk_update(
+            scenarios,
+            ["current_level", "residual_level", "updated_at"],
+            batch_size=1000,
+        )
+        return len(scenarios)
+
     def save(self, *args, **kwargs):
         if self.current_proba >= 0 and self.current_impact >= 0:
             self.current_level = risk_scoring(
@@ -2065,6 +2433,7 @@ class RiskScenario(NameDescriptionMixin):
             )
         else:
             self.residual_level = -1
+        self.folder_id = self.risk_assessment.project.folder_id
         super(RiskScenario, self).save(*args, **kwargs)
 
 
@@ -2092,62 +2461,74 @@ class ComplianceAssessment(Assessment):
             self.max_score = self.framework.max_score
             self.scores_definition = self.framework.scores_definition
         super().save(*args, **kwargs)
+        RequirementAssessment.objects.filter(compliance_assessment=self).exclude(
+            folder=self.folder
+        ).update(folder=self.folder)
 
     def create_requirement_assessments(
         self, baseline: Self | None = None
     ) -> list["RequirementAssessment"]:
+        """
+        Creates the requirement assessments of all the requirements of the framework in bulk
+        If a baseline on the same framework is given, its results, scores, evidences and applied controls are copied
+        """
         requirements = RequirementNode.objects.filter(framework=self.framework)
+        baseline_requirement_assessments = (
+            {
+                ra.requirement_id: ra
+                for ra in RequirementAssessment.objects.filter(
+                    compliance_assessment=baseline
+                )
+            }
+            if baseline and baseline.framework == self.framework
+            else {}
+        )
         requirement_assessments = []
         for requirement in requirements:
-            requirement_assessment = RequirementAssessment.objects.create(
+            requirement_assessment = RequirementAssessment(
                 compliance_assessment=self,
                 requirement=requirement,
-                folder=Folder.objects.get(id=self.folder.id),
+                folder=self.folder,
                 answer=transform_question_to_answer(requirement.question)
                 if requirement.question
                 else {},
             )
-            if baseline and baseline.framework == self.framework:
-                baseline_requirement_assessment = RequirementAssessment.objects.get(
-                    compliance_assessment=baseline, requirement=requirement
-                )
+            baseline_requirement_assessment = baseline_requirement_assessments.get(
+                requirement.id
+            )
+            if baseline_requirement_assessment:
                 requirement_assessment.result = baseline_requirement_assessment.result
                 requirement_assessment.status = baseline_requirement_assessment.status
                 requirement_assessment.score = baseline_requirement_assessment.score
                 requirement_assessment.is_scored = (
                     baseline_requirement_assessment.is_scored
                 )
-                requirement_assessment.evidences.set(
-                    baseline_requirement_assessment.evidences.all()
-                )
-                requirement_assessment.applied_controls.set(
-                    baseline_requirement_assessment.applied_controls.all()
-                )
-                requirement_assessment.save()
             requirement_assessments.append(requirement_assessment)
+
+        with transaction.atomic():
+            RequirementAssessment.objects.bulk_create(requirement_assessments)
+            if baseline_requirement_assessments:
+                RequirementAssessment.copy_related_objects(
+                    [
+                        (baseline_requirement_assessments[ra.requirement_id].id, ra.id)
+                        for ra in requirement_assessments
+                        if ra.requirement_id in baseline_requirement_assessments
+                    ]
+                )
+            ComplianceAssessmentSummary.refresh(self)
         return requirement_assessments
 
+    def get_summary(self) -> "ComplianceAssessmentSummary":
+        """Returns the summary of the requirement assessments, computing it if it does not exist yet"""
+        summary = ComplianceAssessmentSummary.objects.filter(
+            compliance_assessment=self
+        ).first()
+        return summary or ComplianceAssessmentSummary.refresh(self)
+
     def get_global_score(self):
-        requirement_assessments_scored = (
-            RequirementAssessment.objects.filter(compliance_assessment=self)
-            .exclude(score=None)
-            .exclude(status=RequirementAssessment.Result.NOT_APPLICABLE)
-            .exclude(is_scored=False)
-            .exclude(requirement__assessable=False)
-        )
-        ig = (
-            set(self.selected_implementation_groups)
-            if self.selected_implementation_groups
-            else None
-        )
-        score = 0
-        n = 0
-        for ras in requirement_assessments_scored:
-            if not (ig) or (ig & set(ras.requirement.implementation_groups)):
-                score += ras.score
-                n += 1
-        if n > 0:
-            return round(score / n, 1)
+        totals = self.get_summary().get_totals(self.selected_implementation_groups)
+        if totals["scored_count"] > 0:
+            return round(totals["score_sum"] / totals["scored_count"], 1)
         else:
             return -1
 
@@ -2169,29 +2550,49 @@ class ComplianceAssessment(Assessment):
         Returns sorted assessable requirement assessments based on the selected implementation groups.
         If include_non_assessable is True, it returns all requirements regardless of their assessable status.
         """
-        if not self.selected_implementation_groups:
-            requirements = RequirementAssessment.objects.filter(
-                compliance_assessment=self
-            )
-            if not include_non_assessable:
-                requirements = requirements.filter(requirement__assessable=True)
-            return requirements.order_by("requirement__order_id")
-
-        selected_implementation_groups_set = set(self.selected_implementation_groups)
         requirements = RequirementAssessment.objects.filter(compliance_assessment=self)
         if not include_non_assessable:
             requirements = requirements.filter(requirement__assessable=True)
 
-        requirements = requirements.order_by("requirement__order_id")
+        if self.selected_implementation_groups:
+            selected_implementation_groups_set = set(
+                self.selected_implementation_groups
+            )
+            requirements = requirements.filter(
+                requirement__in=[
+                    requirement_id
+                    for requirement_id, implementation_groups in RequirementNode.objects.filter(
+                        framework=self.framework
+                    ).values_list("id", "implementation_groups")
+                    if selected_implementation_groups_set
+                    & set(implementation_groups or [])
+                ]
+            )
 
-        requirement_assessments_list = [
-            requirement
-            for requirement in requirements
-            if selected_implementation_groups_set
-            & set(requirement.requirement.implementation_groups)
-        ]
+        return requirements.order_by("requirement__order_id")
 
-        return requirement_assessments_list
+    def get_action_plan(self) -> models.QuerySet:
+        """
+        Returns the applied controls of the requirement assessments in scope, ordered by ETA,
+        with their owners and the number of requirement assessments of the audit they are applied to
+        as requirements_count
+        """
+        return (
+            AppliedControl.objects.filter(
+                id__in=AppliedControl.objects.filter(
+                    requirement_assessments__in=self.get_requirement_assessments()
+                ).values("id")
+            )
+            .annotate(
+                requirements_count=models.Count(
+                    "requirement_assessments",
+                    filter=Q(requirement_assessments__compliance_assessment=self),
+                    distinct=True,
+                )
+            )
+            .prefetch_related("owner")
+            .order_by("eta")
+        )
 
     def get_requirements_status_count(self):
         requirements_status_count = []
@@ -2225,13 +2626,6 @@ class ComplianceAssessment(Assessment):
         return measures_status_count
 
     def donut_render(self) -> dict:
-        def union_queries(base_query, groups, field_name):
-            queries = [
-                base_query.filter(**{f"{field_name}__icontains": group}).distinct()
-                for group in groups
-            ]
-            return queries[0].union(*queries[1:]) if queries else base_query.none()
-
         color_map = {
             RequirementAssessment.Result.NOT_ASSESSED: "#d1d5db",
             RequirementAssessment.Result.NON_COMPLIANT: "#f87171",
@@ -2243,85 +2637,42 @@ class ComplianceAssessment(Assessment):
             RequirementAssessment.Status.IN_REVIEW: "#3b82f6",
             RequirementAssessment.Status.DONE: "#86efac",
         }
+        totals = self.get_summary().get_totals(self.selected_implementation_groups)
 
-        compliance_assessments_result = {"values": [], "labels": []}
-        for result in RequirementAssessment.Result.values:
-            assessable_requirements_filter = {
-                "compliance_assessment": self,
-                "requirement__assessable": True,
-            }
-
-            base_query = RequirementAssessment.objects.filter(
-                result=result, **assessable_requirements_filter
-            ).distinct()
-
-            if self.selected_implementation_groups:
-                union_query = union_queries(
-                    base_query,
-                    self.selected_implementation_groups,
-                    "requirement__implementation_groups",
-                )
-            else:
-                union_query = base_query
-
-            count = union_query.count()
-            value_entry = {
-                "name": result,
-                "localName": camel_case(result),
-                "value": count,
-                "itemStyle": {"color": color_map[result]},
-            }
-
-            compliance_assessments_result["values"].append(value_entry)
-            compliance_assessments_result["labels"].append(result)
-
-        compliance_assessments_status = {"values": [], "labels": []}
-        for status in RequirementAssessment.Status.values:
-            assessable_requirements_filter = {
-                "compliance_assessment": self,
-                "requirement__assessable": True,
-            }
-
-            base_query = RequirementAssessment.objects.filter(
-                status=status, **assessable_requirements_filter
-            ).distinct()
-
-            if self.selected_implementation_groups:
-                union_query = union_queries(
-                    base_query,
-                    self.selected_implementation_groups,
-                    "requirement__implementation_groups",
-                )
-            else:
-                union_query = base_query
-
-            count = union_query.count()
-            value_entry = {
-                "name": status,
-                "localName": camel_case(status),
-                "value": count,
-                "itemStyle": {"color": color_map[status]},
+        def render(counter: str, values: list[str]) -> dict:
+            return {
+                "values": [
+                    {
+                        "name": value,
+                        "localName": camel_case(value),
+                        "value": totals[counter].get(value, 0),
+                        "itemStyle": {"color": color_map[value]},
+                    }
+                    for value in values
+                ],
+                "labels": list(values),
             }
 
-            compliance_assessments_status["values"].append(value_entry)
-            compliance_assessments_status["labels"].append(status)
-
         return {
-            "result": compliance_assessments_result,
-            "status": compliance_assessments_status,
+            "result": render("result", RequirementAssessment.Result.values),
+            "status": render("status", RequirementAssessment.Status.values),
         }
 
-    def quality_check(self) -> dict:
-        AppliedControl = apps.get_model("core", "AppliedControl")
+    quality_check_dependencies = [
+        ("RequirementAssessment", "compliance_assessment"),
+        ("AppliedControl", "requirement_assessments__compliance_assessment"),
+        (
+            "Evidence",
+            "applied_controls__requirement_assessments__compliance_assessment",
+        ),
+    ]
 
-        errors_lst = list()
-        warnings_lst = list()
-        info_lst = list()
+    def get_quality_findings(self) -> dict:
+        findings = {"errors": [], "warnings": [], "info": []}
         # --- check on the assessment:
-        _object = serializers.serialize("json", [self])
-        _object = json.loads(_object)
+        _object = json.loads(serializers.serialize("json", [self]))
         if self.status == Assessment.Status.IN_PROGRESS:
-            info_lst.append(
+            findings["info"].append(
                 {
                     "msg": _("{}: Compliance assessment is still in progress").format(
                         str(self)
@@ -2332,8 +2683,8 @@ class ComplianceAssessment(Assessment):
                 }
             )
 
-        if not self.authors.all():
-            info_lst.append(
+        if not _object[0]["fields"]["authors"]:
+            findings["info"].append(
                 {
                     "msg": _(
                         "{}: No author assigned to this compliance assessment"
@@ -2346,139 +2697,131 @@ class ComplianceAssessment(Assessment):
         # ---
 
         # --- check on requirement assessments:
-        _requirement_assessments = self.requirement_assessments.all().order_by(
-            "created_at"
+        collect_quality_findings(
+            findings,
+            self.requirement_assessments.select_related("requirement"),
+            [
+                {
+                    "level": "warnings",
+                    "msgid": "requirementAssessmentNoAppliedControl",
+                    "msg": _(
+                        "{}: Requirement assessment result is compliant or partially compliant with no applied control applied"
+                    ),
+                    "condition": Q(result__in=("compliant", "partially_compliant"))
+                    & ~models.Exists(
+                        AppliedControl.objects.filter(
+                            requirement_assessments=models.OuterRef("pk")
+                        )
+                    ),
+                },
+            ],
+            "requirementassessment",
+            "requirement-assessments",
         )
-        requirement_assessments = []
-        for ra in _requirement_assessments:
-            ra_dict = json.loads(serializers.serialize("json", [ra]))[0]["fields"]
-            ra_dict["name"] = str(ra)
-            ra_dict["id"] = ra.id
-            requirement_assessments.append(ra_dict)
-        for requirement_assessment in requirement_assessments:
-            if (
-                requirement_assessment["result"] in ("compliant", "partially_compliant")
-                and len(requirement_assessment["applied_controls"]) == 0
-            ):
-                warnings_lst.append(
-                    {
-                        "msg": _(
-                            "{}: Requirement assessment result is compliant or partially compliant with no applied control applied"
-                        ).format(requirement_assessment["name"]),
-                        "msgid": "requirementAssessmentNoAppliedControl",
-                        "link": f"requirement-assessments/{requirement_assessment['id']}",
-                        "obj_type": "requirementassessment",
-                        "object": requirement_assessment,
-                    }
-                )
         # ---
 
         # --- check on applied controls:
-        _applied_controls = serializers.serialize(
-            "json",
-            AppliedControl.objects.filter(
-                requirement_assessments__compliance_assessment=self
-            ).order_by("created_at"),
+        applied_controls = AppliedControl.objects.filter(
+            requirement_assessments__compliance_assessment=self
+        )
+        collect_quality_findings(
+            findings,
+            applied_controls.distinct(),
+            [
+                {
+                    "level": "info",
+                    "msgid": "appliedControlNoReferenceControl",
+                    "msg": _("{}: Applied control has no reference control selected"),
+                    "condition": Q(reference_control__isnull=True),
+                },
+            ],
+            "appliedcontrol",
+            "applied-controls",
         )
-        applied_controls = [x["fields"] for x in json.loads(_applied_controls)]
-        for i in range(len(applied_controls)):
-            applied_controls[i]["id"] = json.loads(_applied_controls)[i]["pk"]
-        for applied_control in applied_controls:
-            if not applied_control["reference_control"]:
-                info_lst.append(
-                    {
-                        "msg": _(
-                            "{}: Applied control has no reference control selected"
-                        ).format(applied_control["name"]),
-                        "msgid": "appliedControlNoReferenceControl",
-                        "link": f"applied-controls/{applied_control['id']}",
-                        "obj_type": "appliedcontrol",
-                        "object": applied_control,
-                    }
-                )
         # ---
 
         # --- check on evidence:
-        _evidences = serializers.serialize(
-            "json",
-            Evidence.objects.filter(
-                applied_controls__in=AppliedControl.objects.filter(
-                    requirement_assessments__compliance_assessment=self
-                )
-            ).order_by("created_at"),
+        collect_quality_findings(
+            findings,
+            Evidence.objects.filter(applied_controls__in=applied_controls).distinct(),
+            [
+                {
+                    "level": "warnings",
+                    "msgid": "evidenceNoFile",
+                    "msg": _("{}: Evidence has no file uploaded"),
+                    "condition": Q(attachment__isnull=True) | Q(attachment=""),
+                },
+            ],
+            "evidence",
+            "evidences",
         )
-        evidences = [x["fields"] for x in json.loads(_evidences)]
-        for i in range(len(evidences)):
-            evidences[i]["id"] = json.loads(_evidences)[i]["pk"]
-        for evidence in evidences:
-            if not evidence["attachment"]:
-                warnings_lst.append(
-                    {
-                        "msg": _("{}: Evidence has no file uploaded").format(
-                            evidence["name"]
-                        ),
-                        "msgid": "evidenceNoFile",
-                        "link": f"evidences/{evidence['id']}",
-                        "obj_type": "evidence",
-                        "object": evidence,
-                    }
-                )
-
-        findings = {
-            "errors": errors_lst,
-            "warnings": warnings_lst,
-            "info": info_lst,
-            "count": sum([len(errors_lst), len(warnings_lst), len(info_lst)]),
-        }
         return findings
 
     def compute_requirement_assessments_results(
-        self, mapping_set: RequirementMappingSet, source_assessment: Self
+        self, mapping_set: RequirementMappingSet | None, source_assessment: Self
     ) -> list["RequirementAssessment"]:
+        """
+        Infers the results of the requirement assessments from a source assessment through a mapping set
+        If no mapping set is given, the transitive mappings between the two frameworks are used
+        The mappings and the source requirement assessments are loaded once, inferences are computed in memory
+        Returns the requirement assessments with an inferred result, modified but not saved
+        """
         requirement_assessments: list[RequirementAssessment] = []
+        mappings = (
+            mapping_set.mappings.all()
+            if mapping_set
+            else TransitiveRequirementMapping.objects.filter(
+                source_framework=source_assessment.framework,
+                target_framework=self.framework,
+            )
+        )
         result_order = (
             RequirementAssessment.Result.NON_COMPLIANT,
             RequirementAssessment.Result.PARTIALLY_COMPLIANT,
             RequirementAssessment.Result.COMPLIANT,
         )
+        mappings_per_target = defaultdict(list)
+        for mapping in mappings:
+            mappings_per_target[mapping.target_requirement_id].append(mapping)
+        source_requirement_assessments = {
+            ra.requirement_id: ra
+            for ra in RequirementAssessment.objects.filter(
+                compliance_assessment=source_assessment
+            ).select_related("requirement")
+        }
         for requirement_assessment in self.requirement_assessments.all():
-            mappings = mapping_set.mappings.filter(
-                target_requirement=requirement_assessment.requirement
+            mappings = mappings_per_target.get(
+                requirement_assessment.requirement_id, []
             )
+            full_coverage_mappings = [
+                mapping
+                for mapping in mappings
+                if mapping.relationship
+                in RequirementMapping.FULL_COVERAGE_RELATIONSHIPS
+            ]
+            if full_coverage_mappings:
+                mappings = full_coverage_mappings
             inferences = []
             refs = []
-            if mappings.filter(
-                relationship__in=RequirementMapping.FULL_COVERAGE_RELATIONSHIPS
-            ).exists():
-                mappings = mappings.filter(
-                    relationship__in=RequirementMapping.FULL_COVERAGE_RELATIONSHIPS
-                )
             for mapping in mappings:
-                source_requirement_assessment = RequirementAssessment.objects.get(
-                    compliance_assessment=source_assessment,
-                    requirement=mapping.source_requirement,
+                source_requirement_assessment = source_requirement_assessments.get(
+                    mapping.source_requirement_id
                 )
+                if source_requirement_assessment is None:
+                    continue
                 inferred_result, inferred_status = requirement_assessment.infer_result(
                     mapping=mapping,
                     source_requirement_assessment=source_requirement_assessment,
                 )
                 if inferred_result in result_order:
                     inferences.append((inferred_result, inferred_status))
-                    refs.append(source_requirement_assessment)
+                    refs.append((source_requirement_assessment, mapping))
             if inferences:
-                if len(inferences) == 1:
-                    requirement_assessment.result = inferences[0][0]
-                    if inferences[0][1]:
-                        requirement_assessment.status = inferences[0][1]
-                    ref = refs[0]
-                else:
-                    lowest_result = min(
-                        inferences, key=lambda x: result_order.index(x[0])
-                    )
-                    requirement_assessment.result = lowest_result[0]
-                    if lowest_result[1]:
-                        requirement_assessment.status = lowest_result[1]
-                    ref = refs[inferences.index(lowest_result)]
+                lowest_result = min(inferences, key=lambda x: result_order.index(x[0]))
+                requirement_assessment.result = lowest_result[0]
+                if lowest_result[1]:
+                    requirement_assessment.status = lowest_result[1]
+                ref, mapping = refs[inferences.index(lowest_result)]
                 requirement_assessment.mapping_inference = {
                     "result": requirement_assessment.result,
                     "source_requirement_assessment": {
@@ -2491,6 +2834,37 @@ class ComplianceAssessment(Assessment):
                 requirement_assessments.append(requirement_assessment)
         return requirement_assessments
 
+    def apply_mapping_inference(
+        self, mapping_set: RequirementMappingSet | None, source_assessment: Self
+    ) -> list["RequirementAssessment"]:
+        """
+        Saves the results inferred by compute_requirement_assessments_results in bulk,
+        and copies the evidences and applied controls of the source requirement assessments
+        """
+        requirement_assessments = self.compute_requirement_assessments_results(
+            mapping_set, source_assessment
+        )
+        with transaction.atomic():
+            for requirement_assessment in requirement_assessments:
+                requirement_assessment.updated_at = now()
+            RequirementAssessment.objects.bulk_update(
+                requirement_assessments,
+                ["result", "status", "mapping_inference", "updated_at"],
+            )
+            RequirementAssessment.copy_related_objects(
+                [
+                    (
+                        UUID(
+                            ra.mapping_inference["source_requirement_assessment"]["id"]
+                        ),
+                        ra.id,
+                    )
+                    for ra in requirement_assessments
+                ]
+            )
+            ComplianceAssessmentSummary.refresh(self)
+        return requirement_assessments
+
 
 class RequirementAssessment(AbstractBaseModel, FolderMixin, ETADueDateMixin):
     class Status(models.TextChoices):
@@ -2631,11 +3005,257 @@ class RequirementAssessment(AbstractBaseModel, FolderMixin, ETADueDateMixin):
             self.applied_controls.add(*applied_controls)
         return applied_controls
 
+    @staticmethod
+    def copy_related_objects(source_and_target_ids: list[tuple]) -> None:
+        """Copies the evidences and applied controls of requirement assessments to other ones in bulk
+        source_and_target_ids is a list of (source requirement assessment id, target requirement assessment id)
+        """
+        target_ids_per_source_id = defaultdict(list)
+        for source_id, target_id in source_and_target_ids:
+            target_ids_per_source_id[source_id].append(target_id)
+        for field_name, related_field in (
+            ("evidences", "evidence_id"),
+            ("applied_controls", "appliedcontrol_id"),
+        ):
+            through = getattr(RequirementAssessment, field_name).through
+            through.objects.bulk_create(
+                [
+                    through(
+                        requirementassessment_id=target_id,
+                        **{related_field: related_id},
+                    )
+                    for source_id, related_id in through.objects.filter(
+                        requirementassessment_id__in=list(target_ids_per_source_id)
+                    ).values_list("requirementassessment_id", related_field)
+                    for target_id in target_ids_per_source_id[source_id]
+                ],
+                ignore_conflicts=True,
+            )
+
+    @staticmethod
+    def bulk_apply_changes(changes: list[tuple["RequirementAssessment", dict]]) -> None:
+        """
+        Applies validated changes to requirement assessments with a single bulk_update
+        Changes may contain result, status, score, observation and applied_controls (ids), the latter
+        replacing the applied controls of the requirement assessment with bulk inserts
+        The summaries of the compliance assessments involved are refreshed
+        """
+        fields = {"updated_at"}
+        applied_controls = {}
+        timestamp = now()
+        for requirement_assessment, data in changes:
+            for field, value in data.items():
+                if field == "applied_controls":
+                    applied_controls[requirement_assessment.id] = value
+                    continue
+                setattr(requirement_assessment, field, value)
+                fields.add(field)
+            requirement_assessment.updated_at = timestamp
+        through = RequirementAssessment.applied_controls.through
+        with transaction.atomic():
+            RequirementAssessment.objects.bulk_update(
+                [requirement_assessment for requirement_assessment, _ in changes],
+                sorted(fields),
+                batch_size=500,
+            )
+            if applied_controls:
+                through.objects.filter(
+                    requirementassessment_id__in=applied_controls
+                ).delete()
+                through.objects.bulk_create(
+                    [
+                        through(
+                            requirementassessment_id=requirement_assessment_id,
+                            appliedcontrol_id=applied_control_id,
+                        )
+                        for requirement_assessment_id, ids in applied_controls.items()
+                        for applied_control_id in set(ids)
+                    ],
+                    batch_size=1000,
+                )
+            for compliance_assessment in {
+                requirement_assessment.compliance_assessment
+                for requirement_assessment, _changes in changes
+            }:
+                ComplianceAssessmentSummary.refresh(compliance_assessment)
+
+    @staticmethod
+    def get_summary_values_of(result, status, score, is_scored) -> tuple:
+        """Returns the (result, status, score) of a requirement assessment, as counted in the summary
+        The score is None if the requirement assessment is not scored
+        """
+        return (result, status, score if is_scored and score is not None else None)
+
+    def get_summary_values(self) -> tuple:
+        return RequirementAssessment.get_summary_values_of(
+            self.result, self.status, self.score, self.is_scored
+        )
+
+    def get_stored_summary_values(self) -> tuple:
+        """Locks the row of the requirement assessment and returns its stored summary values
+        Returns () if the row does not exist yet
+        """
+        row = (
+            RequirementAssessment.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list("result", "status", "score", "is_scored")
+            .first()
+        )
+        return RequirementAssessment.get_summary_values_of(*row) if row else ()
+
+    def save(self, *args, **kwargs) -> None:
+        with transaction.atomic():
+            # read the stored values under lock, the loaded ones may be stale after a concurrent save
+            previous = () if self._state.adding else self.get_stored_summary_values()
+            super().save(*args, **kwargs)
+            ComplianceAssessmentSummary.update(self, previous)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            ComplianceAssessmentSummary.refresh(self.compliance_assessment)
+        return result
+
     class Meta:
         verbose_name = _("Requirement assessment")
         verbose_name_plural = _("Requirement assessments")
 
 
+class ComplianceAssessmentSummary(models.Model):
+    """
+    Counters of the assessable requirement assessments of a compliance assessment
+    Counters are grouped by the implementation groups of the requirements,
+    so that they can be summed for any selection of implementation groups:
+    {"<implementation groups>": {"result": {...}, "status": {...}, "score_sum": int, "scored_count": int}}
+    Maintained by RequirementAssessment.save, refresh must be called after bulk updates
+    """
+
+    compliance_assessment = models.OneToOneField(
+        ComplianceAssessment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="summary",
+    )
+    counters = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = _("Compliance assessment summary")
+        verbose_name_plural = _("Compliance assessment summaries")
+
+    @staticmethod
+    def get_key(implementation_groups: list | None) -> str:
+        return ",".join(sorted(implementation_groups or []))
+
+    @staticmethod
+    def empty_counters() -> dict:
+        return {
+            "result": {result: 0 for result in RequirementAssessment.Result.values},
+            "status": {status: 0 for status in RequirementAssessment.Status.values},
+            "score_sum": 0,
+            "scored_count": 0,
+        }
+
+    @staticmethod
+    def compute(compliance_assessment: ComplianceAssessment) -> dict:
+        """Aggregates the counters of a compliance assessment in a single query"""
+        scored = Q(is_scored=True, score__isnull=False)
+        counters = {}
+        for row in (
+            RequirementAssessment.objects.filter(
+                compliance_assessment=compliance_assessment,
+                requirement__assessable=True,
+            )
+            .values("requirement__implementation_groups", "result", "status")
+            .annotate(
+                count=models.Count("id"),
+                score_sum=models.Sum("score", filter=scored),
+                scored_count=models.Count("id", filter=scored),
+            )
+            .order_by()
+        ):
+            bucket = counters.setdefault(
+                ComplianceAssessmentSummary.get_key(
+                    row["requirement__implementation_groups"]
+                ),
+                ComplianceAssessmentSummary.empty_counters(),
+            )
+            bucket["result"][row["result"]] += row["count"]
+            bucket["status"][row["status"]] += row["count"]
+            bucket["score_sum"] += row["score_sum"] or 0
+            bucket["scored_count"] += row["scored_count"]
+        return counters
+
+    @staticmethod
+    def refresh(
+        compliance_assessment: ComplianceAssessment,
+    ) -> "ComplianceAssessmentSummary":
+        """Recomputes the summary of a compliance assessment from its requirement assessments"""
+        summary, _ = ComplianceAssessmentSummary.objects.update_or_create(
+            compliance_assessment=compliance_assessment,
+            defaults={
+                "counters": ComplianceAssessmentSummary.compute(compliance_assessment)
+            },
+        )
+        return summary
+
+    @staticmethod
+    def update(
+        requirement_assessment: RequirementAssessment, previous: tuple | None
+    ) -> None:
+        """Applies the change of a saved requirement assessment to the summary of its compliance assessment
+        previous is the value of get_summary_values before the change, () for a new requirement assessment
+        and None if it is unknown, in which case the summary is recomputed
+        """
+        current = requirement_assessment.get_summary_values()
+        if previous == current:
+            return
+        summary = (
+            ComplianceAssessmentSummary.objects.select_for_update()
+            .filter(
+                compliance_assessment_id=requirement_assessment.compliance_assessment_id
+            )
+            .first()
+        )
+        if summary is None or previous is None:
+            ComplianceAssessmentSummary.refresh(
+                requirement_assessment.compliance_assessment
+            )
+            return
+        requirement = requirement_assessment.requirement
+        if not requirement.assessable:
+            return
+        bucket = summary.counters.setdefault(
+            ComplianceAssessmentSummary.get_key(requirement.implementation_groups),
+            ComplianceAssessmentSummary.empty_counters(),
+        )
+        for values, delta in ((previous, -1), (current, 1)):
+            if not values:
+                continue
+            result, status, score = values
+            bucket["result"][result] = bucket["result"].get(result, 0) + delta
+            bucket["status"][status] = bucket["status"].get(status, 0) + delta
+            if score is not None:
+                bucket["score_sum"] += delta * score
+                bucket["scored_count"] += delta
+        summary.save(update_fields=["counters"])
+
+    def get_totals(self, implementation_groups: list | None = None) -> dict:
+        """Sums the counters of the requirements belonging to any of the given implementation groups
+        All counters are summed if no implementation group is given
+        """
+        selected = set(implementation_groups or [])
+        totals = ComplianceAssessmentSummary.empty_counters()
+        for key, bucket in self.counters.items():
+            if selected and not selected & set(filter(None, key.split(","))):
+                continue
+            for counter in ("result", "status"):
+                for value, count in bucket[counter].items():
+                    totals[counter][value] = totals[counter].get(value, 0) + count
+            totals["score_sum"] += bucket["score_sum"]
+            totals["scored_count"] += bucket["scored_count"]
+        return totals
+
+
 ########################### RiskAcesptance is a domain object relying on secondary objects #########################
 
 
@@ -8,6 +8,23 @@ from iam.models import RoleAssignment, Folder, Permission, Role
 User = get_user_model()
 
 
+def get_object_permissions(request: Request, object_type, id) -> set[str]:
+    """
+    Gets the codenames of the permissions of the request user on an object by id
+    The result is kept on the request, so that queryset filtering and object permission
+    checks of a detail request share the same authorization
+    """
+    object_permissions = getattr(request, "_object_permissions", None)
+    if object_permissions is None:
+        object_permissions = request._object_permissions = {}
+    key = (object_type, id)
+    if key not in object_permissions:
+        object_permissions[key] = RoleAssignment.get_object_permissions(
+            request.user, object_type, id
+        )
+    return object_permissions[key]
+
+
 class RBACPermissions(permissions.DjangoObjectPermissions):
     """this is the DRF custom permission model enforcing our RBAC logic"""
 
@@ -37,18 +54,13 @@ class RBACPermissions(permissions.DjangoObjectPermissions):
             obj, "is_published", False
         ):
             return True
-        perm = Permission.objects.get(codename=_codename)
         # special case of risk acceptance approval
         if (
             request.parser_context["request"]._request.resolver_match.url_name
             == "risk-acceptances-accept"
         ):
-            perm = Permission.objects.get(codename="approve_riskacceptance")
-        return RoleAssignment.is_access_allowed(
-            user=request.user,
-            perm=perm,
-            folder=Folder.get_folder(obj),
-        )
+            _codename = "approve_riskacceptance"
+        return _codename in get_object_permissions(request, type(obj), obj.id)
 
 
 class IsAdministrator(permissions.BasePermission):
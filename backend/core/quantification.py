@@ -0,0 +1,234 @@
+"""
+Monte Carlo quantification of risk scenarios
+
+Matrix levels are mapped to distributions:
+- a probability level gives the annual frequency of the scenario, events follow a Poisson process
+- an impact level gives the magnitude of each event, as a lognormal distribution described by its 90% confidence interval
+Levels of a risk matrix may define them with a "frequency" (events per year) on probability levels
+and a "magnitude" ({"low": ..., "high": ...}) on impact levels, otherwise defaults spread over the levels are used.
+
+The loss of a year is drawn as a whole: a year with several events draws its total from the
+Fenton-Wilkinson lognormal approximation of the sum of their magnitudes, so that the cost of a
+scenario does not grow with its frequency. The number of simulated years of all the scenarios
+together is bounded by MAX_SIMULATED_YEARS, iterations are lowered to fit and the result
+reports both the requested and the simulated iterations.
+"""
+
+import bisect
+import math
+import random
+
+# z-score of the 95th percentile, the bounds of a magnitude are its 5th and 95th percentiles
+Z_90 = 1.6448536269514722
+
+DEFAULT_ITERATIONS = 5000
+MAX_ITERATIONS = 100000
+# iterations x scenarios
+MAX_SIMULATED_YEARS = 500000
+POISSON_NORMAL_THRESHOLD = 30
+EXCEEDANCE_POINTS = 20
+PERCENTILES = (5, 50, 95)
+
+
+def get_frequencies(probability: list) -> list[float]:
+    """
+    Returns the annual frequency of each probability level
+    Defaults range from once in a hundred years to ten times a year
+    """
+    count = len(probability)
+    return [
+        float(level["frequency"])
+        if level.get("frequency") is not None
+        else 10 ** (-2 + 3 * i / max(count - 1, 1))
+        for i, level in enumerate(probability)
+    ]
+
+
+def get_magnitudes(impact: list) -> list[tuple[float, float]]:
+    """
+    Returns the (mu, sigma) of the lognormal magnitude of each impact level
+    Defaults range from [1 000, 10 000] for the lowest level, one order of magnitude per level
+    Raises ValueError if a magnitude is not a positive interval
+    """
+    magnitudes = []
+    for i, level in enumerate(impact):
+        magnitude = level.get("magnitude") or {}
+        low = float(magnitude.get("low", 10 ** (3 + i)))
+        high = float(magnitude.get("high", 10 ** (4 + i)))
+        if not 0 < low < high:
+            raise ValueError(
+                f"the magnitude of impact level {i} must have 0 < low < high, got [{low}, {high}]"
+            )
+        magnitudes.append(
+            (
+                (math.log(low) + math.log(high)) / 2,
+                (math.log(high) - math.log(low)) / (2 * Z_90),
+            )
+        )
+    return magnitudes
+
+
+def draw_event_count(frequency: float, rng: random.Random) -> int:
+    """
+    Draws the number of events of a year with at least one event (zero-truncated Poisson)
+    High frequencies use the normal approximation of the Poisson distribution
+    """
+    if frequency > POISSON_NORMAL_THRESHOLD:
+        return max(1, round(rng.gauss(frequency, math.sqrt(frequency))))
+    p = frequency / math.expm1(frequency)
+    count, cumulated, u = 1, p, rng.random()
+    while u > cumulated and p > 0:
+        count += 1
+        p *= frequency / count
+        cumulated += p
+    return count
+
+
+def draw_annual_loss(
+    count: int, magnitude: tuple[float, float], rng: random.Random
+) -> float:
+    """
+    Draws the total loss of count events
+    The sum of several lognormal magnitudes is approximated by the lognormal of same mean and variance
+    """
+    mu, sigma = magnitude
+    if count > 1:
+        variance = math.log1p(math.expm1(sigma**2) / count)
+        mu = math.log(count) + mu + sigma**2 / 2 - variance / 2
+        sigma = math.sqrt(variance)
+    return rng.lognormvariate(mu, sigma)
+
+
+def simulate_annual_losses(
+    frequency: float,
+    magnitude: tuple[float, float],
+    iterations: int,
+    rng: random.Random,
+) -> dict[int, float]:
+    """
+    Simulates the annual losses of a scenario over a number of years
+    Only the years with at least one event are drawn: the gap to the next one is the whole part
+    of an exponential delay, then the number of events and their total loss are drawn at once
+    Returns the losses of the years with at least one event, by year
+    """
+    losses = {}
+    if frequency <= 0:
+        return losses
+    year = int(rng.expovariate(frequency))
+    while year < iterations:
+        losses[year] = draw_annual_loss(
+            draw_event_count(frequency, rng), magnitude, rng
+        )
+        year += 1 + int(rng.expovariate(frequency))
+    return losses
+
+
+def summarize_losses(
+    losses: dict[int, float], iterations: int, thresholds: list
+) -> dict:
+    """
+    Returns the mean, percentiles and loss exceedance curve of sparse annual losses
+    Years missing from losses had no loss
+    """
+    values = sorted(losses.values())
+    zeros = iterations - len(values)
+
+    def percentile(p):
+        rank = min(iterations - 1, max(0, math.ceil(p / 100 * iterations) - 1))
+        return 0.0 if rank < zeros else values[rank - zeros]
+
+    return {
+        "mean": sum(values) / iterations,
+        "percentiles": {str(p): percentile(p) for p in PERCENTILES},
+        "probability_of_loss": len(values) / iterations,
+        "exceedance_curve": [
+            {
+                "loss": threshold,
+                "probability": (len(values) - bisect.bisect_left(values, threshold))
+                / iterations,
+            }
+            for threshold in thresholds
+        ],
+    }
+
+
+def get_thresholds(losses: list[float]) -> list[float]:
+    """Returns log-spaced loss thresholds from the lowest to the highest positive loss"""
+    positive = [loss for loss in losses if loss > 0]
+    if not positive:
+        return []
+    lowest, highest = min(positive), max(positive)
+    if highest == lowest:
+        return [lowest]
+    ratio = highest / lowest
+    # the bounds are kept exact, so that the curve starts at the probability of loss
+    return (
+        [lowest]
+        + [
+            lowest * ratio ** (i / (EXCEEDANCE_POINTS - 1))
+            for i in range(1, EXCEEDANCE_POINTS - 1)
+        ]
+        + [highest]
+    )
+
+
+def quantify_scenarios(
+    scenarios: list[dict],
+    probability: list,
+    impact: list,
+    iterations: int = DEFAULT_ITERATIONS,
+    seed: int | None = None,
+) -> dict:
+    """
+    Simulates all the scenarios together over the same years
+    Each scenario is a dict with an id, a name, a proba and an impact (levels of the matrix)
+    Scenarios with an unrated or unknown level are listed as not quantified
+    Iterations are lowered so that at most MAX_SIMULATED_YEARS years are simulated in total,
+    in which case capped is set and requested_iterations keeps the requested number
+    A seed is drawn if none is given, so that the result can always be reproduced
+    Returns the summary of the annual losses of each scenario and of all of them together
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    rng = random.Random(seed)
+    frequencies = get_frequencies(probability)
+    magnitudes = get_magnitudes(impact)
+    total = {}
+    simulated = []
+    not_quantified = []
+    quantified = []
+    for scenario in scenarios:
+        proba, impact_level = scenario["proba"], scenario["impact"]
+        if not (0 <= proba < len(frequencies) and 0 <= impact_level < len(magnitudes)):
+            not_quantified.append(scenario["id"])
+        else:
+            quantified.append(scenario)
+    requested_iterations = iterations
+    iterations = max(1, min(iterations, MAX_SIMULATED_YEARS // max(len(quantified), 1)))
+    for scenario in quantified:
+        proba, impact_level = scenario["proba"], scenario["impact"]
+        losses = simulate_annual_losses(
+            frequencies[proba], magnitudes[impact_level], iterations, rng
+        )
+        for year, loss in losses.items():
+            total[year] = total.get(year, 0.0) + loss
+        simulated.append((scenario, losses))
+
+    thresholds = get_thresholds(list(total.values()))
+    return {
+        "iterations": iterations,
+        "requested_iterations": requested_iterations,
+        "capped": iterations < requested_iterations,
+        "seed": seed,
+        "aggregate": summarize_losses(total, iterations, thresholds),
+        "scenarios": [
+            {
+                "id": scenario["id"],
+                "name": scenario["name"],
+                "frequency": frequencies[scenario["proba"]],
+                **summarize_losses(losses, iterations, thresholds),
+            }
+            for scenario, losses in simulated
+        ],
+        "not_quantified": not_quantified,
+    }
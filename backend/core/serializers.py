@@ -70,9 +70,7 @@ class BaseModelSerializer(serializers.ModelSerializer):
         folder = folder if folder else Folder.get_root_folder()
         can_create_in_folder = RoleAssignment.is_access_allowed(
             user=self.context["request"].user,
-            perm=Permission.objects.get(
-                codename=f"add_{self.Meta.model._meta.model_name}"
-            ),
+            perm=get_permission(f"add_{self.Meta.model._meta.model_name}"),
             folder=folder,
         )
         if not can_create_in_folder:
@@ -267,6 +265,7 @@ class RiskScenarioWriteSerializer(BaseModelSerializer):
 
 
 class RiskScenarioReadSerializer(RiskScenarioWriteSerializer):
+    folder = FieldsRelatedField()
     risk_assessment = FieldsRelatedField(["id", "name"])
     risk_matrix = FieldsRelatedField(source="risk_assessment.risk_matrix")
     project = FieldsRelatedField(
@@ -369,7 +368,7 @@ class UserWriteSerializer(BaseModelSerializer):
         send_mail = EMAIL_HOST or EMAIL_HOST_RESCUE
         if not RoleAssignment.is_access_allowed(
             user=self.context["request"].user,
-            perm=Permission.objects.get(codename="add_user"),
+            perm=get_permission("add_user"),
             folder=Folder.get_root_folder(),
         ):
             raise PermissionDenied(
@@ -628,6 +627,28 @@ class RequirementAssessmentWriteSerializer(BaseModelSerializer):
         fields = "__all__"
 
 
+class RequirementAssessmentBatchUpdateSerializer(serializers.Serializer):
+    """
+    One entry of a batch update of requirement assessments
+    Only the shape of the entry is validated here, references and scores are checked for the whole batch
+    """
+
+    id = serializers.UUIDField()
+    result = serializers.ChoiceField(
+        choices=RequirementAssessment.Result.choices, required=False
+    )
+    status = serializers.ChoiceField(
+        choices=RequirementAssessment.Status.choices, required=False
+    )
+    score = serializers.IntegerField(allow_null=True, required=False)
+    observation = serializers.CharField(
+        allow_null=True, allow_blank=True, required=False
+    )
+    applied_controls = serializers.ListField(
+        child=serializers.UUIDField(), required=False
+    )
+
+
 class RequirementMappingSetReadSerializer(BaseModelSerializer):
     source_framework = FieldsRelatedField()
     target_framework = FieldsRelatedField()
@@ -19,17 +19,6 @@ def app_build():
     return f"{BUILD} (dev)" if DEBUG else BUILD
 
 
-@register.simple_tag()
-def get_requirements_count(applied_control, compliance_assessment):
-    return (
-        RequirementAssessment.objects.filter(
-            compliance_assessment=compliance_assessment
-        )
-        .filter(applied_controls=applied_control)
-        .count()
-    )
-
-
 @register.filter("class")
 def _class(obj):
     return obj.__class__.__name__ if obj else ""
@@ -2,6 +2,7 @@ from core.models import *
 from core.helpers import *
 from iam.models import *
 from library.utils import *
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 import pytest
 
@@ -143,3 +144,312 @@ def test_get_rating_options_abbr_perm_to_view_matrix():
         ("H", _("High")),
         ("VH", _("Very High")),
     ]
+
+
+@pytest.fixture
+def requirement_tree_fixture():
+    folder = Folder.objects.create(name="test", parent_folder=Folder.get_root_folder())
+    project = Project.objects.create(name="test project", folder=folder)
+    library = LoadedLibrary.objects.create(
+        name="Library", folder=folder, locale="en", version=1, objects_meta={}
+    )
+    framework = Framework.objects.create(
+        name="Framework", folder=folder, library=library
+    )
+    nodes = {}
+    for name, parent, assessable in [
+        ("group", None, False),
+        ("r1", "group", True),
+        ("r2", "group", True),
+        ("sub group", "group", False),
+        ("r3", "sub group", True),
+    ]:
+        nodes[name] = RequirementNode.objects.create(
+            name=name,
+            urn=f"urn:test:{name}",
+            parent_urn=f"urn:test:{parent}" if parent else None,
+            folder=folder,
+            framework=framework,
+            assessable=assessable,
+        )
+    compliance_assessment = ComplianceAssessment.objects.create(
+        name="compliance assessment", project=project, framework=framework
+    )
+    compliance_assessment.create_requirement_assessments()
+    for name, status in [("r1", "done"), ("r3", "in_progress")]:
+        requirement_assessment = RequirementAssessment.objects.get(
+            requirement=nodes[name]
+        )
+        requirement_assessment.status = status
+        requirement_assessment.save()
+    return compliance_assessment, nodes
+
+
+@pytest.mark.django_db
+def test_get_compliance_assessment_stats(requirement_tree_fixture):
+    compliance_assessment, nodes = requirement_tree_fixture
+
+    stats = get_compliance_assessment_stats(compliance_assessment)
+
+    def percentages(name):
+        return {st: percentage for (st, _, percentage) in stats[nodes[name].id]}
+
+    assert percentages("group") == {
+        "to_do": 50,
+        "in_progress": 25,
+        "in_review": 0,
+        "done": 25,
+    }
+    assert percentages("sub group") == {
+        "to_do": 0,
+        "in_progress": 100,
+        "in_review": 0,
+        "done": 0,
+    }
+    assert stats[nodes["r1"].id] == []
+
+
+@pytest.mark.django_db
+def test_framework_tree_is_cached(requirement_tree_fixture, django_assert_num_queries):
+    compliance_assessment, _ = requirement_tree_fixture
+    framework = Framework.objects.select_related("library").get(
+        id=compliance_assessment.framework_id
+    )
+    requirement_assessments = list(
+        RequirementAssessment.objects.filter(
+            compliance_assessment=compliance_assessment
+        )
+    )
+    expected = get_sorted_requirement_nodes(
+        list(RequirementNode.objects.filter(framework=framework)),
+        requirement_assessments,
+        framework.max_score,
+    )
+
+    tree = get_framework_tree(framework)
+    tree["modified"] = True
+    with django_assert_num_queries(0):
+        assert (
+            overlay_requirement_assessments(
+                get_framework_tree(framework),
+                requirement_assessments,
+                framework.max_score,
+            )
+            == expected
+        )
+
+
+@pytest.mark.django_db
+def test_get_compliance_assessment_rows(
+    requirement_tree_fixture, django_assert_num_queries
+):
+    compliance_assessment, _ = requirement_tree_fixture
+
+    # requirement assessments are read along with their requirement
+    with django_assert_num_queries(1):
+        rows = list(get_compliance_assessment_rows(compliance_assessment.id))
+
+    assert rows[0] == [
+        "ref_id",
+        "description",
+        "compliance_result",
+        "progress",
+        "score",
+        "observations",
+    ]
+    assert sorted(tuple(row[1:4]) for row in rows[1:]) == [
+        ("group",),
+        ("r1", "not_assessed", "done"),
+        ("r2", "not_assessed", "to_do"),
+        ("r3", "not_assessed", "in_progress"),
+        ("sub group",),
+    ]
+
+
+@pytest.mark.django_db
+def test_get_compliance_assessment_rows_keep_the_language(requirement_tree_fixture):
+    compliance_assessment, nodes = requirement_tree_fixture
+    nodes["r1"].translations = {"fr": {"name": "e1"}}
+    nodes["r1"].save()
+
+    with translation.override("fr"):
+        rows = get_compliance_assessment_rows(compliance_assessment.id)
+    # rows are streamed after the language of the request has been deactivated
+    with translation.override("en"):
+        names = {row[1] for row in rows}
+
+    assert "e1" in names and "r1" not in names
+
+
+@pytest.mark.usefixtures("risk_matrix_fixture")
+@pytest.mark.django_db
+def test_risk_status_counts_all_risk_assessments_at_once(django_assert_max_num_queries):
+    user = User.objects.create(email="admin@test.com", password="test")
+    user.user_groups.add(UserGroup.objects.get(name="BI-UG-ADM"))
+    folder = Folder.objects.create(name="test", parent_folder=Folder.get_root_folder())
+    project = Project.objects.create(name="test", folder=folder)
+    risk_assessments = [
+        RiskAssessment.objects.create(
+            name=f"test {i}",
+            project=project,
+            risk_matrix=RiskMatrix.objects.latest("created_at"),
+        )
+        for i in range(3)
+    ]
+    applied_control = AppliedControl.objects.create(
+        name="applied control", folder=folder, status="to_do"
+    )
+    for i in range(12):
+        scenario = RiskScenario.objects.create(
+            name=f"scenario {i}",
+            risk_assessment=risk_assessments[i % 2],
+            current_proba=i % 5,
+            current_impact=i % 4,
+            residual_proba=0,
+            residual_impact=i % 3,
+            treatment=["open", "mitigate", "accept"][i % 3],
+        )
+        if i % 3 == 0:
+            scenario.applied_controls.add(applied_control)
+    queryset = RiskAssessment.objects.filter(
+        id__in=[risk_assessment.id for risk_assessment in risk_assessments]
+    ).order_by("name")
+
+    # permissions and matrices, the risk assessments, then four grouped counts whatever their number
+    with django_assert_max_num_queries(16):
+        data = risk_status(user, queryset)
+
+    def series(values):
+        return [value["value"] for value in values]
+
+    abbreviations = [abbreviation for abbreviation, _ in get_rating_options_abbr(user)]
+    for i, abbreviation in enumerate(abbreviations):
+        for out, field in (
+            ("current_out", "current_level"),
+            ("residual_out", "residual_level"),
+        ):
+            assert series(data[out][abbreviation]) == [
+                RiskScenario.objects.filter(
+                    risk_assessment=risk_assessment, **{field: i}
+                ).count()
+                for risk_assessment in queryset
+            ]
+    for treatment, values in data["rsk_status_out"].items():
+        assert series(values) == [
+            RiskScenario.objects.filter(
+                risk_assessment=risk_assessment, treatment=treatment
+            ).count()
+            for risk_assessment in queryset
+        ]
+    assert series(data["mtg_status_out"]["to_do"]) == [2, 2, 0]
+    assert data["names"] == [
+        f"{risk_assessment.project} {risk_assessment.version}"
+        for risk_assessment in queryset
+    ]
+    assert data["y_max_rsk"] == 7
+
+
+@pytest.mark.usefixtures("risk_matrix_fixture")
+@pytest.mark.django_db
+def test_duplicate_risk_assessment_in_bulk():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    source_folder = Folder.objects.create(
+        name="source", parent_folder=Folder.get_root_folder()
+    )
+    target_folder = Folder.objects.create(
+        name="target", parent_folder=Folder.get_root_folder()
+    )
+    risk_matrix = RiskMatrix.objects.latest("created_at")
+    grid = risk_matrix.compile().grid
+    owner = User.objects.create(email="owner@test.com", password="test")
+    other_folder = Folder.objects.create(
+        name="other", parent_folder=Folder.get_root_folder()
+    )
+    controls = [
+        AppliedControl.objects.create(name=name, folder=folder)
+        for name, folder in (
+            ("control", source_folder),
+            ("same name", source_folder),
+            ("same name", other_folder),
+        )
+    ]
+    threat = Threat.objects.get_or_create(
+        name="published threat", folder=Folder.get_root_folder()
+    )[0]
+    asset = Asset.objects.create(name="asset", folder=source_folder)
+    existing_asset = Asset.objects.create(name="asset", folder=target_folder)
+
+    def create_risk_assessment(size):
+        risk_assessment = RiskAssessment.objects.create(
+            name=f"source {size}",
+            project=Project.objects.create(name=f"source {size}", folder=source_folder),
+            risk_matrix=risk_matrix,
+        )
+        for i in range(size):
+            scenario = RiskScenario.objects.create(
+                name=f"scenario {i}",
+                risk_assessment=risk_assessment,
+                current_proba=i % 5,
+                current_impact=i % 5,
+                residual_proba=-1 if i % 2 else 0,
+                residual_impact=0,
+            )
+            scenario.applied_controls.set(controls)
+            scenario.threats.add(threat)
+            scenario.assets.add(asset)
+            scenario.owner.add(owner)
+        return risk_assessment
+
+    def duplicate(risk_assessment):
+        with CaptureQueriesContext(connection) as context:
+            duplicate = duplicate_risk_assessment(
+                risk_assessment,
+                name="duplicate",
+                version="2",
+                project=Project.objects.create(
+                    name=f"target {risk_assessment.name}", folder=target_folder
+                ),
+            )
+        return duplicate, len(context.captured_queries)
+
+    small, small_queries = duplicate(create_risk_assessment(3))
+    risk_assessment = create_risk_assessment(30)
+    duplicated, queries = duplicate(risk_assessment)
+    # controls resolved by the first duplicate are linked as is, the queries do not grow
+    assert queries <= small_queries
+
+    scenarios = list(duplicated.risk_scenarios.order_by("created_at"))
+    assert [scenario.name for scenario in scenarios] == [
+        f"scenario {i}" for i in range(30)
+    ]
+    for i, scenario in enumerate(scenarios):
+        assert scenario.folder == target_folder
+        assert scenario.current_level == grid[i % 5][i % 5]
+        assert scenario.residual_level == (-1 if i % 2 else grid[0][0])
+        assert not scenario.owner.exists()
+    # each distinct object is duplicated once, objects with the same name share a copy
+    copies = AppliedControl.objects.filter(folder=target_folder)
+    assert sorted(copies.values_list("name", flat=True)) == ["control", "same name"]
+    assert set(scenarios[0].applied_controls.all()) == set(copies)
+    assert list(scenarios[0].threats.all()) == [threat]
+    assert list(scenarios[0].assets.all()) == [existing_asset]
+    assert (
+        RiskScenario.applied_controls.through.objects.filter(
+            riskscenario__risk_assessment=duplicated
+        ).count()
+        == 60
+    )
+    for scenario in small.risk_scenarios.all():
+        assert set(scenario.applied_controls.all()) == set(copies)
+
+    in_place = duplicate_risk_assessment(
+        risk_assessment,
+        name="in place",
+        version="2",
+        project=risk_assessment.project,
+    )
+    scenario = in_place.risk_scenarios.get(name="scenario 0")
+    assert list(scenario.owner.all()) == [owner]
+    assert set(scenario.applied_controls.all()) == set(controls[:2])
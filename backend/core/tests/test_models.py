@@ -1,5 +1,10 @@
+import io
+import json
 from uuid import UUID
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 import pytest
 from ciso_assistant.settings import BASE_DIR
@@ -25,7 +30,8 @@ from core.models import (
 )
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from iam.models import Folder
+from core.helpers import get_parsed_matrices
+from iam.models import Folder, UserGroup
 
 from .fixtures import *
 
@@ -371,6 +377,231 @@ class TestRiskAssessment:
             risk_assessment3,
         ]
 
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_assessment_quality_check(self):
+        folder = Folder.objects.create(
+            name="test folder", description="test folder description"
+        )
+        project = Project.objects.create(name="test project", folder=folder)
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=project,
+            risk_matrix=RiskMatrix.objects.all()[0],
+            status=RiskAssessment.Status.IN_PROGRESS,
+        )
+        not_assessed = RiskScenario.objects.create(
+            name="not assessed", risk_assessment=risk_assessment
+        )
+        lowered = RiskScenario.objects.create(
+            name="lowered",
+            risk_assessment=risk_assessment,
+            current_proba=2,
+            current_impact=2,
+            current_level=2,
+            residual_proba=1,
+            residual_impact=1,
+            residual_level=1,
+        )
+        applied_control = AppliedControl.objects.create(
+            name="applied control", folder=folder, effort="S", cost=10
+        )
+        not_assessed.applied_controls.add(applied_control)
+        lowered.applied_controls.add(applied_control)
+        acceptance = RiskAcceptance.objects.create(name="acceptance", folder=folder)
+        acceptance.risk_scenarios.add(lowered)
+
+        findings = risk_assessment.quality_check()
+
+        assert [finding["msgid"] for finding in findings["info"]] == [
+            "riskAssessmentInProgress",
+            "riskAssessmentNoAuthor",
+            "appliedControlNoLink",
+        ]
+        assert [finding["msgid"] for finding in findings["warnings"]] == [
+            "riskScenarioNoCurrentLevel",
+            "appliedControlNoETA",
+            "riskAcceptanceNoExpiryDate",
+        ]
+        assert findings["errors"] == []
+        assert findings["count"] == 6
+        assert findings["warnings"][0]["object"]["id"] == str(not_assessed.id)
+        assert findings["warnings"][0]["link"] == f"risk-scenarios/{not_assessed.id}"
+
+        lowered.applied_controls.clear()
+        lowered.save()
+        findings = risk_assessment.quality_check()
+        assert [finding["msgid"] for finding in findings["errors"]] == [
+            "riskScenarioResidualLoweredWithoutMeasures"
+        ]
+
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_assessment_quality_checks_are_cached(self, django_assert_num_queries):
+        folder = Folder.objects.create(
+            name="test folder", description="test folder description"
+        )
+        project = Project.objects.create(name="test project", folder=folder)
+        risk_assessments = [
+            RiskAssessment.objects.create(
+                name=f"test risk_assessment {i}",
+                project=project,
+                risk_matrix=RiskMatrix.objects.all()[0],
+            )
+            for i in range(3)
+        ]
+        for risk_assessment in risk_assessments:
+            RiskScenario.objects.create(
+                name="scenario", risk_assessment=risk_assessment
+            )
+        RiskAssessment.get_quality_checks(risk_assessments)
+
+        # the cache keys of all the risk assessments are computed with one query for the authors
+        # and one per dependency
+        with django_assert_num_queries(4):
+            quality_checks = RiskAssessment.get_quality_checks(risk_assessments)
+        assert [quality_checks[ra.id]["count"] for ra in risk_assessments] == [2, 2, 2]
+
+        RiskScenario.objects.filter(risk_assessment=risk_assessments[0]).delete()
+        risk_assessments[1].authors.add(User.objects.create_user(email="a@example.com"))
+        quality_checks = RiskAssessment.get_quality_checks(risk_assessments)
+        assert "riskAssessmentEmpty" in [
+            finding["msgid"]
+            for finding in quality_checks[risk_assessments[0].id]["warnings"]
+        ]
+        assert quality_checks[risk_assessments[1].id]["count"] == 1
+
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_assessment_quality_check_follows_links(self):
+        folder = Folder.objects.create(name="test folder")
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=Project.objects.create(name="test project", folder=folder),
+            risk_matrix=RiskMatrix.objects.all()[0],
+        )
+        lowered, other = (
+            RiskScenario.objects.create(
+                name=name,
+                risk_assessment=risk_assessment,
+                current_proba=2,
+                current_impact=2,
+                residual_proba=1,
+                residual_impact=1,
+            )
+            for name in ("lowered", "other")
+        )
+        other.residual_proba = other.residual_impact = 2
+        other.save()
+        applied_control = AppliedControl.objects.create(
+            name="applied control", folder=folder
+        )
+        other.applied_controls.add(applied_control)
+        assert [
+            finding["object"]["name"]
+            for finding in risk_assessment.quality_check()["errors"]
+        ] == ["lowered"]
+
+        # the applied control moves to the other scenario, neither object is updated
+        other.applied_controls.remove(applied_control)
+        lowered.applied_controls.add(applied_control)
+
+        assert risk_assessment.quality_check()["errors"] == []
+
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_assessment_quality_findings_queries(self, django_assert_num_queries):
+        folder = Folder.objects.create(name="test folder")
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=Project.objects.create(name="test project", folder=folder),
+            risk_matrix=RiskMatrix.objects.all()[0],
+        )
+        names = [f"scenario {i}" for i in range(5)]
+        RiskScenario.objects.create(name=names[0], risk_assessment=risk_assessment)
+        with CaptureQueriesContext(connection) as context:
+            risk_assessment.get_quality_findings()
+        for name in names[1:]:
+            RiskScenario.objects.create(name=name, risk_assessment=risk_assessment)
+
+        # one query per kind of checked object and per many-to-many relation of the offending ones
+        with django_assert_num_queries(len(context)):
+            findings = risk_assessment.get_quality_findings()
+
+        assert [finding["object"]["name"] for finding in findings["warnings"]] == names
+        assert [finding["msg"] for finding in findings["warnings"]] == [
+            f"{name} current risk level has not been assessed" for name in names
+        ]
+        assert findings["warnings"][0]["object"]["risk_assessment"] == str(
+            risk_assessment.id
+        )
+
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_assessment_quantification(self, django_assert_num_queries):
+        folder = Folder.objects.create(name="test folder")
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=Project.objects.create(name="test project", folder=folder),
+            risk_matrix=RiskMatrix.objects.all()[0],
+        )
+        high = RiskScenario.objects.create(
+            name="high",
+            risk_assessment=risk_assessment,
+            current_proba=4,
+            current_impact=3,
+        )
+        low = RiskScenario.objects.create(
+            name="low",
+            risk_assessment=risk_assessment,
+            current_proba=1,
+            current_impact=1,
+        )
+        unrated = RiskScenario.objects.create(
+            name="unrated", risk_assessment=risk_assessment
+        )
+
+        result = risk_assessment.get_quantification(iterations=2000, seed=42)
+        assert result["not_quantified"] == [str(unrated.id)]
+        scenarios = {scenario["id"]: scenario for scenario in result["scenarios"]}
+        assert scenarios[str(high.id)]["mean"] > scenarios[str(low.id)]["mean"] > 0
+        aggregate = result["aggregate"]
+        assert aggregate["mean"] == pytest.approx(
+            sum(scenario["mean"] for scenario in result["scenarios"])
+        )
+        probabilities = [
+            point["probability"] for point in aggregate["exceedance_curve"]
+        ]
+        assert probabilities == sorted(probabilities, reverse=True)
+        assert probabilities[0] == aggregate["probability_of_loss"]
+        for scenario in result["scenarios"]:
+            # scenarios never exceed the aggregate loss of the same years
+            assert all(
+                point["probability"] <= total["probability"]
+                for point, total in zip(
+                    scenario["exceedance_curve"], aggregate["exceedance_curve"]
+                )
+            )
+
+        # the same seed gives the same losses, served from the cache until a scenario changes:
+        # only the stamp of the scenarios is queried
+        with django_assert_num_queries(1):
+            assert (
+                risk_assessment.get_quantification(iterations=2000, seed=42) == result
+            )
+        low.current_impact = 4
+        low.save()
+        updated = risk_assessment.get_quantification(iterations=2000, seed=42)
+        assert updated != result
+        residual = risk_assessment.get_quantification(
+            iterations=2000, seed=42, residual=True
+        )
+        assert residual["residual"] is True
+        assert len(residual["not_quantified"]) == 3
+
+        # without a seed, each call is a new draw whose seed reproduces it
+        unseeded = risk_assessment.get_quantification(iterations=2000)
+        assert unseeded["seed"] is not None
+        assert (
+            risk_assessment.get_quantification(iterations=2000, seed=unseeded["seed"])
+            == unseeded
+        )
+
 
 @pytest.mark.django_db
 class TestRiskScenario:
@@ -430,6 +661,40 @@ class TestRiskScenario:
 
         assert scenario.parent_project() == Project.objects.get(name="test project")
 
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_scenario_folder_follows_project(self):
+        folder = Folder.objects.create(
+            name="test folder", description="test folder description"
+        )
+        other_folder = Folder.objects.create(
+            name="other folder", description="other folder description"
+        )
+        risk_matrix = RiskMatrix.objects.all()[0]
+        project = Project.objects.create(name="test project", folder=folder)
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=project,
+            risk_matrix=risk_matrix,
+        )
+        scenario = RiskScenario.objects.create(
+            name="test scenario",
+            risk_assessment=risk_assessment,
+        )
+        assert scenario.folder == folder
+        assert Folder.get_folder(scenario) == folder
+
+        project.folder = other_folder
+        project.save()
+        scenario.refresh_from_db()
+        assert scenario.folder == other_folder
+
+        risk_assessment.project = Project.objects.create(
+            name="third project", folder=folder
+        )
+        risk_assessment.save()
+        scenario.refresh_from_db()
+        assert scenario.folder == folder
+
     @pytest.mark.usefixtures("risk_matrix_fixture")
     def test_risk_scenario_is_deleted_when_risk_assessment_is_deleted(self):
         folder = Folder.objects.create(
@@ -602,12 +867,145 @@ class TestRiskScenario:
         assert scenario2.rid == "R.2"
         assert scenario3.rid == "R.3"
 
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_risk_levels_follow_matrix_changes(self, django_assert_max_num_queries):
+        folder = Folder.objects.create(
+            name="test folder", description="test folder description"
+        )
+        risk_matrix = RiskMatrix.objects.all()[0]
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=Project.objects.create(name="test project", folder=folder),
+            risk_matrix=risk_matrix,
+        )
+        scenarios = [
+            RiskScenario.objects.create(
+                name=f"test scenario {i}",
+                risk_assessment=risk_assessment,
+                current_proba=i % 5,
+                current_impact=(i + 1) % 5,
+                residual_proba=0,
+                residual_impact=0,
+            )
+            for i in range(10)
+        ]
+        assert RiskScenario.recompute_levels() == 0
+
+        definition = risk_matrix.parse_json()
+        inverted_matrix = RiskMatrix.objects.create(
+            name="inverted",
+            folder=folder,
+            json_definition=json.dumps(
+                {
+                    **definition,
+                    "grid": [
+                        [len(definition["risk"]) - 1 - level for level in row]
+                        for row in definition["grid"]
+                    ],
+                }
+            ),
+        )
+
+        # scenarios and grids are read once, then written back in bulk
+        risk_assessment = RiskAssessment.objects.get(id=risk_assessment.id)
+        risk_assessment.risk_matrix = inverted_matrix
+        with django_assert_max_num_queries(8):
+            risk_assessment.save()
+        grid = inverted_matrix.compile().grid
+        for scenario in scenarios:
+            scenario.refresh_from_db()
+            assert (
+                scenario.current_level
+                == grid[scenario.current_proba][scenario.current_impact]
+            )
+            assert scenario.residual_level == grid[0][0]
+
+        inverted_matrix.json_definition = json.dumps(definition)
+        inverted_matrix.save()
+        scenarios[0].refresh_from_db()
+        assert scenarios[0].current_level == definition["grid"][0][1]
+
+        RiskScenario.objects.update(current_level=-1)
+        call_command("recompute_risk_levels", stdout=io.StringIO())
+        assert not RiskScenario.objects.filter(current_level=-1).exists()
+
 
 @pytest.mark.django_db
 class TestRiskMatrix:
     pytestmark = pytest.mark.django_db
 
-    ...
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_compiled_matrix_is_shared_by_scenarios(self, django_assert_num_queries):
+        folder = Folder.objects.create(
+            name="test folder", description="test folder description"
+        )
+        risk_matrix = RiskMatrix.objects.all()[0]
+        risk_assessment = RiskAssessment.objects.create(
+            name="test risk_assessment",
+            project=Project.objects.create(name="test project", folder=folder),
+            risk_matrix=risk_matrix,
+        )
+        scenario = RiskScenario.objects.create(
+            name="test scenario",
+            risk_assessment=risk_assessment,
+            current_proba=1,
+            current_impact=3,
+            residual_proba=0,
+            residual_impact=2,
+        )
+        definition = risk_matrix.parse_json_translated()
+
+        assert scenario.current_level == definition["grid"][1][3]
+        assert scenario.residual_level == definition["grid"][0][2]
+        with django_assert_num_queries(0):
+            assert scenario.get_current_risk() == {
+                **definition["risk"][scenario.current_level],
+                "value": scenario.current_level,
+            }
+            assert scenario.get_residual_impact() == {
+                **definition["impact"][2],
+                "value": 2,
+            }
+            assert (
+                scenario.get_current_proba()["name"]
+                == (definition["probability"][1]["name"])
+            )
+            assert scenario.get_matrix() == definition
+        assert (
+            RiskMatrix.objects.get(id=risk_matrix.id).compile().grid
+            == risk_matrix.compile().grid
+        )
+
+        updated_definition = risk_matrix.parse_json()
+        updated_definition["grid"][1][3] = 0
+        risk_matrix.json_definition = json.dumps(updated_definition)
+        risk_matrix.save()
+        scenario.save()
+        assert scenario.current_level == 0
+
+    @pytest.mark.usefixtures("risk_matrix_fixture")
+    def test_compiled_matrix_is_not_altered_by_callers(self):
+        folder = Folder.objects.create(name="test folder")
+        risk_matrix = RiskMatrix.objects.all()[0]
+        scenario = RiskScenario.objects.create(
+            name="test scenario",
+            risk_assessment=RiskAssessment.objects.create(
+                name="test risk_assessment",
+                project=Project.objects.create(name="test project", folder=folder),
+                risk_matrix=risk_matrix,
+            ),
+        )
+        admin = User.objects.create_superuser("admin@tests.com")
+        UserGroup.objects.get(name="BI-UG-ADM").user_set.add(admin)
+        translated = risk_matrix.parse_json_translated()
+        definition = risk_matrix.parse_json()
+
+        scenario.get_matrix()["risk"][0]["name"] = "altered"
+        get_parsed_matrices(admin)[0]["risk"][0]["name"] = "altered"
+
+        assert scenario.get_matrix() == translated
+        assert risk_matrix.compile().translated == translated
+        assert get_parsed_matrices(admin) == [definition]
 
 
 @pytest.mark.django_db
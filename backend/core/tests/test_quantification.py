@@ -0,0 +1,80 @@
+import math
+import random
+
+import pytest
+
+from core import quantification
+from core.quantification import (
+    DEFAULT_ITERATIONS,
+    MAX_SIMULATED_YEARS,
+    get_magnitudes,
+    quantify_scenarios,
+    simulate_annual_losses,
+)
+
+LEVELS = [{} for _ in range(5)]
+
+
+@pytest.mark.parametrize("frequency", [0.05, 1, 10, 100])
+def test_simulated_losses_match_expected_mean(frequency):
+    mu, sigma = get_magnitudes(LEVELS)[2]
+    iterations = 100000
+
+    losses = simulate_annual_losses(
+        frequency, (mu, sigma), iterations, random.Random(0)
+    )
+
+    assert len(losses) / iterations == pytest.approx(-math.expm1(-frequency), rel=0.05)
+    assert sum(losses.values()) / iterations == pytest.approx(
+        frequency * math.exp(mu + sigma**2 / 2), rel=0.05
+    )
+
+
+def test_simulated_years_are_bounded(monkeypatch):
+    draws = []
+    draw_annual_loss = quantification.draw_annual_loss
+    monkeypatch.setattr(
+        quantification,
+        "draw_annual_loss",
+        lambda *args: draws.append(args[0]) or draw_annual_loss(*args),
+    )
+    scenarios = [
+        {"id": i, "name": f"scenario {i}", "proba": 4, "impact": 4} for i in range(2000)
+    ]
+
+    result = quantify_scenarios(scenarios, LEVELS, LEVELS, seed=0)
+
+    assert result["iterations"] == MAX_SIMULATED_YEARS // len(scenarios)
+    assert result["requested_iterations"] == DEFAULT_ITERATIONS
+    assert result["capped"] is True
+    assert len(result["scenarios"]) == len(scenarios)
+    # one draw per year with events whatever the frequency of the scenarios, ten events a year here
+    assert len(draws) <= MAX_SIMULATED_YEARS
+    assert sum(draws) > MAX_SIMULATED_YEARS
+
+    result = quantify_scenarios(scenarios[:1], LEVELS, LEVELS, seed=0)
+    assert result["iterations"] == result["requested_iterations"] == DEFAULT_ITERATIONS
+    assert result["capped"] is False
+
+
+def test_seed_is_reported():
+    scenarios = [{"id": 0, "name": "scenario", "proba": 2, "impact": 2}]
+
+    result = quantify_scenarios(scenarios, LEVELS, LEVELS, iterations=100)
+
+    assert isinstance(result["seed"], int)
+    assert (
+        quantify_scenarios(
+            scenarios, LEVELS, LEVELS, iterations=100, seed=result["seed"]
+        )
+        == result
+    )
+
+
+@pytest.mark.parametrize(
+    "magnitude",
+    [{"low": 0, "high": 10}, {"low": -5, "high": 10}, {"low": 10, "high": 10}],
+)
+def test_invalid_magnitudes_are_rejected(magnitude):
+    with pytest.raises(ValueError, match="impact level 1"):
+        get_magnitudes([{}, {"magnitude": magnitude}])
@@ -1,11 +1,22 @@
+import json
+
 import pytest
+from django.core import serializers
 from django.contrib.auth import get_user_model
 from core.models import (
+    AppliedControl,
+    Evidence,
     StoredLibrary,
     Framework,
     ComplianceAssessment,
+    ComplianceAssessmentSummary,
+    LoadedLibrary,
     Project,
     RequirementAssessment,
+    RequirementMapping,
+    RequirementMappingSet,
+    RequirementNode,
+    TransitiveRequirementMapping,
 )
 from iam.models import Folder
 
@@ -69,3 +80,499 @@ class TestRequirementAssessment:
                 requirement_assessment.applied_controls.all().count()
                 == applied_controls_count
             )
+
+
+@pytest.fixture
+def implementation_groups_assessment_fixture(domain_project_fixture):
+    library = LoadedLibrary.objects.create(
+        name="Library",
+        folder=Folder.get_root_folder(),
+        locale="en",
+        version=1,
+        objects_meta={},
+    )
+    framework = Framework.objects.create(
+        name="Framework",
+        folder=Folder.get_root_folder(),
+        library=library,
+        min_score=0,
+        max_score=10,
+    )
+    for i, (implementation_groups, assessable) in enumerate(
+        [(["1"], True), (["1", "2"], True), (["2"], True), (["2"], False), (None, True)]
+    ):
+        RequirementNode.objects.create(
+            name=f"requirement {i}",
+            folder=Folder.get_root_folder(),
+            framework=framework,
+            implementation_groups=implementation_groups,
+            assessable=assessable,
+            order_id=i,
+        )
+    compliance_assessment = ComplianceAssessment.objects.create(
+        name="compliance assessment",
+        project=Project.objects.last(),
+        framework=framework,
+    )
+    compliance_assessment.create_requirement_assessments()
+    return compliance_assessment
+
+
+@pytest.mark.django_db
+class TestComplianceAssessmentSummary:
+    def test_summary_follows_requirement_assessments(
+        self, implementation_groups_assessment_fixture
+    ):
+        compliance_assessment = implementation_groups_assessment_fixture
+        requirement_assessments = list(
+            compliance_assessment.requirement_assessments.order_by(
+                "requirement__order_id"
+            )
+        )
+        for requirement_assessment, score in zip(requirement_assessments, [2, 4, 9]):
+            requirement_assessment.result = RequirementAssessment.Result.COMPLIANT
+            requirement_assessment.score = score
+            requirement_assessment.is_scored = True
+            requirement_assessment.save()
+        requirement_assessment = RequirementAssessment.objects.get(
+            id=requirement_assessments[2].id
+        )
+        requirement_assessment.status = RequirementAssessment.Status.DONE
+        requirement_assessment.save()
+
+        compliance_assessment.refresh_from_db()
+        summary = compliance_assessment.get_summary()
+        assert summary.counters == ComplianceAssessmentSummary.compute(
+            compliance_assessment
+        )
+        assert compliance_assessment.get_global_score() == 5.0
+        donut = compliance_assessment.donut_render()
+        assert {v["name"]: v["value"] for v in donut["result"]["values"]} == {
+            "not_assessed": 1,
+            "partially_compliant": 0,
+            "non_compliant": 0,
+            "compliant": 3,
+            "not_applicable": 0,
+        }
+
+        compliance_assessment.selected_implementation_groups = ["2"]
+        compliance_assessment.save()
+        assert compliance_assessment.get_global_score() == 6.5
+        donut = compliance_assessment.donut_render()
+        assert {v["name"]: v["value"] for v in donut["status"]["values"]} == {
+            "to_do": 1,
+            "in_progress": 0,
+            "in_review": 0,
+            "done": 1,
+        }
+
+    def test_summary_follows_concurrent_saves(
+        self, implementation_groups_assessment_fixture
+    ):
+        compliance_assessment = implementation_groups_assessment_fixture
+        requirement_assessment = compliance_assessment.requirement_assessments.filter(
+            requirement__assessable=True
+        ).first()
+        # two requests loading the same requirement assessment
+        first = RequirementAssessment.objects.get(id=requirement_assessment.id)
+        second = RequirementAssessment.objects.get(id=requirement_assessment.id)
+
+        first.result = RequirementAssessment.Result.COMPLIANT
+        first.score = 7
+        first.is_scored = True
+        first.save()
+        second.result = RequirementAssessment.Result.NON_COMPLIANT
+        second.status = RequirementAssessment.Status.DONE
+        second.save()
+
+        assert compliance_assessment.get_summary().counters == (
+            ComplianceAssessmentSummary.compute(compliance_assessment)
+        )
+        totals = compliance_assessment.get_summary().get_totals()
+        assert totals["result"]["compliant"] == 0
+        assert totals["result"]["non_compliant"] == 1
+        assert totals["status"]["done"] == 1
+        assert totals["scored_count"] == 0
+
+    def test_summary_is_refreshed_after_bulk_updates(
+        self, implementation_groups_assessment_fixture
+    ):
+        compliance_assessment = implementation_groups_assessment_fixture
+        compliance_assessment.requirement_assessments.update(
+            result=RequirementAssessment.Result.NON_COMPLIANT
+        )
+        ComplianceAssessmentSummary.refresh(compliance_assessment)
+
+        totals = compliance_assessment.get_summary().get_totals()
+        assert totals["result"]["non_compliant"] == 4
+        assert totals["scored_count"] == 0
+        assert compliance_assessment.get_global_score() == -1
+
+
+@pytest.mark.django_db
+class TestComplianceAssessmentQualityCheck:
+    def test_findings_follow_updates(self, implementation_groups_assessment_fixture):
+        compliance_assessment = implementation_groups_assessment_fixture
+        assert compliance_assessment.quality_check()["count"] == 1
+
+        requirement_assessment = compliance_assessment.requirement_assessments.first()
+        requirement_assessment.result = "compliant"
+        requirement_assessment.save()
+        findings = compliance_assessment.quality_check()
+        serialized = json.loads(
+            serializers.serialize("json", [requirement_assessment])
+        )[0]
+        assert findings["warnings"] == [
+            {
+                "msg": f"{requirement_assessment}: Requirement assessment result is compliant or partially compliant with no applied control applied",
+                "msgid": "requirementAssessmentNoAppliedControl",
+                "link": f"requirement-assessments/{requirement_assessment.id}",
+                "obj_type": "requirementassessment",
+                "object": {
+                    **serialized["fields"],
+                    "id": serialized["pk"],
+                    "name": str(requirement_assessment),
+                },
+            }
+        ]
+
+        applied_control = AppliedControl.objects.create(
+            name="applied control", folder=compliance_assessment.folder
+        )
+        applied_control.evidences.add(
+            Evidence.objects.create(
+                name="evidence", folder=compliance_assessment.folder
+            )
+        )
+        requirement_assessment.applied_controls.add(applied_control)
+        requirement_assessment.save()
+        findings = compliance_assessment.quality_check()
+        assert [finding["msgid"] for finding in findings["warnings"]] == [
+            "evidenceNoFile"
+        ]
+        assert [finding["msgid"] for finding in findings["info"]] == [
+            "complianceAssessmentNoAuthor",
+            "appliedControlNoReferenceControl",
+        ]
+
+
+@pytest.mark.django_db
+class TestActionPlan:
+    def test_action_plan_is_annotated(
+        self, implementation_groups_assessment_fixture, django_assert_num_queries
+    ):
+        compliance_assessment = implementation_groups_assessment_fixture
+        compliance_assessment.selected_implementation_groups = ["1"]
+        compliance_assessment.save()
+        requirement_assessments = list(
+            compliance_assessment.requirement_assessments.order_by(
+                "requirement__order_id"
+            )
+        )
+        assert [
+            ra.id for ra in compliance_assessment.get_requirement_assessments()
+        ] == [requirement_assessments[0].id, requirement_assessments[1].id]
+
+        in_scope = AppliedControl.objects.create(
+            name="in scope", folder=compliance_assessment.folder
+        )
+        in_scope.owner.add(User.objects.create_user(email="owner@example.com"))
+        out_of_scope = AppliedControl.objects.create(
+            name="out of scope", folder=compliance_assessment.folder
+        )
+        requirement_assessments[0].applied_controls.add(in_scope)
+        requirement_assessments[1].applied_controls.add(in_scope)
+        requirement_assessments[2].applied_controls.add(in_scope, out_of_scope)
+
+        # implementation groups of the requirements, applied controls and their owners
+        with django_assert_num_queries(3):
+            action_plan = [
+                (
+                    applied_control.name,
+                    applied_control.requirements_count,
+                    [owner.email for owner in applied_control.owner.all()],
+                )
+                for applied_control in compliance_assessment.get_action_plan()
+            ]
+        assert action_plan == [("in scope", 3, ["owner@example.com"])]
+
+
+@pytest.mark.django_db
+class TestBulkApplyChanges:
+    def test_changes_are_saved_in_bulk(
+        self, implementation_groups_assessment_fixture, django_assert_max_num_queries
+    ):
+        compliance_assessment = implementation_groups_assessment_fixture
+        requirement_assessments = list(
+            compliance_assessment.requirement_assessments.select_related(
+                "compliance_assessment"
+            ).order_by("requirement__order_id")
+        )
+        applied_control = AppliedControl.objects.create(
+            name="applied control", folder=compliance_assessment.folder
+        )
+        requirement_assessments[1].applied_controls.add(
+            AppliedControl.objects.create(
+                name="replaced", folder=compliance_assessment.folder
+            )
+        )
+
+        # update, applied controls replacement and summary refresh, whatever the size of the batch
+        with django_assert_max_num_queries(10):
+            RequirementAssessment.bulk_apply_changes(
+                [
+                    (
+                        requirement_assessments[0],
+                        {"result": "compliant", "score": 5, "observation": "ok"},
+                    ),
+                    (
+                        requirement_assessments[1],
+                        {"status": "done", "applied_controls": [applied_control.id]},
+                    ),
+                    (requirement_assessments[2], {"result": "non_compliant"}),
+                ]
+            )
+
+        first, second, third = (
+            RequirementAssessment.objects.get(id=requirement_assessment.id)
+            for requirement_assessment in requirement_assessments[:3]
+        )
+        assert (first.result, first.score, first.observation) == ("compliant", 5, "ok")
+        assert first.updated_at > first.created_at
+        assert second.status == "done"
+        assert list(second.applied_controls.all()) == [applied_control]
+        assert third.result == "non_compliant"
+        assert (
+            compliance_assessment.get_summary().counters
+            == ComplianceAssessmentSummary.compute(compliance_assessment)
+        )
+
+
+@pytest.mark.django_db
+class TestCreateRequirementAssessments:
+    def test_baseline_is_copied_in_bulk(
+        self, implementation_groups_assessment_fixture, django_assert_max_num_queries
+    ):
+        baseline = implementation_groups_assessment_fixture
+        folder = baseline.folder
+        evidence = Evidence.objects.create(name="evidence", folder=folder)
+        applied_control = AppliedControl.objects.create(
+            name="applied control", folder=folder
+        )
+        baseline_requirement_assessment = baseline.requirement_assessments.get(
+            requirement__name="requirement 1"
+        )
+        baseline_requirement_assessment.result = RequirementAssessment.Result.COMPLIANT
+        baseline_requirement_assessment.score = 7
+        baseline_requirement_assessment.is_scored = True
+        baseline_requirement_assessment.save()
+        baseline_requirement_assessment.evidences.add(evidence)
+        baseline_requirement_assessment.applied_controls.add(applied_control)
+        compliance_assessment = ComplianceAssessment.objects.create(
+            name="new compliance assessment",
+            project=baseline.project,
+            framework=baseline.framework,
+        )
+
+        # a constant number of statements, whatever the size of the framework
+        with django_assert_max_num_queries(16):
+            requirement_assessments = (
+                compliance_assessment.create_requirement_assessments(baseline)
+            )
+
+        assert len(requirement_assessments) == 5
+        requirement_assessment = compliance_assessment.requirement_assessments.get(
+            requirement__name="requirement 1"
+        )
+        assert requirement_assessment.result == RequirementAssessment.Result.COMPLIANT
+        assert requirement_assessment.score == 7
+        assert list(requirement_assessment.evidences.all()) == [evidence]
+        assert list(requirement_assessment.applied_controls.all()) == [applied_control]
+        assert compliance_assessment.get_global_score() == 7
+
+
+@pytest.mark.django_db
+class TestMappingInference:
+    def test_inferred_results_are_saved_in_bulk(
+        self, implementation_groups_assessment_fixture, django_assert_max_num_queries
+    ):
+        source_assessment = implementation_groups_assessment_fixture
+        source_framework = source_assessment.framework
+        target_framework = Framework.objects.create(
+            name="Target framework",
+            folder=Folder.get_root_folder(),
+            library=source_framework.library,
+        )
+        targets = [
+            RequirementNode.objects.create(
+                name=f"target {i}",
+                folder=Folder.get_root_folder(),
+                framework=target_framework,
+                assessable=True,
+                order_id=i,
+            )
+            for i in range(3)
+        ]
+        mapping_set = RequirementMappingSet.objects.create(
+            name="mapping set",
+            folder=Folder.get_root_folder(),
+            library=source_framework.library,
+            source_framework=source_framework,
+            target_framework=target_framework,
+        )
+        sources = {
+            ra.requirement.name: ra
+            for ra in source_assessment.requirement_assessments.all()
+        }
+        for name, result in [
+            ("requirement 0", RequirementAssessment.Result.COMPLIANT),
+            ("requirement 1", RequirementAssessment.Result.NON_COMPLIANT),
+        ]:
+            sources[name].result = result
+            sources[name].status = RequirementAssessment.Status.DONE
+            sources[name].save()
+        evidence = Evidence.objects.create(
+            name="evidence", folder=source_assessment.folder
+        )
+        sources["requirement 0"].evidences.add(evidence)
+        for target, source, relationship in [
+            (targets[0], "requirement 0", RequirementMapping.Relationship.EQUAL),
+            (targets[0], "requirement 1", RequirementMapping.Relationship.SUBSET),
+            (targets[1], "requirement 0", RequirementMapping.Relationship.SUBSET),
+            (targets[1], "requirement 1", RequirementMapping.Relationship.SUBSET),
+        ]:
+            RequirementMapping.objects.create(
+                mapping_set=mapping_set,
+                target_requirement=target,
+                source_requirement=sources[source].requirement,
+                relationship=relationship,
+            )
+        compliance_assessment = ComplianceAssessment.objects.create(
+            name="target compliance assessment",
+            project=source_assessment.project,
+            framework=target_framework,
+        )
+        compliance_assessment.create_requirement_assessments()
+
+        with django_assert_max_num_queries(20):
+            inferred = compliance_assessment.apply_mapping_inference(
+                mapping_set, source_assessment
+            )
+
+        assert len(inferred) == 2
+        results = {
+            ra.requirement_id: ra
+            for ra in compliance_assessment.requirement_assessments.all()
+        }
+        # full coverage mappings take precedence
+        assert results[targets[0].id].result == RequirementAssessment.Result.COMPLIANT
+        assert results[targets[0].id].status == RequirementAssessment.Status.DONE
+        assert results[targets[0].id].mapping_inference[
+            "source_requirement_assessment"
+        ] == {
+            "str": str(sources["requirement 0"]),
+            "id": str(sources["requirement 0"].id),
+            "coverage": RequirementMapping.Coverage.FULL,
+        }
+        assert list(results[targets[0].id].evidences.all()) == [evidence]
+        # otherwise the lowest result is kept
+        assert (
+            results[targets[1].id].result == RequirementAssessment.Result.NON_COMPLIANT
+        )
+        assert not results[targets[1].id].evidences.exists()
+        assert results[targets[2].id].mapping_inference == {}
+        assert compliance_assessment.donut_render()["result"]["values"][2] == {
+            "name": "non_compliant",
+            "localName": "nonCompliant",
+            "value": 1,
+            "itemStyle": {"color": "#f87171"},
+        }
+
+    def test_transitive_mappings_are_used_without_direct_mapping_set(
+        self, implementation_groups_assessment_fixture
+    ):
+        source_assessment = implementation_groups_assessment_fixture
+        library = source_assessment.framework.library
+        frameworks = [source_assessment.framework]
+        requirements = [
+            {
+                node.name: node
+                for node in RequirementNode.objects.filter(framework=frameworks[0])
+            }
+        ]
+        for i in (1, 2):
+            framework = Framework.objects.create(
+                name=f"framework {i}", folder=Folder.get_root_folder(), library=library
+            )
+            frameworks.append(framework)
+            requirements.append(
+                {
+                    f"requirement {j}": RequirementNode.objects.create(
+                        name=f"requirement {j}",
+                        folder=Folder.get_root_folder(),
+                        framework=framework,
+                        assessable=True,
+                    )
+                    for j in range(2)
+                }
+            )
+        chain = [
+            (0, "requirement 0", 1, "requirement 0", "equal"),
+            (1, "requirement 0", 2, "requirement 0", "superset"),
+            (0, "requirement 1", 1, "requirement 1", "superset"),
+            (1, "requirement 1", 2, "requirement 1", "subset"),
+        ]
+        mapping_sets = {}
+        for source, source_name, target, target_name, relationship in chain:
+            if (source, target) not in mapping_sets:
+                mapping_sets[(source, target)] = RequirementMappingSet.objects.create(
+                    name=f"mapping set {source} {target}",
+                    folder=Folder.get_root_folder(),
+                    library=library,
+                    source_framework=frameworks[source],
+                    target_framework=frameworks[target],
+                )
+            RequirementMapping.objects.create(
+                mapping_set=mapping_sets[(source, target)],
+                source_requirement=requirements[source][source_name],
+                target_requirement=requirements[target][target_name],
+                relationship=relationship,
+            )
+        TransitiveRequirementMapping.rebuild()
+
+        assert set(
+            TransitiveRequirementMapping.get_target_frameworks(frameworks[0])
+        ) == {
+            frameworks[1],
+            frameworks[2],
+        }
+        assert {
+            (mapping.target_requirement.name, mapping.relationship, mapping.depth)
+            for mapping in TransitiveRequirementMapping.objects.filter(
+                source_framework=frameworks[0], target_framework=frameworks[2]
+            )
+        } == {("requirement 0", "superset", 2), ("requirement 1", "intersect", 2)}
+
+        for name in ("requirement 0", "requirement 1"):
+            requirement_assessment = source_assessment.requirement_assessments.get(
+                requirement=requirements[0][name]
+            )
+            requirement_assessment.result = RequirementAssessment.Result.COMPLIANT
+            requirement_assessment.save()
+        compliance_assessment = ComplianceAssessment.objects.create(
+            name="target compliance assessment",
+            project=source_assessment.project,
+            framework=frameworks[2],
+        )
+        compliance_assessment.create_requirement_assessments()
+        compliance_assessment.apply_mapping_inference(None, source_assessment)
+
+        results = dict(
+            compliance_assessment.requirement_assessments.values_list(
+                "requirement__name", "result"
+            )
+        )
+        assert results == {
+            "requirement 0": RequirementAssessment.Result.COMPLIANT,
+            "requirement 1": RequirementAssessment.Result.PARTIALLY_COMPLIANT,
+        }
@@ -0,0 +1,95 @@
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from core.utils import (
+    compose_mapping_relationships,
+    compose_requirement_mappings,
+    iter_csv,
+    iter_xlsx,
+    xlsx_column,
+)
+
+SPREADSHEETML = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def test_compose_mapping_relationships():
+    assert compose_mapping_relationships("equal", "subset") == "subset"
+    assert compose_mapping_relationships("intersect", "equal") == "intersect"
+    assert compose_mapping_relationships("superset", "superset") == "superset"
+    assert compose_mapping_relationships("superset", "subset") == "intersect"
+    # a and c are both included in b, they may not overlap
+    assert compose_mapping_relationships("subset", "superset") is None
+    assert compose_mapping_relationships("intersect", "intersect") is None
+    assert compose_mapping_relationships("intersect", "superset") is None
+
+
+def test_compose_requirement_mappings_stops_at_underivable_relationships():
+    mappings = [
+        ("a", "b", "subset", 1, 2),
+        ("b", "c", "superset", 2, 3),
+        ("c", "d", "equal", 3, 4),
+        ("a", "e", "intersect", 1, 5),
+        ("e", "f", "equal", 5, 6),
+    ]
+    composed = compose_requirement_mappings(mappings)
+
+    assert ("a", "c") not in composed
+    assert ("a", "d") not in composed
+    assert composed[("a", "f")] == ("intersect", 2, 1, 6)
+
+
+def test_iter_csv():
+    assert list(iter_csv([["a", "b;c"], [1, None]])) == ['a;"b;c"\r\n', "1;\r\n"]
+
+
+def test_iter_xlsx():
+    rows = [["ref_id", "score"], ["1.1 <a> & b\x01", 3], [None, 2.5]]
+    content = b"".join(iter_xlsx(iter(rows), "audit", flush_every=1))
+
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert archive.testzip() is None
+        assert "xl/styles.xml" in archive.namelist()
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+    assert workbook.find(f"{SPREADSHEETML}sheets/{SPREADSHEETML}sheet").get("name") == (
+        "audit"
+    )
+    assert [row.get("r") for row in sheet.iter(f"{SPREADSHEETML}row")] == [
+        "1",
+        "2",
+        "3",
+    ]
+    assert {
+        cell.get("r"): cell.findtext(f"{SPREADSHEETML}is/{SPREADSHEETML}t")
+        or cell.findtext(f"{SPREADSHEETML}v")
+        for cell in sheet.iter(f"{SPREADSHEETML}c")
+    } == {"A1": "ref_id", "B1": "score", "A2": "1.1 <a> & b", "B2": "3", "B3": "2.5"}
+
+
+def test_iter_xlsx_is_read_by_openpyxl():
+    openpyxl = pytest.importorskip("openpyxl")
+    rows = [["ref_id", "score"], ["1.1 <a> & b", 3], [None, 2.5]]
+    rows += [[f"row {i}", *range(30)] for i in range(1000)]
+
+    workbook = openpyxl.load_workbook(
+        io.BytesIO(b"".join(iter_xlsx(iter(rows), "audit"))), read_only=False
+    )
+
+    assert workbook.sheetnames == ["audit"]
+    assert [list(row) for row in workbook["audit"].iter_rows(values_only=True)] == [
+        row + [None] * (31 - len(row)) for row in rows
+    ]
+
+
+def test_xlsx_column():
+    assert [xlsx_column(i) for i in (0, 25, 26, 27, 701, 702)] == [
+        "A",
+        "Z",
+        "AA",
+        "AB",
+        "ZZ",
+        "AAA",
+    ]
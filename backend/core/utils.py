@@ -1,7 +1,11 @@
 from django.utils.translation import gettext_lazy as _
 from re import sub
 from enum import Enum
+from xml.sax.saxutils import escape
+import csv
 import hashlib
+import re
+import zipfile
 
 
 def camel_case(s):
@@ -19,6 +23,224 @@ def sha256(string: bytes) -> str:
     return h.hexdigest()
 
 
+# strongest first: equal and superset fully cover the target requirement
+MAPPING_RELATIONSHIP_RANK = {"equal": 0, "superset": 1, "subset": 2, "intersect": 3}
+
+
+def compose_mapping_relationships(first: str, second: str) -> str | None:
+    """
+    Composes the relationships of two consecutive mappings (a -> b, b -> c) into the relationship a -> c
+    Returns None when no relationship can be derived, e.g. a and c may not overlap at all
+    """
+    if first == "equal":
+        return second
+    if second == "equal":
+        return first
+    if first == second and first in ("superset", "subset"):
+        return first
+    # a and c both include b
+    if (first, second) == ("superset", "subset"):
+        return "intersect"
+    return None
+
+
+def compose_requirement_mappings(mappings, max_depth: int = 3) -> dict:
+    """
+    Composes requirement mappings along chains of mapping sets across frameworks
+    mappings: iterable of (source_requirement_id, target_requirement_id, relationship,
+    source_framework_id, target_framework_id)
+    Paths never go through the same framework twice and contain at most max_depth mappings
+    Returns a dict (source_requirement_id, target_requirement_id) ->
+    (relationship, depth, source_framework_id, target_framework_id)
+    keeping for each pair the strongest relationship, then the shortest path
+    """
+    outgoing = {}
+    for source, target, relationship, source_framework, target_framework in mappings:
+        if relationship not in MAPPING_RELATIONSHIP_RANK:
+            continue
+        outgoing.setdefault(source, []).append(
+            (target, relationship, source_framework, target_framework)
+        )
+
+    composed = {}
+    for source, edges in outgoing.items():
+        source_framework = edges[0][2]
+        seen = {}
+        stack = [(source, None, 0, frozenset([source_framework]))]
+        while stack:
+            node, relationship, depth, frameworks = stack.pop()
+            if depth == max_depth:
+                continue
+            for target, next_relationship, _, target_framework in outgoing.get(
+                node, []
+            ):
+                if target_framework in frameworks:
+                    continue
+                path_relationship = (
+                    next_relationship
+                    if relationship is None
+                    else compose_mapping_relationships(relationship, next_relationship)
+                )
+                if path_relationship is None:
+                    continue
+                candidate = (MAPPING_RELATIONSHIP_RANK[path_relationship], depth + 1)
+                best = composed.get((source, target))
+                if best is None or candidate < (
+                    MAPPING_RELATIONSHIP_RANK[best[0]],
+                    best[1],
+                ):
+                    composed[(source, target)] = (
+                        path_relationship,
+                        depth + 1,
+                        source_framework,
+                        target_framework,
+                    )
+                if seen.get((target, path_relationship), max_depth) <= depth + 1:
+                    continue
+                seen[(target, path_relationship)] = depth + 1
+                stack.append(
+                    (
+                        target,
+                        path_relationship,
+                        depth + 1,
+                        frameworks | {target_framework},
+                    )
+                )
+    return composed
+
+
+class StreamBuffer:
+    """
+    Write-only file object whose content is handed over by pop()
+    Used to turn zip archives into generators for streaming responses
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks) if self.chunks else b""
+        self.chunks = []
+        return data
+
+
+class Echo:
+    """Pseudo-buffer whose write returns the value, so that csv writers return each line"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, delimiter: str = ";"):
+    """Yields the lines of a CSV file, one per row"""
+    writer = csv.writer(Echo(), delimiter=delimiter)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+XLSX_ILLEGAL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        "</Relationships>"
+    ),
+    # default style, required by Excel
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        "</styleSheet>"
+    ),
+}
+
+
+def xlsx_column(index: int) -> str:
+    """Returns the letters of the column at the given 0-based index, e.g. 27 -> AB"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def xlsx_cell(value, ref: str) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(XLSX_ILLEGAL_CHARACTERS.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def iter_xlsx(rows, sheet_name: str = "Sheet1", flush_every: int = 500):
+    """
+    Yields the bytes of a single sheet XLSX workbook, written row by row with inline strings
+    The archive is written without seeking, so that memory does not grow with the number of rows
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>",
+        )
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            for i, row in enumerate(rows, start=1):
+                cells = "".join(
+                    xlsx_cell(value, f"{xlsx_column(j)}{i}")
+                    for j, value in enumerate(row)
+                )
+                sheet.write(f'<row r="{i}">{cells}</row>'.encode())
+                if i % flush_every == 0:
+                    yield buffer.pop()
+            sheet.write(b"</sheetData></worksheet>")
+    yield buffer.pop()
+
+
 class RoleCodename(Enum):
     ADMINISTRATOR = "BI-RL-ADM"
     DOMAIN_MANAGER = "BI-RL-DMA"
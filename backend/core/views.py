@@ -19,18 +19,19 @@ from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 from django.core.cache import cache
 
+from django.apps import apps
 from django.contrib.auth.models import Permission
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.db import models
 from django.forms import ValidationError
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.middleware import csrf
 from django.template.loader import render_to_string
 from django.utils.functional import Promise
 from django_filters.rest_framework import DjangoFilterBackend
-from iam.models import Folder, RoleAssignment, UserGroup
+from iam.models import Folder, RoleAssignment, UserGroup, get_permission
 from rest_framework import filters, permissions, status, viewsets
 from django.utils.translation import gettext_lazy as _
 from rest_framework.decorators import (
@@ -50,13 +51,15 @@ from rest_framework.views import APIView
 from weasyprint import HTML
 
 from core.helpers import *
+from core.permissions import get_object_permissions
 from core.models import (
     AppliedControl,
     ComplianceAssessment,
     RequirementMappingSet,
 )
 from core.serializers import ComplianceAssessmentReadSerializer
-from core.utils import RoleCodename, UserGroupCodename
+from core.utils import RoleCodename, UserGroupCodename, iter_csv, iter_xlsx
+from core import quantification
 
 from .models import *
 from .serializers import *
@@ -91,19 +94,19 @@ class BaseModelViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if not self.model:
             return None
-        object_ids_view = None
         if self.request.method == "GET":
             if q := re.match("/api/[\w-]+/([0-9a-f-]+)", self.request.path):
                 """"get_queryset is called by Django even for an individual object via get_object
                 https://stackoverflow.com/questions/74048193/why-does-a-retrieve-request-end-up-calling-get-queryset"""
                 id = UUID(q.group(1))
-                if RoleAssignment.is_object_readable(self.request.user, self.model, id):
-                    object_ids_view = [id]
-        if not object_ids_view:
-            object_ids_view = RoleAssignment.get_accessible_object_ids(
-                Folder.get_root_folder(), self.request.user, self.model
-            )[0]
-        queryset = self.model.objects.filter(id__in=object_ids_view)
+                view_codename = "view_" + self.model.__name__.lower()
+                if view_codename in get_object_permissions(
+                    self.request, self.model, id
+                ):
+                    return self.model.objects.filter(id=id)
+        (queryset, _, _) = RoleAssignment.get_accessible_objects(
+            Folder.get_root_folder(), self.request.user, self.model
+        )
         return queryset
 
     def get_serializer_class(self, **kwargs):
@@ -210,23 +213,29 @@ class ProjectViewSet(BaseModelViewSet):
             }
             for p in projects
         }
-        for compliance_assessment in ComplianceAssessment.objects.filter(
-            project__in=projects
-        ):
-            res[str(compliance_assessment.project.id)]["compliance_assessments"][
+        compliance_assessments = list(
+            ComplianceAssessment.objects.filter(project__in=projects)
+        )
+        compliance_quality_checks = ComplianceAssessment.get_quality_checks(
+            compliance_assessments
+        )
+        for compliance_assessment in compliance_assessments:
+            res[str(compliance_assessment.project_id)]["compliance_assessments"][
                 "objects"
             ][str(compliance_assessment.id)] = {
                 "object": ComplianceAssessmentReadSerializer(
                     compliance_assessment
                 ).data,
-                "quality_check": compliance_assessment.quality_check(),
+                "quality_check": compliance_quality_checks[compliance_assessment.id],
             }
-        for risk_assessment in RiskAssessment.objects.filter(project__in=projects):
-            res[str(risk_assessment.project.id)]["risk_assessments"]["objects"][
+        risk_assessments = list(RiskAssessment.objects.filter(project__in=projects))
+        risk_quality_checks = RiskAssessment.get_quality_checks(risk_assessments)
+        for risk_assessment in risk_assessments:
+            res[str(risk_assessment.project_id)]["risk_assessments"]["objects"][
                 str(risk_assessment.id)
             ] = {
                 "object": RiskAssessmentReadSerializer(risk_assessment).data,
-                "quality_check": risk_assessment.quality_check(),
+                "quality_check": risk_quality_checks[risk_assessment.id],
             }
         return Response({"results": res})
 
@@ -245,21 +254,29 @@ class ProjectViewSet(BaseModelViewSet):
                 "compliance_assessments": {"objects": {}},
                 "risk_assessments": {"objects": {}},
             }
-            for compliance_assessment in ComplianceAssessment.objects.filter(
-                project=project
-            ):
+            compliance_assessments = list(
+                ComplianceAssessment.objects.filter(project=project)
+            )
+            compliance_quality_checks = ComplianceAssessment.get_quality_checks(
+                compliance_assessments
+            )
+            for compliance_assessment in compliance_assessments:
                 res["compliance_assessments"]["objects"][
                     str(compliance_assessment.id)
                 ] = {
                     "object": ComplianceAssessmentReadSerializer(
                         compliance_assessment
                     ).data,
-                    "quality_check": compliance_assessment.quality_check(),
+                    "quality_check": compliance_quality_checks[
+                        compliance_assessment.id
+                    ],
                 }
-            for risk_assessment in RiskAssessment.objects.filter(project=project):
+            risk_assessments = list(RiskAssessment.objects.filter(project=project))
+            risk_quality_checks = RiskAssessment.get_quality_checks(risk_assessments)
+            for risk_assessment in risk_assessments:
                 res["risk_assessments"]["objects"][str(risk_assessment.id)] = {
                     "object": RiskAssessmentReadSerializer(risk_assessment).data,
-                    "quality_check": risk_assessment.quality_check(),
+                    "quality_check": risk_quality_checks[risk_assessment.id],
                 }
             return Response(res)
         else:
@@ -390,9 +407,10 @@ class RiskAssessmentViewSet(BaseModelViewSet):
             user=request.user,
             object_type=RiskAssessment,
         )
-        risk_assessments = RiskAssessment.objects.filter(id__in=viewable_objects)
+        risk_assessments = list(RiskAssessment.objects.filter(id__in=viewable_objects))
+        quality_checks = RiskAssessment.get_quality_checks(risk_assessments)
         res = [
-            {"id": a.id, "name": a.name, "quality_check": a.quality_check()}
+            {"id": a.id, "name": a.name, "quality_check": quality_checks[a.id]}
             for a in risk_assessments
         ]
         return Response({"results": res})
@@ -413,6 +431,49 @@ class RiskAssessmentViewSet(BaseModelViewSet):
         else:
             return Response(status=HTTP_403_FORBIDDEN)
 
+    @action(detail=True, methods=["get"], name="Get risk quantification")
+    def quantification(self, request, pk):
+        """
+        Returns the simulated annual losses and loss exceedance curves of the risk scenarios
+        Query parameters: iterations, seed and residual (current levels by default)
+        """
+        (viewable_objects, _, _) = RoleAssignment.get_accessible_object_ids(
+            folder=Folder.get_root_folder(),
+            user=request.user,
+            object_type=RiskAssessment,
+        )
+        if UUID(pk) not in viewable_objects:
+            return Response(status=HTTP_403_FORBIDDEN)
+        try:
+            iterations = int(
+                request.query_params.get(
+                    "iterations", quantification.DEFAULT_ITERATIONS
+                )
+            )
+            seed = request.query_params.get("seed")
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            return Response(
+                {"error": "iterations and seed must be integers"},
+                status=HTTP_400_BAD_REQUEST,
+            )
+        if not 0 < iterations <= quantification.MAX_ITERATIONS:
+            return Response(
+                {
+                    "error": f"iterations must be between 1 and {quantification.MAX_ITERATIONS}"
+                },
+                status=HTTP_400_BAD_REQUEST,
+            )
+        residual = request.query_params.get("residual", "").lower() in ("1", "true")
+        risk_assessment = self.get_object()
+        try:
+            result = risk_assessment.get_quantification(
+                iterations=iterations, seed=seed, residual=residual
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
+        return Response(result)
+
     @action(detail=True, methods=["get"], name="Get treatment plan data")
     def plan(self, request, pk):
         (viewable_objects, _, _) = RoleAssignment.get_accessible_object_ids(
@@ -606,54 +667,13 @@ class RiskAssessmentViewSet(BaseModelViewSet):
             risk_assessment = self.get_object()
             data = request.data
 
-            duplicate_risk_assessment = RiskAssessment.objects.create(
+            duplicate_risk_assessment(
+                risk_assessment,
                 name=data["name"],
                 description=data["description"],
                 project=Project.objects.get(id=data["project"]),
                 version=data["version"],
-                risk_matrix=risk_assessment.risk_matrix,
-                eta=risk_assessment.eta,
-                due_date=risk_assessment.due_date,
-                status=risk_assessment.status,
             )
-
-            duplicate_risk_assessment.authors.set(risk_assessment.authors.all())
-            duplicate_risk_assessment.reviewers.set(risk_assessment.reviewers.all())
-
-            for scenario in risk_assessment.risk_scenarios.all():
-                duplicate_scenario = RiskScenario.objects.create(
-                    risk_assessment=duplicate_risk_assessment,
-                    name=scenario.name,
-                    description=scenario.description,
-                    existing_controls=scenario.existing_controls,
-                    treatment=scenario.treatment,
-                    qualifications=scenario.qualifications,
-                    current_proba=scenario.current_proba,
-                    current_impact=scenario.current_impact,
-                    residual_proba=scenario.residual_proba,
-                    residual_impact=scenario.residual_impact,
-                    strength_of_knowledge=scenario.strength_of_knowledge,
-                    justification=scenario.justification,
-                )
-
-                for field in ["applied_controls", "threats", "assets"]:
-                    duplicate_related_objects(
-                        scenario,
-                        duplicate_scenario,
-                        duplicate_risk_assessment.project.folder,
-                        field,
-                    )
-
-                if (
-                    duplicate_risk_assessment.project.folder
-                    in [risk_assessment.project.folder]
-                    + risk_assessment.project.folder.sub_folders()
-                ):
-                    duplicate_scenario.owner.set(scenario.owner.all())
-
-                duplicate_scenario.save()
-
-            duplicate_risk_assessment.save()
             return Response({"results": "risk assessment duplicated"})
 
 
@@ -1105,7 +1125,7 @@ class RiskAcceptanceViewSet(BaseModelViewSet):
         for scenario in risk_acceptance.get("risk_scenarios"):
             if not RoleAssignment.is_access_allowed(
                 risk_acceptance.get("approver"),
-                Permission.objects.get(codename="approve_riskacceptance"),
+                get_permission("approve_riskacceptance"),
                 scenario.risk_assessment.project.folder,
             ):
                 raise ValidationError(
@@ -1341,6 +1361,36 @@ def get_counters_view(request):
     return Response({"results": get_counters(request.user)})
 
 
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def check_permissions_view(request):
+    """
+    API endpoint that returns the view/change/delete flags of the user on a batch of objects
+    Expects {"model": <model name>, "ids": [<uuid>, ...]}
+    """
+    model_name = str(request.data.get("model", "")).lower()
+    object_types = [
+        model
+        for model in apps.get_models()
+        if model._meta.model_name == model_name
+        and Folder.get_folder_lookup(model) is not None
+    ]
+    if len(object_types) != 1:
+        return Response(
+            {"error": f"Unknown model: {model_name}"}, status=HTTP_400_BAD_REQUEST
+        )
+    ids = request.data.get("ids", [])
+    try:
+        ids = [UUID(str(id)) for id in ids]
+    except (TypeError, ValueError):
+        return Response({"error": "Invalid ids"}, status=HTTP_400_BAD_REQUEST)
+    flags = RoleAssignment.get_permission_flags(
+        Folder.get_root_folder(), request.user, object_types[0], ids
+    )
+    no_access = {"view": False, "change": False, "delete": False}
+    return Response({"results": {str(id): flags.get(id, no_access) for id in ids}})
+
+
 @cache_page(60 * SHORT_CACHE_TTL)
 @vary_on_cookie
 @api_view(["GET"])
@@ -1463,13 +1513,7 @@ class FrameworkViewSet(BaseModelViewSet):
     @action(detail=True, methods=["get"])
     def tree(self, request, pk):
         _framework = Framework.objects.get(id=pk)
-        return Response(
-            get_sorted_requirement_nodes(
-                RequirementNode.objects.filter(framework=_framework).all(),
-                None,
-                _framework.max_score,
-            )
-        )
+        return Response(get_framework_tree(_framework))
 
     @action(detail=False, name="Get used frameworks")
     def used(self, request):
@@ -1497,10 +1541,10 @@ class FrameworkViewSet(BaseModelViewSet):
     @action(detail=True, methods=["get"], name="Get target frameworks from mappings")
     def mappings(self, request, pk):
         framework = self.get_object()
-        available_target_frameworks_objects = [framework]
-        mappings = RequirementMappingSet.objects.filter(source_framework=framework)
-        for mapping in mappings:
-            available_target_frameworks_objects.append(mapping.target_framework)
+        available_target_frameworks_objects = [
+            framework,
+            *TransitiveRequirementMapping.get_target_frameworks(framework),
+        ]
         available_target_frameworks = FrameworkReadSerializer(
             available_target_frameworks_objects, many=True
         ).data
@@ -1650,91 +1694,64 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
                 "deprecated": [],
             }
             compliance_assessment_object = self.get_object()
-            requirement_assessments_objects = (
-                compliance_assessment_object.get_requirement_assessments()
-            )
-            applied_controls = [
-                {
-                    "id": applied_control.id,
-                    "name": applied_control.name,
-                    "description": applied_control.description,
-                    "status": applied_control.status,
-                    "category": applied_control.category,
-                    "csf_function": applied_control.csf_function,
-                    "eta": applied_control.eta,
-                    "expiry_date": applied_control.expiry_date,
-                    "link": applied_control.link,
-                    "effort": applied_control.effort,
-                    "cost": applied_control.cost,
-                    "owners": [
-                        {
-                            "id": owner.id,
-                            "email": owner.email,
-                        }
-                        for owner in applied_control.owner.all()
-                    ],
-                }
-                for applied_control in AppliedControl.objects.filter(
-                    requirement_assessments__in=requirement_assessments_objects
-                ).distinct()
-            ]
-
-            for applied_control in applied_controls:
-                applied_control["requirements_count"] = (
-                    RequirementAssessment.objects.filter(
-                        compliance_assessment=compliance_assessment_object
-                    )
-                    .filter(applied_controls=applied_control["id"])
-                    .count()
+            for applied_control in compliance_assessment_object.get_action_plan():
+                applied_control_status = applied_control.status
+                response[
+                    "none"
+                    if not applied_control_status or applied_control_status == "--"
+                    else applied_control_status.lower()
+                ].append(
+                    {
+                        "id": applied_control.id,
+                        "name": applied_control.name,
+                        "description": applied_control.description,
+                        "status": applied_control_status,
+                        "category": applied_control.category,
+                        "csf_function": applied_control.csf_function,
+                        "eta": applied_control.eta,
+                        "expiry_date": applied_control.expiry_date,
+                        "link": applied_control.link,
+                        "effort": applied_control.effort,
+                        "cost": applied_control.cost,
+                        "owners": [
+                            {
+                                "id": owner.id,
+                                "email": owner.email,
+                            }
+                            for owner in applied_control.owner.all()
+                        ],
+                        "requirements_count": applied_control.requirements_count,
+                    }
                 )
-                if applied_control["status"] == "--":
-                    response["none"].append(applied_control)
-                else:
-                    response[applied_control["status"].lower()].append(applied_control)
 
         return Response(response)
 
     @action(detail=True, name="Get compliance assessment (audit) CSV")
     def compliance_assessment_csv(self, request, pk):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="audit_export.csv"'
-
-        (viewable_objects, _, _) = RoleAssignment.get_accessible_object_ids(
-            Folder.get_root_folder(), request.user, ComplianceAssessment
-        )
-
-        if UUID(pk) in viewable_objects:
-            writer = csv.writer(response, delimiter=";")
-            columns = [
-                "ref_id",
-                "description",
-                "compliance_result",
-                "progress",
-                "score",
-                "observations",
-            ]
-            writer.writerow(columns)
-
-            for req in RequirementAssessment.objects.filter(compliance_assessment=pk):
-                req_node = RequirementNode.objects.get(pk=req.requirement.id)
-                req_text = (
-                    req_node.get_description_translated
-                    if req_node.description
-                    else req_node.get_name_translated
-                )
-                row = [
-                    req_node.ref_id,
-                    req_text,
-                ]
-                if req_node.assessable:
-                    row += [
-                        req.result,
-                        req.status,
-                        req.score,
-                        req.observation,
-                    ]
-                writer.writerow(row)
+        if "view_complianceassessment" in get_object_permissions(
+            request, ComplianceAssessment, UUID(pk)
+        ):
+            response = StreamingHttpResponse(
+                iter_csv(get_compliance_assessment_rows(pk)),
+                content_type="text/csv",
+            )
+            response["Content-Disposition"] = 'attachment; filename="audit_export.csv"'
+            return response
+        else:
+            return Response(
+                {"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN
+            )
 
+    @action(detail=True, name="Get compliance assessment (audit) XLSX")
+    def compliance_assessment_xlsx(self, request, pk):
+        if "view_complianceassessment" in get_object_permissions(
+            request, ComplianceAssessment, UUID(pk)
+        ):
+            response = StreamingHttpResponse(
+                iter_xlsx(get_compliance_assessment_rows(pk), "audit"),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+            response["Content-Disposition"] = 'attachment; filename="audit_export.xlsx"'
             return response
         else:
             return Response(
@@ -1765,17 +1782,7 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
             }
             status = AppliedControl.Status.choices
             compliance_assessment_object = self.get_object()
-            requirement_assessments_objects = (
-                compliance_assessment_object.get_requirement_assessments()
-            )
-            applied_controls = (
-                AppliedControl.objects.filter(
-                    requirement_assessments__in=requirement_assessments_objects
-                )
-                .distinct()
-                .order_by("eta")
-            )
-            for applied_control in applied_controls:
+            for applied_control in compliance_assessment_object.get_action_plan():
                 context[applied_control.status].append(
                     applied_control
                 ) if applied_control.status else context["no status"].append(
@@ -1833,30 +1840,12 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
         instance: ComplianceAssessment = serializer.save()
         instance.create_requirement_assessments(baseline)
         if baseline and baseline.framework != instance.framework:
-            mapping_set = RequirementMappingSet.objects.get(
+            # a direct mapping set takes precedence over transitive mappings
+            mapping_set = RequirementMappingSet.objects.filter(
                 target_framework=serializer.validated_data["framework"],
                 source_framework=baseline.framework,
-            )
-            for (
-                requirement_assessment
-            ) in instance.compute_requirement_assessments_results(
-                mapping_set, baseline
-            ):
-                baseline_requirement_assessment = RequirementAssessment.objects.get(
-                    id=requirement_assessment.mapping_inference[
-                        "source_requirement_assessment"
-                    ]["id"]
-                )
-                requirement_assessment.evidences.add(
-                    *[ev.id for ev in baseline_requirement_assessment.evidences.all()]
-                )
-                requirement_assessment.applied_controls.add(
-                    *[
-                        ac.id
-                        for ac in baseline_requirement_assessment.applied_controls.all()
-                    ]
-                )
-                requirement_assessment.save()
+            ).first()
+            instance.apply_mapping_inference(mapping_set, baseline)
         if create_applied_controls:
             for requirement_assessment in instance.requirement_assessments.all():
                 requirement_assessment.create_applied_controls_from_suggestions()
@@ -1876,11 +1865,12 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
             user=request.user,
             object_type=ComplianceAssessment,
         )
-        compliance_assessments = ComplianceAssessment.objects.filter(
-            id__in=viewable_objects
+        compliance_assessments = list(
+            ComplianceAssessment.objects.filter(id__in=viewable_objects)
         )
+        quality_checks = ComplianceAssessment.get_quality_checks(compliance_assessments)
         res = [
-            {"id": a.id, "name": a.name, "quality_check": a.quality_check()}
+            {"id": a.id, "name": a.name, "quality_check": quality_checks[a.id]}
             for a in compliance_assessments
         ]
         return Response({"results": res})
@@ -1917,8 +1907,8 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
     @action(detail=True, methods=["get"])
     def tree(self, request, pk):
         _framework = self.get_object().framework
-        tree = get_sorted_requirement_nodes(
-            RequirementNode.objects.filter(framework=_framework).all(),
+        tree = overlay_requirement_assessments(
+            get_framework_tree(_framework),
             RequirementAssessment.objects.filter(
                 compliance_assessment=self.get_object()
             ).all(),
@@ -1929,6 +1919,20 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
             filter_graph_by_implementation_groups(tree, implementation_groups)
         )
 
+    @action(detail=True, methods=["get"])
+    def requirement_groups_stats(self, request, pk):
+        """Returns the percentage of descendant requirements per status for each requirement node"""
+        stats = get_compliance_assessment_stats(self.get_object())
+        return Response(
+            {
+                str(node_id): [
+                    {"status": st, "label": label, "percentage": percentage}
+                    for (st, label, percentage) in node_stats
+                ]
+                for node_id, node_stats in stats.items()
+            }
+        )
+
     @action(detail=True, methods=["get"])
     def requirements_list(self, request, pk):
         """Returns the list of requirement assessments for the different audit modes"""
@@ -1998,7 +2002,7 @@ class ComplianceAssessmentViewSet(BaseModelViewSet):
         compliance_assessment = ComplianceAssessment.objects.get(id=pk)
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(codename="add_appliedcontrol"),
+            perm=get_permission("add_appliedcontrol"),
             folder=compliance_assessment.folder,
         ):
             return Response(status=status.HTTP_403_FORBIDDEN)
@@ -2022,6 +2026,115 @@ class RequirementAssessmentViewSet(BaseModelViewSet):
         cache.clear()
         return response
 
+    @action(detail=False, methods=["patch"], url_path="batch")
+    def batch_update(self, request):
+        """
+        Updates a list of requirement assessments in one request
+        Each entry is {id, result, status, score, observation, applied_controls}, all but id being optional
+        The whole batch is authorized and validated at once, then saved in bulk
+        Invalid entries are left untouched and reported with their index in errors
+        """
+        if not isinstance(request.data, list):
+            return Response(
+                {"error": "Expected a list of requirement assessments"},
+                status=HTTP_400_BAD_REQUEST,
+            )
+        entries, errors = [], []
+        for index, item in enumerate(request.data):
+            serializer = RequirementAssessmentBatchUpdateSerializer(data=item)
+            if serializer.is_valid():
+                entries.append((index, dict(serializer.validated_data)))
+            else:
+                errors.append(
+                    {
+                        "index": index,
+                        "id": item.get("id") if isinstance(item, dict) else None,
+                        "errors": serializer.errors,
+                    }
+                )
+
+        root_folder = Folder.get_root_folder()
+        permission_flags = RoleAssignment.get_permission_flags(
+            root_folder,
+            request.user,
+            RequirementAssessment,
+            list({data["id"] for _, data in entries}),
+        )
+        applied_control_ids = {
+            applied_control_id
+            for _, data in entries
+            for applied_control_id in data.get("applied_controls", [])
+        }
+        applied_control_flags = (
+            RoleAssignment.get_permission_flags(
+                root_folder, request.user, AppliedControl, list(applied_control_ids)
+            )
+            if applied_control_ids
+            else {}
+        )
+        requirement_assessments = RequirementAssessment.objects.select_related(
+            "compliance_assessment"
+        ).in_bulk([id for id, flags in permission_flags.items() if flags["change"]])
+
+        changes, seen = [], set()
+        for index, data in entries:
+            requirement_assessment_id = data.pop("id")
+            requirement_assessment = requirement_assessments.get(
+                requirement_assessment_id
+            )
+            item_errors = {}
+            if requirement_assessment is None:
+                item_errors["id"] = "Requirement assessment not found"
+            elif requirement_assessment_id in seen:
+                item_errors["id"] = "Requirement assessment updated twice"
+            else:
+                compliance_assessment = requirement_assessment.compliance_assessment
+                score = data.get("score")
+                if score is not None and not (
+                    compliance_assessment.min_score
+                    <= score
+                    <= compliance_assessment.max_score
+                ):
+                    item_errors["score"] = (
+                        f"Score must be between {compliance_assessment.min_score} and {compliance_assessment.max_score}"
+                    )
+                unknown_applied_controls = [
+                    str(applied_control_id)
+                    for applied_control_id in data.get("applied_controls", [])
+                    if not applied_control_flags.get(applied_control_id, {}).get("view")
+                ]
+                if unknown_applied_controls:
+                    item_errors["applied_controls"] = (
+                        f"Applied controls not found: {', '.join(unknown_applied_controls)}"
+                    )
+            if item_errors:
+                errors.append(
+                    {
+                        "index": index,
+                        "id": str(requirement_assessment_id),
+                        "errors": item_errors,
+                    }
+                )
+                continue
+            seen.add(requirement_assessment_id)
+            changes.append((requirement_assessment, data))
+
+        if changes:
+            RequirementAssessment.bulk_apply_changes(changes)
+            cache.clear()
+        return Response(
+            {
+                "results": [
+                    str(requirement_assessment.id)
+                    for requirement_assessment, _ in changes
+                ],
+                "errors": sorted(errors, key=lambda error: error["index"]),
+            },
+            status=HTTP_400_BAD_REQUEST
+            if errors and not changes
+            else status.HTTP_200_OK,
+        )
+
     @action(detail=False, name="Get updatable measures")
     def updatables(self, request):
         (_, object_ids_change, _) = RoleAssignment.get_accessible_object_ids(
@@ -2104,7 +2217,7 @@ class RequirementAssessmentViewSet(BaseModelViewSet):
         requirement_assessment = RequirementAssessment.objects.get(id=pk)
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(codename="add_appliedcontrol"),
+            perm=get_permission("add_appliedcontrol"),
             folder=requirement_assessment.folder,
         ):
             return Response(status=status.HTTP_403_FORBIDDEN)
@@ -2154,8 +2267,8 @@ def generate_html(
     ).all()
 
     implementation_groups = compliance_assessment.selected_implementation_groups
-    graph = get_sorted_requirement_nodes(
-        list(requirement_nodes),
+    graph = overlay_requirement_assessments(
+        get_framework_tree(compliance_assessment.framework),
         list(assessments),
         compliance_assessment.framework.max_score,
     )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IamConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "iam"
+
+    def ready(self):
+        from . import signals  # noqa: F401
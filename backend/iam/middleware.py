@@ -0,0 +1,33 @@
+import structlog
+
+from iam.models import rbac_context, warm_registry
+
+logger = structlog.get_logger(__name__)
+
+
+class RBACContextMiddleware:
+    """
+    Install a request-scoped RBAC context, in which role assignments, perimeters and
+    accessible objects are computed once per user and model for the lifetime of the request.
+    Only read-only requests are memoized, as a write may change the accessible objects.
+    The in-process registry of permissions and root folder is warmed when the worker starts.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        try:
+            warm_registry()
+        except Exception as e:
+            # e.g. the database is not migrated yet, the registry is filled on first use
+            logger.warning("Could not warm the RBAC registry", exc_info=e)
+
+    def __call__(self, request):
+        if request.method not in self.SAFE_METHODS:
+            return self.get_response(request)
+        token = rbac_context.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            rbac_context.reset(token)
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_folder_closure(apps, schema_editor):
+    Folder = apps.get_model("iam", "Folder")
+    FolderClosure = apps.get_model("iam", "FolderClosure")
+    parent_of = dict(Folder.objects.values_list("id", "parent_folder_id"))
+    links = []
+    for folder_id in parent_of:
+        ancestor_id, depth = folder_id, 0
+        while ancestor_id is not None and depth <= len(parent_of):
+            links.append(
+                FolderClosure(
+                    ancestor_id=ancestor_id, descendant_id=folder_id, depth=depth
+                )
+            )
+            ancestor_id, depth = parent_of.get(ancestor_id), depth + 1
+    FolderClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("iam", "0008_user_is_third_party"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FolderClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="iam.folder",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="iam.folder",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "depth"],
+                        name="iam_folderc_descend_b798d7_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"),
+                        name="unique_folder_closure",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_folder_closure, migrations.RunPython.noop),
+    ]
@@ -2,10 +2,23 @@
 Inspired from Azure IAM model"""
 
 from collections import defaultdict
+from contextvars import ContextVar
 from typing import Any, List, Self, Tuple
 import uuid
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    ExpressionWrapper,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Subquery,
+)
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import FieldDoesNotExist
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AnonymousUser, Permission
@@ -40,14 +53,94 @@ import structlog
 
 logger = structlog.get_logger(__name__)
 
+RBAC_CACHE_VERSION_KEY = "rbac_version"
 
-def _get_root_folder():
-    """helper function outside of class to facilitate serialization
-    to be used only in Folder class"""
+
+def get_rbac_cache():
+    """Return the cache shared by all workers for compiled permissions, None if there is none
+    A per-process cache is refused: an RBAC change would not invalidate the other workers
+    """
     try:
-        return Folder.objects.get(content_type=Folder.ContentType.ROOT)
-    except:
+        rbac_cache = caches["rbac"]
+    except InvalidCacheBackendError:
+        return None
+    if isinstance(rbac_cache, (LocMemCache, DummyCache)):
         return None
+    return rbac_cache
+
+
+# in-process registry of permissions and root folder id, see warm_registry and clear_registry
+_registry = {}
+
+
+def clear_registry() -> None:
+    """Forget the permissions and root folder id kept in the in-process registry"""
+    _registry.clear()
+    if (context := rbac_context.get()) is not None:
+        context.pop(("root_folder",), None)
+
+
+def warm_registry() -> None:
+    """Fill the in-process registry, once the database is migrated and when a worker starts"""
+    clear_registry()
+    get_permission("view_folder")
+    _get_root_folder_id()
+
+
+def get_permission(codename: str) -> Permission:
+    """Return a permission by codename, from the in-process registry"""
+    permissions = _registry.get("permissions")
+    if permissions is None or codename not in permissions:
+        permissions = _registry["permissions"] = {
+            p.codename: p for p in Permission.objects.select_related("content_type")
+        }
+    if codename not in permissions:
+        raise Permission.DoesNotExist(f"Permission {codename} does not exist")
+    return permissions[codename]
+
+
+# request-scoped memo of RBAC computations, installed by iam.middleware.RBACContextMiddleware
+rbac_context: ContextVar[dict | None] = ContextVar("rbac_context", default=None)
+
+
+def _memoize_in_request(key: tuple, compute):
+    """Return compute(), memoized in the RBAC context of the current request if any"""
+    context = rbac_context.get()
+    if context is None:
+        return compute()
+    if key not in context:
+        context[key] = compute()
+    return context[key]
+
+
+def _get_root_folder_id() -> uuid.UUID | None:
+    """Return the id of the root folder, from the in-process registry"""
+    if "root_folder_id" not in _registry:
+        root_folder_id = (
+            Folder.objects.filter(content_type=Folder.ContentType.ROOT)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if root_folder_id is None:
+            return None
+        _registry["root_folder_id"] = root_folder_id
+    return _registry["root_folder_id"]
+
+
+def _get_root_folder():
+    """helper function outside of class to facilitate serialization
+    to be used only in Folder class
+    Only the id is kept in the registry, the folder is loaded once per request"""
+
+    def load_root_folder():
+        root_folder = Folder.objects.filter(id=_get_root_folder_id()).first()
+        if root_folder is None:
+            # the root folder was replaced, e.g. by a backup restored in another worker
+            clear_registry()
+            root_folder = Folder.objects.filter(id=_get_root_folder_id()).first()
+        return root_folder
+
+    return _memoize_in_request(("root_folder",), load_root_folder)
 
 
 class Folder(NameDescriptionMixin):
@@ -64,10 +157,7 @@ class Folder(NameDescriptionMixin):
     @staticmethod
     def get_root_folder_id() -> uuid.UUID:
         """class function for general use"""
-        try:
-            return _get_root_folder().id
-        except:
-            return _get_root_folder()
+        return _get_root_folder_id()
 
     class ContentType(models.TextChoices):
         """content type for a folder"""
@@ -90,6 +180,21 @@ class Folder(NameDescriptionMixin):
 
     fields_to_check = ["name"]
 
+    # Paths to try in order to find the folder of an object.
+    # Each path is a list representing the traversal path.
+    # NOTE: There are probably better ways to represent these, but it works.
+    _FOLDER_PATHS = [
+        ["folder"],
+        ["parent_folder"],
+        ["project", "folder"],
+        ["entity", "folder"],
+        ["provider_entity", "folder"],
+        ["solution", "provider_entity", "folder"],
+        ["risk_assessment", "project", "folder"],
+        ["risk_scenario", "risk_assessment", "project", "folder"],
+        ["compliance_assessment", "project", "folder"],
+    ]
+
     class Meta:
         """for Model"""
 
@@ -99,23 +204,40 @@ class Folder(NameDescriptionMixin):
     def __str__(self) -> str:
         return self.name.__str__()
 
+    def save(self, *args, **kwargs) -> None:
+        is_new = self._state.adding
+        previous_parent_folder_id = (
+            None
+            if is_new
+            else Folder.objects.filter(id=self.id)
+            .values_list("parent_folder_id", flat=True)
+            .first()
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new or previous_parent_folder_id != self.parent_folder_id:
+                FolderClosure.move(self)
+
     def sub_folders(self) -> List[Self]:
         """Return the list of subfolders"""
-
-        def sub_folders_in(f, sub_folder_list):
-            for sub_folder in f.folder_set.all():
-                sub_folder_list.append(sub_folder)
-                sub_folders_in(sub_folder, sub_folder_list)
-            return sub_folder_list
-
-        return sub_folders_in(self, [])
+        return list(
+            Folder.objects.filter(
+                ancestor_links__ancestor=self, ancestor_links__depth__gt=0
+            ).order_by("ancestor_links__depth")
+        )
 
     def get_parent_folders(self) -> List[Self]:
-        """Return the list of parent folders"""
-        return (
-            [self.parent_folder] + Folder.get_parent_folders(self.parent_folder)
-            if self.parent_folder
-            else []
+        """Return the list of parent folders, closest first"""
+        if self._state.adding:
+            return (
+                [self.parent_folder] + self.parent_folder.get_parent_folders()
+                if self.parent_folder
+                else []
+            )
+        return list(
+            Folder.objects.filter(
+                descendant_links__descendant=self, descendant_links__depth__gt=0
+            ).order_by("descendant_links__depth")
         )
 
     @staticmethod
@@ -144,6 +266,30 @@ class Folder(NameDescriptionMixin):
                 return None
         return current
 
+    @staticmethod
+    def get_folder_lookup(model: Any) -> str | None:
+        """
+        Return the ORM lookup leading from a model to the id of its folder, following
+        the same paths as get_folder. For a folder, it is its own id.
+        Returns None if the model is not attached to any folder.
+        """
+        if model is Folder:
+            return "id"
+        for path in Folder._FOLDER_PATHS:
+            current = model
+            for field_name in path:
+                try:
+                    field = current._meta.get_field(field_name)
+                except FieldDoesNotExist:
+                    break
+                if not (field.many_to_one or field.one_to_one):
+                    break
+                current = field.related_model
+            else:
+                if current is Folder:
+                    return "__".join(path)
+        return None
+
     @staticmethod
     def get_folder(obj: Any):
         """
@@ -152,22 +298,8 @@ class Folder(NameDescriptionMixin):
         """
         if isinstance(obj, Folder):
             return obj
-        # Define paths to try in order. Each path is a list representing the traversal path.
-        # NOTE: There are probably better ways to represent these, but it works.
-        paths = [
-            ["folder"],
-            ["parent_folder"],
-            ["project", "folder"],
-            ["entity", "folder"],
-            ["provider_entity", "folder"],
-            ["solution", "provider_entity", "folder"],
-            ["risk_assessment", "project", "folder"],
-            ["risk_scenario", "risk_assessment", "project", "folder"],
-            ["compliance_assessment", "project", "folder"],
-        ]
-
         # Attempt to traverse each path until a valid folder is found or all paths are exhausted.
-        for path in paths:
+        for path in Folder._FOLDER_PATHS:
             folder = Folder._navigate_structure(obj, path)
             if folder is not None:
                 return folder
@@ -176,6 +308,82 @@ class Folder(NameDescriptionMixin):
         return None
 
 
+class FolderClosure(models.Model):
+    """
+    Transitive closure of the folder tree: one row per (ancestor, descendant) pair,
+    including each folder with itself at depth 0.
+    Maintained by Folder.save, rows are deleted in cascade with their folders.
+    """
+
+    ancestor = models.ForeignKey(
+        Folder, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    descendant = models.ForeignKey(
+        Folder, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="unique_folder_closure"
+            )
+        ]
+        indexes = [models.Index(fields=["descendant", "depth"])]
+
+    @staticmethod
+    def move(folder: Folder) -> None:
+        """Attach a folder and its subtree under its current parent folder"""
+        with transaction.atomic():
+            FolderClosure.objects.get_or_create(
+                ancestor=folder, descendant=folder, defaults={"depth": 0}
+            )
+            subtree = list(
+                FolderClosure.objects.filter(ancestor=folder).values_list(
+                    "descendant_id", "depth"
+                )
+            )
+            subtree_ids = [descendant_id for descendant_id, _ in subtree]
+            # detach the subtree from its previous ancestors
+            FolderClosure.objects.filter(descendant_id__in=subtree_ids).exclude(
+                ancestor_id__in=subtree_ids
+            ).delete()
+            if folder.parent_folder_id is None:
+                return
+            ancestors = FolderClosure.objects.filter(
+                descendant_id=folder.parent_folder_id
+            ).values_list("ancestor_id", "depth")
+            FolderClosure.objects.bulk_create(
+                [
+                    FolderClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        depth=ancestor_depth + descendant_depth + 1,
+                    )
+                    for ancestor_id, ancestor_depth in ancestors
+                    for descendant_id, descendant_depth in subtree
+                ]
+            )
+
+    @staticmethod
+    def rebuild() -> None:
+        """Recompute the whole closure from the parent_folder links"""
+        parent_of = dict(Folder.objects.values_list("id", "parent_folder_id"))
+        links = []
+        for folder_id in parent_of:
+            ancestor_id, depth = folder_id, 0
+            while ancestor_id is not None and depth <= len(parent_of):
+                links.append(
+                    FolderClosure(
+                        ancestor_id=ancestor_id, descendant_id=folder_id, depth=depth
+                    )
+                )
+                ancestor_id, depth = parent_of.get(ancestor_id), depth + 1
+        with transaction.atomic():
+            FolderClosure.objects.all().delete()
+            FolderClosure.objects.bulk_create(links, batch_size=1000)
+
+
 class FolderMixin(models.Model):
     """
     Add foreign key to Folder, defaults to root folder
@@ -192,6 +400,37 @@ class FolderMixin(models.Model):
         abstract = True
 
 
+class FolderPathMixin(models.Model):
+    """
+    Add a denormalized foreign key to the folder reached through the relations of an object
+    It is set when the object is saved, and kept in sync by the objects along the path
+    Subclasses give the lookup of that folder in folder_path
+    """
+
+    folder_path: str
+
+    folder = models.ForeignKey(
+        Folder,
+        on_delete=models.CASCADE,
+        related_name="%(class)s_folder",
+        null=True,
+        editable=False,
+        verbose_name=_("Folder"),
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def rebuild_folders(cls) -> None:
+        """Recompute the folder of all objects from their folder path, e.g. after a raw load"""
+        cls.objects.update(
+            folder_id=Subquery(
+                cls.objects.filter(id=OuterRef("id")).values(cls.folder_path)[:1]
+            )
+        )
+
+
 class PublishInRootFolderMixin(models.Model):
     """
     Set is_published to True if object is attached to the root folder
@@ -202,7 +441,7 @@ class PublishInRootFolderMixin(models.Model):
 
     def save(self, *args, **kwargs):
         if (
-            getattr(self, "folder") == Folder.get_root_folder()
+            getattr(self, "folder_id") == Folder.get_root_folder_id()
             and hasattr(self, "is_published")
             and not self.is_published
         ):
@@ -486,7 +725,7 @@ class User(AbstractBaseUser, AbstractBaseModel, FolderMixin):
     def has_backup_permission(self) -> bool:
         return RoleAssignment.is_access_allowed(
             user=self,
-            perm=Permission.objects.get(codename="backup"),
+            perm=get_permission("backup"),
             folder=Folder.get_root_folder(),
         )
 
@@ -580,16 +819,16 @@ class RoleAssignment(NameDescriptionMixin, FolderMixin):
         """
         Determines if a user has specified permission on a specified folder
         """
-        for ra in RoleAssignment.get_role_assignments(user):
-            f = folder
-            while f is not None:
-                if (
-                    f in ra.perimeter_folders.all()
-                    and perm in ra.role.permissions.all()
-                ):
-                    return True
-                f = f.parent_folder
-        return False
+        if folder is None:
+            return False
+        folder_ids = set(
+            FolderClosure.objects.filter(descendant=folder).values_list(
+                "ancestor_id", flat=True
+            )
+        )
+        folder_ids.add(folder.id)
+        snapshot = RoleAssignment.get_permission_snapshot(user)
+        return not snapshot["folders"].get(perm.codename, set()).isdisjoint(folder_ids)
 
     @staticmethod
     def is_object_readable(
@@ -598,14 +837,36 @@ class RoleAssignment(NameDescriptionMixin, FolderMixin):
         """
         Determines if a user has read on an object by id
         """
-        obj = object_type.objects.filter(id=id).first()
-        if not obj:
-            return False
         class_name = object_type.__name__.lower()
-        permission = Permission.objects.get(codename="view_" + class_name)
-        return RoleAssignment.is_access_allowed(
-            user, permission, Folder.get_folder(obj)
+        return "view_" + class_name in RoleAssignment.get_object_permissions(
+            user, object_type, id
+        )
+
+    @staticmethod
+    def get_object_permissions(
+        user: AbstractBaseUser | AnonymousUser, object_type: Any, id: uuid
+    ) -> set[str]:
+        """
+        Gets the codenames of the permissions of a user on an object by id
+        The folder of the object and its parent folders are resolved in a single query,
+        then checked against the compiled permissions of the user, as in is_access_allowed
+        """
+        folder_lookup = Folder.get_folder_lookup(object_type)
+        if folder_lookup is None:
+            return set()
+        folder_ids = set(
+            FolderClosure.objects.filter(
+                descendant__in=object_type.objects.filter(id=id).values(folder_lookup)
+            ).values_list("ancestor_id", flat=True)
         )
+        if not folder_ids:
+            return set()
+        snapshot = RoleAssignment.get_permission_snapshot(user)
+        return {
+            codename
+            for codename, granted_folder_ids in snapshot["folders"].items()
+            if not granted_folder_ids.isdisjoint(folder_ids)
+        }
 
     @staticmethod
     def get_accessible_folders(
@@ -619,124 +880,273 @@ class RoleAssignment(NameDescriptionMixin, FolderMixin):
         Returns the list of the ids of the matching folders
         If permission is specified, returns accessible folders which can be altered with this specific permission
         """
-        folders_set = set()
-        ref_permission = Permission.objects.get(codename=codename)
-        # first get all accessible folders, independently of contentType
-        for ra in [
-            x
-            for x in RoleAssignment.get_role_assignments(user)
-            if (
-                (
-                    Permission.objects.get(codename="view_folder")
-                    in x.role.permissions.all()
+        # perimeter folders of role assignments granting both view_folder and the permission
+        assigned_folder_ids = RoleAssignment.get_permission_snapshot(user)[
+            "assigned"
+        ].get(codename, set())
+        folders = (
+            Folder.objects.filter(ancestor_links__ancestor_id__in=assigned_folder_ids)
+            .filter(ancestor_links__ancestor=folder)
+            .distinct()
+        )
+        if content_type:
+            folders = folders.filter(content_type=content_type)
+        return list(folders.values_list("id", flat=True))
+
+    @staticmethod
+    def compile_permissions(
+        principal: AbstractBaseUser | AnonymousUser | UserGroup,
+        folder: Folder | None = None,
+    ) -> dict[str, dict]:
+        """Compiles the role assignments of a principal into sets of folder ids per permission codename
+        Only perimeter folders located in the given folder or its subfolders are considered (all folders if no folder is given)
+        Returns a dict with the following keys:
+        - permissions: permissions of the principal, as returned by get_permissions
+        - folders: codename -> perimeter folders of the role assignments granting it
+        - assigned: same as folders, restricted to role assignments granting view_folder
+        - effective: same as assigned, extended to subfolders for recursive role assignments
+        """
+        perimeter = (
+            set(
+                FolderClosure.objects.filter(ancestor=folder).values_list(
+                    "descendant_id", flat=True
                 )
-                and (ref_permission in x.role.permissions.all())
             )
-        ]:
-            for f in ra.perimeter_folders.all():
-                folders_set.add(f)
-                folders_set.update(f.sub_folders())
-        # calculate perimeter
-        perimeter = set()
-        perimeter.add(folder)
-        perimeter.update(folder.sub_folders())
-        # return filtered result
-        return [
-            x.id
-            for x in folders_set
-            if (x.content_type == content_type if content_type else True)
-            and x in perimeter
-        ]
+            if folder
+            else None
+        )
+        permissions = {}
+        folders = defaultdict(set)
+        assigned = defaultdict(set)
+        recursive = defaultdict(set)
+        for ra in RoleAssignment.get_role_assignments_queryset(
+            principal
+        ).prefetch_related(
+            "perimeter_folders",
+            Prefetch(
+                "role__permissions",
+                queryset=Permission.objects.select_related("content_type"),
+            ),
+        ):
+            ra_permissions = ra.role.permissions.all()
+            for p in ra_permissions:
+                permissions[p.codename] = {"str": str(p)}
+            ra_codenames = {p.codename for p in ra_permissions}
+            has_view_folder = "view_folder" in ra_codenames
+            for my_folder in ra.perimeter_folders.all():
+                if perimeter is not None and my_folder.id not in perimeter:
+                    continue
+                for codename in ra_codenames:
+                    folders[codename].add(my_folder.id)
+                    if has_view_folder:
+                        assigned[codename].add(my_folder.id)
+                        if ra.is_recursive:
+                            recursive[my_folder.id].add(codename)
+        effective = defaultdict(set, {k: set(v) for k, v in assigned.items()})
+        for ancestor_id, descendant_id in FolderClosure.objects.filter(
+            ancestor_id__in=recursive, depth__gt=0
+        ).values_list("ancestor_id", "descendant_id"):
+            for codename in recursive[ancestor_id]:
+                effective[codename].add(descendant_id)
+        return {
+            "permissions": permissions,
+            "folders": dict(folders),
+            "assigned": dict(assigned),
+            "effective": dict(effective),
+        }
 
     @staticmethod
-    def get_accessible_object_ids(
+    def invalidate_cache() -> None:
+        """Invalidates the compiled permissions of all principals"""
+        if (rbac_cache := get_rbac_cache()) is not None:
+            rbac_cache.set(RBAC_CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+        if (context := rbac_context.get()) is not None:
+            context.clear()
+
+    @staticmethod
+    def get_permission_snapshot(
+        principal: AbstractBaseUser | AnonymousUser | UserGroup,
+    ) -> dict[str, dict]:
+        """Gets the compiled permissions of a principal on all folders, see compile_permissions
+        The result is kept in the shared RBAC cache, if configured, until a change on the RBAC
+        model invalidates it or RBAC_CACHE_TTL expires, otherwise for the current request only
+        """
+        if isinstance(principal, AnonymousUser):
+            return RoleAssignment.compile_permissions(principal)
+
+        def get_snapshot():
+            rbac_cache = get_rbac_cache()
+            if rbac_cache is None:
+                return RoleAssignment.compile_permissions(principal)
+            version = rbac_cache.get(RBAC_CACHE_VERSION_KEY)
+            if version is None:
+                version = uuid.uuid4().hex
+                rbac_cache.add(RBAC_CACHE_VERSION_KEY, version, None)
+            key = f"rbac:{version}:{principal._meta.model_name}:{principal.pk}"
+            snapshot = rbac_cache.get(key)
+            if snapshot is None:
+                snapshot = RoleAssignment.compile_permissions(principal)
+                rbac_cache.set(key, snapshot, settings.RBAC_CACHE_TTL)
+            return snapshot
+
+        return _memoize_in_request(
+            ("snapshot", principal._meta.model_name, principal.pk), get_snapshot
+        )
+
+    @staticmethod
+    def get_folder_permissions(
+        principal: AbstractBaseUser | AnonymousUser | UserGroup,
+        folder: Folder | None = None,
+    ) -> Tuple[dict[str, set[uuid.UUID]], dict[str, set[uuid.UUID]]]:
+        """Gets the folder ids per permission codename for role assignments granting view_folder
+        Returns a pair: (assigned folders, assigned folders and their subfolders if recursive)
+        """
+        if folder is None or folder.parent_folder_id is None:
+            snapshot = RoleAssignment.get_permission_snapshot(principal)
+        else:
+            snapshot = _memoize_in_request(
+                ("perimeter", principal._meta.model_name, principal.pk, folder.id),
+                lambda: RoleAssignment.compile_permissions(principal, folder),
+            )
+        return snapshot["assigned"], snapshot["effective"]
+
+    @staticmethod
+    def get_accessible_objects(
         folder: Folder, user: AbstractBaseUser | AnonymousUser, object_type: Any
-    ) -> Tuple["list[Any]", "list[Any]", "list[Any]"]:
+    ) -> Tuple[QuerySet, QuerySet, QuerySet]:
         """Gets all objects of a specified type that a user can reach in a given folder
         Only accessible folders are considered
-        Returns a triplet: (view_objects_list, change_object_list, delete_object_list)
+        Returns a triplet of lazy querysets: (view_objects, change_objects, delete_objects)
         Assumes that object type follows Django conventions for permissions
         Also retrieve published objects in view
+        The querysets are memoized for the lifetime of the current request
         """
+        return _memoize_in_request(
+            ("objects", folder.id, user.pk, object_type),
+            lambda: RoleAssignment._get_accessible_objects(folder, user, object_type),
+        )
+
+    @staticmethod
+    def _get_accessible_objects(
+        folder: Folder, user: AbstractBaseUser | AnonymousUser, object_type: Any
+    ) -> Tuple[QuerySet, QuerySet, QuerySet]:
+        filters = RoleAssignment._get_accessible_filters(folder, user, object_type)
+        if filters is None:
+            empty = object_type.objects.none()
+            return empty, empty, empty
+        return tuple(object_type.objects.filter(f) for f in filters)
+
+    @staticmethod
+    def _get_accessible_filters(
+        folder: Folder, user: AbstractBaseUser | AnonymousUser, object_type: Any
+    ) -> Tuple[Q, Q, Q] | None:
+        """Builds the (view, change, delete) filters of get_accessible_objects
+        Returns None if the object type is not attached to a folder
+        """
+        folder_lookup = Folder.get_folder_lookup(object_type)
+        if folder_lookup is None:
+            return None
         class_name = object_type.__name__.lower()
-        permissions = [
-            Permission.objects.get(codename="view_" + class_name),
-            Permission.objects.get(codename="change_" + class_name),
-            Permission.objects.get(codename="delete_" + class_name),
-        ]
+        view_codename = "view_" + class_name
+        change_codename = "change_" + class_name
+        delete_codename = "delete_" + class_name
 
-        folders_with_local_view = set()
-        permissions_per_object_id = defaultdict(set)
-        ref_permission = Permission.objects.get(codename="view_folder")
-        all_objects = (
-            object_type.objects.select_related("folder")
-            if hasattr(object_type, "folder")
-            else object_type.objects.all()
+        assigned_permissions, effective_permissions = (
+            RoleAssignment.get_folder_permissions(user, folder)
         )
-        folder_for_object = {x: Folder.get_folder(x) for x in all_objects}
-        perimeter = set()
-        perimeter.add(folder)
-        perimeter.update(folder.sub_folders())
-        for ra in [
-            x
-            for x in RoleAssignment.get_role_assignments(user)
-            if ref_permission in x.role.permissions.all()
-        ]:
-            ra_permissions = ra.role.permissions.all()
-            for my_folder in perimeter & set(ra.perimeter_folders.all()):
-                target_folders = (
-                    [my_folder] + my_folder.sub_folders()
-                    if ra.is_recursive
-                    else [my_folder]
-                )
-                for p in [p for p in permissions if p in ra_permissions]:
-                    if p == permissions[0]:
-                        folders_with_local_view.add(my_folder)
-                    for object in [
-                        x for x in all_objects if folder_for_object[x] in target_folders
-                    ]:
-                        # builtins objects cannot be edited or deleted
-                        if not (
-                            hasattr(object, "builtin")
-                            and object.builtin
-                            and p != permissions[0]
-                        ):
-                            permissions_per_object_id[object.id].add(p)
 
+        def folders_with(codename: str, folders_per_permission: dict) -> set:
+            return folders_per_permission.get(codename, set())
+
+        view_filter = Q(
+            **{
+                folder_lookup + "__in": folders_with(
+                    view_codename, effective_permissions
+                )
+            }
+        )
         if hasattr(object_type, "is_published"):
-            for my_folder in folders_with_local_view:
-                if my_folder.content_type != Folder.ContentType.ENCLAVE:
-                    target_folders = []
-                    my_folder2 = my_folder
-                    while my_folder2:
-                        if my_folder2 != my_folder:
-                            target_folders.append(my_folder2)
-                        my_folder2 = my_folder2.parent_folder
-                    for object in [
-                        x
-                        for x in all_objects
-                        if folder_for_object[x] in target_folders and x.is_published
-                    ]:
-                        permissions_per_object_id[object.id].add(permissions[0])
+            # published objects of parent folders are visible from non-enclave folders with local view
+            parent_folder_ids = set(
+                FolderClosure.objects.filter(
+                    descendant_id__in=folders_with(view_codename, assigned_permissions),
+                    depth__gt=0,
+                )
+                .exclude(descendant__content_type=Folder.ContentType.ENCLAVE)
+                .values_list("ancestor_id", flat=True)
+            )
+            if parent_folder_ids:
+                view_filter |= Q(
+                    is_published=True, **{folder_lookup + "__in": parent_folder_ids}
+                )
+        change_filter = Q(
+            **{
+                folder_lookup + "__in": folders_with(
+                    change_codename, effective_permissions
+                )
+            }
+        )
+        delete_filter = Q(
+            **{
+                folder_lookup + "__in": folders_with(
+                    delete_codename, effective_permissions
+                )
+            }
+        )
+        # builtins objects cannot be edited or deleted
+        if hasattr(object_type, "builtin"):
+            change_filter &= Q(builtin=False)
+            delete_filter &= Q(builtin=False)
 
-        return (
-            [
-                x
-                for x in permissions_per_object_id
-                if permissions[0] in permissions_per_object_id[x]
-            ],
-            [
-                x
-                for x in permissions_per_object_id
-                if permissions[1] in permissions_per_object_id[x]
-            ],
-            [
-                x
-                for x in permissions_per_object_id
-                if permissions[2] in permissions_per_object_id[x]
-            ],
+        return view_filter, change_filter, delete_filter
+
+    @staticmethod
+    def get_accessible_object_ids(
+        folder: Folder, user: AbstractBaseUser | AnonymousUser, object_type: Any
+    ) -> Tuple["list[Any]", "list[Any]", "list[Any]"]:
+        """Gets all objects of a specified type that a user can reach in a given folder
+        Returns a triplet: (view_objects_list, change_object_list, delete_object_list)
+        Compatibility wrapper around get_accessible_objects
+        """
+        return _memoize_in_request(
+            ("object_ids", folder.id, user.pk, object_type),
+            lambda: tuple(
+                list(queryset.values_list("id", flat=True))
+                for queryset in RoleAssignment.get_accessible_objects(
+                    folder, user, object_type
+                )
+            ),
         )
 
+    @staticmethod
+    def get_permission_flags(
+        folder: Folder,
+        user: AbstractBaseUser | AnonymousUser,
+        object_type: Any,
+        ids: list,
+    ) -> dict[Any, dict[str, bool]]:
+        """Gets the view/change/delete flags of a user on a batch of objects
+        Same rules as get_accessible_objects, evaluated in a single query restricted to the given ids
+        Returns a dict: id -> {"view": bool, "change": bool, "delete": bool}, unknown ids are omitted
+        """
+        filters = RoleAssignment._get_accessible_filters(folder, user, object_type)
+        if filters is None:
+            return {}
+        actions = ("view", "change", "delete")
+        rows = (
+            object_type.objects.filter(id__in=ids)
+            .annotate(
+                **{
+                    f"can_{action}": ExpressionWrapper(
+                        accessible_filter, output_field=models.BooleanField()
+                    )
+                    for action, accessible_filter in zip(actions, filters)
+                }
+            )
+            .values_list("id", *(f"can_{action}" for action in actions))
+        )
+        return {id: dict(zip(actions, map(bool, flags))) for (id, *flags) in rows}
+
     def is_user_assigned(self, user) -> bool:
         """Determines if a user is assigned to the role assignment"""
         return user == self.user or (
@@ -753,16 +1163,23 @@ class RoleAssignment(NameDescriptionMixin, FolderMixin):
         assignments += list(principal.roleassignment_set.all())
         return assignments
 
+    @staticmethod
+    def get_role_assignments_queryset(
+        principal: AbstractBaseUser | AnonymousUser | UserGroup,
+    ) -> QuerySet:
+        """get a queryset of all role assignments attached to a user directly or indirectly"""
+        if isinstance(principal, AnonymousUser):
+            return RoleAssignment.objects.none()
+        if isinstance(principal, UserGroup):
+            return RoleAssignment.objects.filter(user_group=principal)
+        return RoleAssignment.objects.filter(
+            Q(user=principal) | Q(user_group__in=principal.user_groups.all())
+        )
+
     @staticmethod
     def get_permissions(principal: AbstractBaseUser | AnonymousUser | UserGroup):
         """get all permissions attached to a user directly or indirectly"""
-        permissions = {}
-        for ra in RoleAssignment.get_role_assignments(principal):
-            for p in ra.role.permissions.all():
-                permission_dict = {p.codename: {"str": str(p)}}
-                permissions.update(permission_dict)
-
-        return permissions
+        return RoleAssignment.get_permission_snapshot(principal)["permissions"]
 
     @staticmethod
     def has_role(user: AbstractBaseUser | AnonymousUser, role: Role):
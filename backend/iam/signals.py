@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+)
+from django.dispatch import receiver
+
+from iam.models import (
+    Folder,
+    Role,
+    RoleAssignment,
+    User,
+    clear_registry,
+    warm_registry,
+)
+
+
+@receiver(post_migrate)
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+@receiver(post_save, sender=RoleAssignment)
+@receiver(post_delete, sender=RoleAssignment)
+@receiver(m2m_changed, sender=RoleAssignment.perimeter_folders.through)
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=User.user_groups.through)
+def invalidate_rbac_cache(sender, **kwargs):
+    """Invalidate compiled permissions when the RBAC model changes"""
+    if kwargs.get("action", "post_").startswith("pre_"):
+        return
+    RoleAssignment.invalidate_cache()
+    # invalidate again once committed, in case permissions were compiled in between
+    transaction.on_commit(RoleAssignment.invalidate_cache)
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+def reset_registry(sender, **kwargs):
+    """The root folder may have changed"""
+    clear_registry()
+
+
+@receiver(post_migrate)
+def rewarm_registry(sender, **kwargs):
+    """Permissions and the root folder may have been created by a migration"""
+    warm_registry()
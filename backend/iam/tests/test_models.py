@@ -38,3 +38,53 @@ class TestFolder:
         assert folder2.content_type == Folder.ContentType.DOMAIN
         assert folder1.parent_folder == root_folder
         assert folder2.parent_folder == parent_folder
+
+    def test_sub_folders_and_parent_folders(self):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="Domain", parent_folder=root_folder)
+        child = Folder.objects.create(name="Child", parent_folder=domain)
+        grandchild = Folder.objects.create(name="Grandchild", parent_folder=child)
+
+        assert domain.sub_folders() == [child, grandchild]
+        assert grandchild.get_parent_folders() == [child, domain, root_folder]
+        assert root_folder.get_parent_folders() == []
+
+    def test_folder_closure_follows_moves_and_deletions(self):
+        root_folder = Folder.get_root_folder()
+        domain1 = Folder.objects.create(name="Domain 1", parent_folder=root_folder)
+        domain2 = Folder.objects.create(name="Domain 2", parent_folder=root_folder)
+        child = Folder.objects.create(name="Child", parent_folder=domain1)
+        grandchild = Folder.objects.create(name="Grandchild", parent_folder=child)
+
+        child.parent_folder = domain2
+        child.save()
+
+        assert domain1.sub_folders() == []
+        assert domain2.sub_folders() == [child, grandchild]
+        assert grandchild.get_parent_folders() == [child, domain2, root_folder]
+
+        child.delete()
+
+        assert domain2.sub_folders() == []
+        assert not FolderClosure.objects.filter(descendant_id=grandchild.id).exists()
+
+    def test_folder_closure_rebuild(self):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="Domain", parent_folder=root_folder)
+        child = Folder.objects.create(name="Child", parent_folder=domain)
+        links = set(
+            FolderClosure.objects.values_list("ancestor_id", "descendant_id", "depth")
+        )
+
+        FolderClosure.objects.all().delete()
+        FolderClosure.rebuild()
+
+        assert (
+            set(
+                FolderClosure.objects.values_list(
+                    "ancestor_id", "descendant_id", "depth"
+                )
+            )
+            == links
+        )
+        assert (root_folder.id, child.id, 2) in links
@@ -0,0 +1,428 @@
+import uuid
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Threat
+from core.permissions import get_object_permissions
+from iam.middleware import RBACContextMiddleware
+from iam.models import (
+    Folder,
+    Role,
+    RoleAssignment,
+    User,
+    UserGroup,
+    clear_registry,
+    get_permission,
+    get_rbac_cache,
+    rbac_context,
+    warm_registry,
+)
+
+
+@pytest.fixture
+def rbac_cache(monkeypatch):
+    """Stands for a cache shared by all workers, e.g. redis"""
+    rbac_cache = LocMemCache("rbac", {})
+    monkeypatch.setattr("iam.models.get_rbac_cache", lambda: rbac_cache)
+    return rbac_cache
+
+
+@pytest.fixture
+def request_context():
+    """Installs the RBAC context of a read-only request"""
+    token = rbac_context.set({})
+    yield
+    rbac_context.reset(token)
+
+
+def create_role_assignment(user, folder, codenames, is_recursive=True):
+    role = Role.objects.create(name=f"role {folder.name} {len(codenames)}")
+    role.permissions.set(Permission.objects.filter(codename__in=codenames))
+    role_assignment = RoleAssignment.objects.create(
+        user=user, role=role, folder=folder, is_recursive=is_recursive
+    )
+    role_assignment.perimeter_folders.add(folder)
+    return role_assignment
+
+
+@pytest.mark.django_db
+class TestAccessibleObjects:
+    pytestmark = pytest.mark.django_db
+
+    @pytest.fixture
+    def tree(self):
+        root = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root)
+        sub_domain = Folder.objects.create(name="sub domain", parent_folder=domain)
+        enclave = Folder.objects.create(
+            name="enclave",
+            parent_folder=domain,
+            content_type=Folder.ContentType.ENCLAVE,
+        )
+        other = Folder.objects.create(name="other", parent_folder=root)
+        return root, domain, sub_domain, enclave, other
+
+    def test_recursive_role_assignment_reaches_sub_folders(self, tree):
+        root, domain, sub_domain, enclave, other = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(
+            user, domain, ["view_folder", "view_threat", "change_threat"]
+        )
+        threats = {
+            folder: Threat.objects.create(name=f"threat {folder.name}", folder=folder)
+            for folder in (domain, sub_domain, enclave, other)
+        }
+
+        view, change, delete = RoleAssignment.get_accessible_objects(root, user, Threat)
+
+        expected = {threats[domain].id, threats[sub_domain].id, threats[enclave].id}
+        assert set(view.values_list("id", flat=True)) == expected
+        assert set(change.values_list("id", flat=True)) == expected
+        assert not delete.exists()
+
+    def test_non_recursive_role_assignment(self, tree):
+        root, domain, sub_domain, _, _ = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(
+            user, domain, ["view_folder", "view_threat"], is_recursive=False
+        )
+        threat = Threat.objects.create(name="threat", folder=domain)
+        Threat.objects.create(name="sub threat", folder=sub_domain)
+
+        view, _, _ = RoleAssignment.get_accessible_objects(root, user, Threat)
+
+        assert list(view) == [threat]
+
+    def test_view_folder_is_required(self, tree):
+        root, domain, _, _, _ = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_threat"])
+        Threat.objects.create(name="threat", folder=domain)
+
+        view, _, _ = RoleAssignment.get_accessible_objects(root, user, Threat)
+
+        assert not view.exists()
+
+    def test_published_objects_of_parent_folders_are_viewable(self, tree):
+        root, domain, sub_domain, enclave, _ = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, sub_domain, ["view_folder", "view_threat"])
+        published = Threat.objects.create(
+            name="published", folder=domain, is_published=True
+        )
+        Threat.objects.create(name="unpublished", folder=domain)
+
+        view, change, _ = RoleAssignment.get_accessible_objects(root, user, Threat)
+
+        assert published in view
+        assert view.count() == 1
+        assert not change.exists()
+
+        enclave_user = User.objects.create_user(email="enclave@example.com")
+        create_role_assignment(enclave_user, enclave, ["view_folder", "view_threat"])
+
+        view, _, _ = RoleAssignment.get_accessible_objects(root, enclave_user, Threat)
+
+        assert not view.exists()
+
+    def test_builtin_objects_cannot_be_changed_or_deleted(self, tree):
+        root, domain, _, _, _ = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(
+            user, domain, ["view_folder", "view_role", "change_role", "delete_role"]
+        )
+        builtin_role = Role.objects.create(name="builtin", folder=domain, builtin=True)
+        role = Role.objects.create(name="custom", folder=domain)
+
+        view, change, delete = RoleAssignment.get_accessible_objects(root, user, Role)
+
+        assert {builtin_role, role} <= set(view)
+        assert builtin_role not in change and role in change
+        assert builtin_role not in delete and role in delete
+
+    def test_compatibility_wrapper_returns_id_lists(self, tree):
+        root, domain, sub_domain, _, _ = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_folder", "view_threat"])
+        threat = Threat.objects.create(name="threat", folder=sub_domain)
+
+        view_ids, change_ids, delete_ids = RoleAssignment.get_accessible_object_ids(
+            root, user, Threat
+        )
+
+        assert view_ids == [threat.id]
+        assert change_ids == delete_ids == []
+        (folder_ids, _, _) = RoleAssignment.get_accessible_object_ids(
+            root, user, Folder
+        )
+        assert set(folder_ids) == {domain.id} | {f.id for f in domain.sub_folders()}
+
+    @pytest.mark.usefixtures("request_context")
+    def test_accessible_folders(self, tree, django_assert_num_queries):
+        root, domain, sub_domain, enclave, other = tree
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(
+            user, domain, ["view_folder", "change_threat"], is_recursive=False
+        )
+        create_role_assignment(user, other, ["change_threat"])
+        RoleAssignment.get_permission_snapshot(user)
+
+        with django_assert_num_queries(1):
+            folder_ids = RoleAssignment.get_accessible_folders(
+                root, user, Folder.ContentType.DOMAIN, "change_threat"
+            )
+
+        assert set(folder_ids) == {domain.id, sub_domain.id}
+        assert set(
+            RoleAssignment.get_accessible_folders(root, user, None, "change_threat")
+        ) == {domain.id, sub_domain.id, enclave.id}
+        assert RoleAssignment.get_accessible_folders(
+            sub_domain, user, Folder.ContentType.DOMAIN
+        ) == [sub_domain.id]
+        assert (
+            RoleAssignment.get_accessible_folders(other, user, None, "change_threat")
+            == []
+        )
+
+
+@pytest.mark.django_db
+class TestPermissionSnapshot:
+    pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("rbac_cache")]
+
+    def test_snapshot_is_cached(self, django_assert_num_queries):
+        domain = Folder.objects.create(
+            name="domain", parent_folder=Folder.get_root_folder()
+        )
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_folder", "view_threat"])
+
+        snapshot = RoleAssignment.get_permission_snapshot(user)
+        assert snapshot["effective"]["view_threat"] == {domain.id}
+        assert set(user.permissions) == {"view_folder", "view_threat"}
+
+        with django_assert_num_queries(0):
+            assert RoleAssignment.get_permission_snapshot(user) == snapshot
+
+    def test_snapshot_is_invalidated_on_rbac_changes(self):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root_folder)
+        other = Folder.objects.create(name="other", parent_folder=root_folder)
+        user = User.objects.create_user(email="user@example.com")
+        role_assignment = create_role_assignment(user, domain, ["view_folder"])
+        assert "view_threat" not in RoleAssignment.get_permissions(user)
+
+        role_assignment.role.permissions.add(
+            Permission.objects.get(codename="view_threat")
+        )
+        assert RoleAssignment.get_permission_snapshot(user)["effective"][
+            "view_threat"
+        ] == {domain.id}
+
+        role_assignment.perimeter_folders.add(other)
+        assert RoleAssignment.get_permission_snapshot(user)["effective"][
+            "view_threat"
+        ] == {domain.id, other.id}
+
+        sub_folder = Folder.objects.create(name="sub folder", parent_folder=domain)
+        assert (
+            sub_folder.id
+            in RoleAssignment.get_permission_snapshot(user)["effective"]["view_threat"]
+        )
+
+        role_assignment.delete()
+        assert RoleAssignment.get_permissions(user) == {}
+
+    def test_snapshot_is_invalidated_on_group_membership(self):
+        user = User.objects.create_user(email="user@example.com")
+        assert RoleAssignment.get_permissions(user) == {}
+
+        user.user_groups.add(UserGroup.objects.get(name="BI-UG-ADM"))
+
+        assert "backup" in RoleAssignment.get_permissions(user)
+        assert user.has_backup_permission
+
+
+@pytest.mark.django_db
+def test_snapshot_is_not_cached_without_shared_cache(
+    settings, django_assert_num_queries
+):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "rbac": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    domain = Folder.objects.create(
+        name="domain", parent_folder=Folder.get_root_folder()
+    )
+    user = User.objects.create_user(email="user@example.com")
+    create_role_assignment(user, domain, ["view_folder", "view_threat"])
+    snapshot = RoleAssignment.get_permission_snapshot(user)
+
+    # a per-process cache would not see the invalidations of the other workers
+    assert get_rbac_cache() is None
+    with CaptureQueriesContext(connection) as context:
+        assert RoleAssignment.get_permission_snapshot(user) == snapshot
+    assert len(context.captured_queries) > 0
+
+    token = rbac_context.set({})
+    try:
+        RoleAssignment.get_permission_snapshot(user)
+        with django_assert_num_queries(0):
+            assert RoleAssignment.get_permission_snapshot(user) == snapshot
+    finally:
+        rbac_context.reset(token)
+
+
+@pytest.mark.django_db
+class TestObjectPermissions:
+    pytestmark = pytest.mark.django_db
+
+    def test_object_permissions_follow_parent_folders(self):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root_folder)
+        sub_domain = Folder.objects.create(name="sub domain", parent_folder=domain)
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_folder", "view_threat"])
+        threat = Threat.objects.create(name="threat", folder=sub_domain)
+        other_threat = Threat.objects.create(name="other", folder=root_folder)
+
+        assert RoleAssignment.get_object_permissions(user, Threat, threat.id) == {
+            "view_folder",
+            "view_threat",
+        }
+        assert RoleAssignment.is_object_readable(user, Threat, threat.id)
+        assert RoleAssignment.is_object_readable(user, Folder, sub_domain.id)
+        assert not RoleAssignment.is_object_readable(user, Threat, other_threat.id)
+        assert not RoleAssignment.is_object_readable(user, Threat, uuid.uuid4())
+
+    def test_object_permissions_are_shared_within_a_request(
+        self, rf, django_assert_num_queries
+    ):
+        domain = Folder.objects.create(
+            name="domain", parent_folder=Folder.get_root_folder()
+        )
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_folder", "change_threat"])
+        threat = Threat.objects.create(name="threat", folder=domain)
+        request = rf.get("/")
+        request.user = user
+
+        assert "change_threat" in get_object_permissions(request, Threat, threat.id)
+        with django_assert_num_queries(0):
+            assert "change_threat" in get_object_permissions(request, Threat, threat.id)
+
+    @pytest.mark.usefixtures("request_context")
+    def test_permission_flags_match_accessible_objects(self, django_assert_num_queries):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root_folder)
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(
+            user, domain, ["view_folder", "view_role", "change_role"]
+        )
+        builtin_role = Role.objects.create(name="builtin", folder=domain, builtin=True)
+        role = Role.objects.create(name="custom", folder=domain)
+        hidden_role = Role.objects.create(name="hidden", folder=root_folder)
+        RoleAssignment.get_permission_snapshot(user)
+
+        # published parent folders, then the flags themselves
+        with django_assert_num_queries(2):
+            flags = RoleAssignment.get_permission_flags(
+                root_folder,
+                user,
+                Role,
+                [builtin_role.id, role.id, hidden_role.id, uuid.uuid4()],
+            )
+
+        assert flags == {
+            builtin_role.id: {"view": True, "change": False, "delete": False},
+            role.id: {"view": True, "change": True, "delete": False},
+            hidden_role.id: {"view": False, "change": False, "delete": False},
+        }
+
+
+@pytest.mark.django_db
+class TestRegistry:
+    pytestmark = pytest.mark.django_db
+
+    def test_permissions_are_kept_in_registry(self, django_assert_num_queries):
+        clear_registry()
+        view_folder = get_permission("view_folder")
+        assert view_folder == Permission.objects.get(codename="view_folder")
+        with django_assert_num_queries(0):
+            assert get_permission("view_folder") is view_folder
+            assert get_permission("change_threat").codename == "change_threat"
+        with pytest.raises(Permission.DoesNotExist):
+            get_permission("unknown_permission")
+
+    def test_registry_is_warmed(self, django_assert_num_queries):
+        warm_registry()
+        with django_assert_num_queries(0):
+            get_permission("view_folder")
+            Folder.get_root_folder_id()
+
+    def test_root_folder_id_is_kept_in_registry(self, django_assert_num_queries):
+        root_folder = Folder.get_root_folder()
+        with django_assert_num_queries(0):
+            assert Folder.get_root_folder_id() == root_folder.id
+
+        # another worker renames the root folder, the registry of this one is not cleared
+        Folder.objects.filter(id=root_folder.id).update(name="Renamed")
+
+        assert Folder.get_root_folder() is not root_folder
+        assert Folder.get_root_folder().name == "Renamed"
+
+    @pytest.mark.usefixtures("request_context")
+    def test_root_folder_is_loaded_once_per_request(self, django_assert_num_queries):
+        root_folder = Folder.get_root_folder()
+        with django_assert_num_queries(0):
+            assert Folder.get_root_folder() is root_folder
+
+
+@pytest.mark.django_db
+class TestRBACContext:
+    pytestmark = pytest.mark.django_db
+
+    def test_accessible_objects_are_memoized_within_a_request(
+        self, rf, django_assert_num_queries
+    ):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root_folder)
+        user = User.objects.create_user(email="user@example.com")
+        create_role_assignment(user, domain, ["view_folder", "view_threat"])
+        threat = Threat.objects.create(name="threat", folder=domain)
+        results = []
+
+        def view(request):
+            results.append(
+                RoleAssignment.get_accessible_object_ids(root_folder, user, Threat)
+            )
+            with django_assert_num_queries(0):
+                results.append(
+                    RoleAssignment.get_accessible_object_ids(root_folder, user, Threat)
+                )
+                RoleAssignment.get_accessible_objects(root_folder, user, Threat)
+            return "response"
+
+        assert RBACContextMiddleware(view)(rf.get("/")) == "response"
+        assert results[0] == results[1] == ([threat.id], [], [])
+        assert rbac_context.get() is None
+
+    def test_rbac_changes_clear_the_request_context(self):
+        root_folder = Folder.get_root_folder()
+        domain = Folder.objects.create(name="domain", parent_folder=root_folder)
+        user = User.objects.create_user(email="user@example.com")
+        threat = Threat.objects.create(name="threat", folder=domain)
+        token = rbac_context.set({})
+        try:
+            assert RoleAssignment.get_accessible_object_ids(
+                root_folder, user, Threat
+            ) == ([], [], [])
+            create_role_assignment(user, domain, ["view_folder", "view_threat"])
+            assert RoleAssignment.get_accessible_object_ids(
+                root_folder, user, Threat
+            ) == ([threat.id], [], [])
+        finally:
+            rbac_context.reset(token)
@@ -0,0 +1,209 @@
+"""
+Scalability benchmarks of the RBAC entry points
+
+A synthetic organisation is generated for each test, then every entry point is timed
+and its queries are counted, with a cold and a warm permission cache.
+The warm run is served from the RBAC context of a read-only request.
+Sizes are small by default and can be raised with the following environment variables:
+RBAC_BENCHMARK_FOLDERS, RBAC_BENCHMARK_DEPTH, RBAC_BENCHMARK_USER_GROUPS,
+RBAC_BENCHMARK_ROLE_ASSIGNMENTS, RBAC_BENCHMARK_USERS, RBAC_BENCHMARK_OBJECTS, RBAC_BENCHMARK_SEED
+Run with `pytest -s iam/tests/test_rbac_benchmark.py` to print the report.
+Query counts must not grow with the size of the organisation: the bounds below catch regressions.
+"""
+
+import os
+import random
+import time
+from dataclasses import dataclass, field
+
+import pytest
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Threat
+from iam.models import Folder, Role, RoleAssignment, User, UserGroup, rbac_context
+
+
+def env_size(name: str, default: int) -> int:
+    return int(os.environ.get(f"RBAC_BENCHMARK_{name}", default))
+
+
+@dataclass
+class Organisation:
+    folders: list = field(default_factory=list)
+    user_groups: list = field(default_factory=list)
+    users: list = field(default_factory=list)
+    role_assignments: list = field(default_factory=list)
+    objects: list = field(default_factory=list)
+
+
+def generate_organisation(
+    folders: int = 30,
+    depth: int = 3,
+    user_groups: int = 5,
+    role_assignments: int = 20,
+    users: int = 10,
+    objects: int = 100,
+    seed: int = 0,
+) -> Organisation:
+    """Generates a synthetic organisation below the root folder
+    folders are spread over depth levels, leaves of the last level may be enclaves
+    role assignments are given to users or user groups, with recursive and non-recursive perimeters
+    objects are threats spread over all folders, some of them published
+    """
+    rng = random.Random(seed)
+    root_folder = Folder.get_root_folder()
+    organisation = Organisation()
+    levels = [[root_folder]]
+    for i in range(folders):
+        level = 1 + i % depth
+        parent = rng.choice(levels[level - 1] if len(levels) >= level else levels[-1])
+        is_enclave = level == depth and rng.random() < 0.2
+        folder = Folder.objects.create(
+            name=f"folder {i}",
+            parent_folder=parent,
+            content_type=Folder.ContentType.ENCLAVE
+            if is_enclave
+            else Folder.ContentType.DOMAIN,
+        )
+        if len(levels) <= level:
+            levels.append([])
+        if not is_enclave:
+            levels[level].append(folder)
+        organisation.folders.append(folder)
+    for i in range(user_groups):
+        organisation.user_groups.append(
+            UserGroup.objects.create(
+                name=f"user group {i}", folder=rng.choice(organisation.folders)
+            )
+        )
+    for i in range(users):
+        user = User.objects.create_user(email=f"user{i}@example.com")
+        user.user_groups.set(
+            rng.sample(organisation.user_groups, min(2, len(organisation.user_groups)))
+        )
+        organisation.users.append(user)
+    roles = list(Role.objects.filter(name__in=["BI-RL-AUD", "BI-RL-ANA", "BI-RL-DMA"]))
+    for i in range(role_assignments):
+        is_group = rng.random() < 0.5
+        role_assignment = RoleAssignment.objects.create(
+            user=None if is_group else rng.choice(organisation.users),
+            user_group=rng.choice(organisation.user_groups) if is_group else None,
+            role=rng.choice(roles),
+            folder=root_folder,
+            is_recursive=rng.random() < 0.7,
+        )
+        role_assignment.perimeter_folders.set(
+            rng.sample(organisation.folders, rng.randint(1, 3))
+        )
+        organisation.role_assignments.append(role_assignment)
+    organisation.objects = Threat.objects.bulk_create(
+        Threat(
+            name=f"threat {i}",
+            folder=rng.choice(organisation.folders),
+            is_published=rng.random() < 0.3,
+        )
+        for i in range(objects)
+    )
+    return organisation
+
+
+@pytest.fixture
+def organisation():
+    return generate_organisation(
+        folders=env_size("FOLDERS", 30),
+        depth=env_size("DEPTH", 3),
+        user_groups=env_size("USER_GROUPS", 5),
+        role_assignments=env_size("ROLE_ASSIGNMENTS", 20),
+        users=env_size("USERS", 10),
+        objects=env_size("OBJECTS", 100),
+        seed=env_size("SEED", 0),
+    )
+
+
+def measure(label: str, func, max_queries: int | None = None):
+    """Runs func with a cold then a warm permission cache, prints timing and query counts
+    Fails if a query count exceeds max_queries
+    """
+    results = {}
+    token = rbac_context.set({})
+    try:
+        for state in ("cold", "warm"):
+            if state == "cold":
+                RoleAssignment.invalidate_cache()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            results[state] = len(context.captured_queries)
+            print(
+                f"{label:<32} {state:<5} {elapsed * 1000:10.2f} ms {len(context.captured_queries):6} queries"
+            )
+    finally:
+        rbac_context.reset(token)
+    if max_queries is not None:
+        assert max(results.values()) <= max_queries, (label, results)
+    return results
+
+
+@pytest.mark.django_db
+class TestRBACBenchmark:
+    pytestmark = pytest.mark.django_db
+
+    def test_get_accessible_object_ids(self, organisation):
+        root_folder = Folder.get_root_folder()
+        for user in organisation.users[:3]:
+            measure(
+                "get_accessible_object_ids",
+                lambda: RoleAssignment.get_accessible_object_ids(
+                    root_folder, user, Threat
+                ),
+                max_queries=10,
+            )
+
+    def test_is_access_allowed(self, organisation):
+        perm = Permission.objects.get(codename="view_threat")
+        for user in organisation.users[:3]:
+            measure(
+                "is_access_allowed (all folders)",
+                lambda: [
+                    RoleAssignment.is_access_allowed(user, perm, folder)
+                    for folder in organisation.folders
+                ],
+                max_queries=len(organisation.folders) + 5,
+            )
+
+    def test_get_object_permissions(self, organisation):
+        for user in organisation.users[:3]:
+            measure(
+                "get_object_permissions (x10)",
+                lambda: [
+                    RoleAssignment.get_object_permissions(user, Threat, threat.id)
+                    for threat in organisation.objects[:10]
+                ],
+                max_queries=15,
+            )
+
+    def test_get_permission_flags(self, organisation):
+        root_folder = Folder.get_root_folder()
+        ids = [threat.id for threat in organisation.objects]
+        for user in organisation.users[:3]:
+            measure(
+                "get_permission_flags",
+                lambda: RoleAssignment.get_permission_flags(
+                    root_folder, user, Threat, ids
+                ),
+                max_queries=10,
+            )
+
+    def test_get_accessible_folders(self, organisation):
+        root_folder = Folder.get_root_folder()
+        for user in organisation.users[:3]:
+            measure(
+                "get_accessible_folders",
+                lambda: RoleAssignment.get_accessible_folders(
+                    root_folder, user, Folder.ContentType.DOMAIN
+                ),
+                max_queries=6,
+            )
@@ -21,6 +21,7 @@ from core.models import (
     RiskMatrix,
     ReferenceControl,
     Threat,
+    TransitiveRequirementMapping,
 )
 from django.db import transaction
 from iam.models import Folder
@@ -641,6 +642,7 @@ class LibraryImporter:
 
         if self._requirement_mapping_set is not None:
             self._requirement_mapping_set.load(library_object)
+            TransitiveRequirementMapping.rebuild()
 
     @transaction.atomic
     def _import_library(self):
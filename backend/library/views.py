@@ -13,10 +13,10 @@ from rest_framework.parsers import FileUploadParser
 
 from django.http import HttpResponse
 
-from core.helpers import get_sorted_requirement_nodes
+from core.helpers import get_framework_tree, get_sorted_requirement_nodes
 from core.models import StoredLibrary, LoadedLibrary
 from core.views import BaseModelViewSet
-from iam.models import RoleAssignment, Folder, Permission
+from iam.models import RoleAssignment, Folder, Permission, get_permission
 from library.validators import validate_file_extension
 from .helpers import update_translations, update_translations_in_object
 from .utils import preview_library
@@ -85,7 +85,7 @@ class StoredLibraryViewSet(BaseModelViewSet):
     def destroy(self, request, *args, pk, **kwargs):
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(codename="delete_storedlibrary"),
+            perm=get_permission("delete_storedlibrary"),
             folder=Folder.get_root_folder(),
         ):
             return Response(status=HTTP_403_FORBIDDEN)
@@ -103,7 +103,7 @@ class StoredLibraryViewSet(BaseModelViewSet):
     def import_library(self, request, pk):
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(codename="add_loadedlibrary"),
+            perm=get_permission("add_loadedlibrary"),
             folder=Folder.get_root_folder(),
         ):
             return Response(status=HTTP_403_FORBIDDEN)
@@ -252,7 +252,7 @@ class LoadedLibraryViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, pk, **kwargs):
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(codename="delete_loadedlibrary"),
+            perm=get_permission("delete_loadedlibrary"),
             folder=Folder.get_root_folder(),
         ):
             return Response(status=HTTP_403_FORBIDDEN)
@@ -298,15 +298,14 @@ class LoadedLibraryViewSet(viewsets.ModelViewSet):
             )
 
         framework = lib.frameworks.first()
-        requirement_nodes = framework.requirement_nodes.all()
-        return Response(get_sorted_requirement_nodes(requirement_nodes, None, None))
+        return Response(get_framework_tree(framework))
 
     @action(detail=True, methods=["get"], url_path="update")
     def _update(self, request, pk):
         if not RoleAssignment.is_access_allowed(
             user=request.user,
-            perm=Permission.objects.get(
-                codename="add_loadedlibrary"
+            perm=get_permission(
+                "add_loadedlibrary"
             ),  # We should use either this permission or making a new permission "update_loadedlibrary"
             folder=Folder.get_root_folder(),
         ):
@@ -1,4 +1,11 @@
+import json
+
+from django.core import management
+
+from core.models import Project, RiskAssessment, RiskMatrix
+from core.tests.fixtures import risk_matrix_fixture
 from serdes.utils import *
+from tprm.models import Entity
 import pytest
 
 
@@ -10,3 +17,43 @@ def basic_folder_structure():
     Folder.objects.create(
         name="Test folder", content_type=Folder.ContentType.DOMAIN, builtin=False
     )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("risk_matrix_fixture")
+def test_restore_backup_without_denormalized_folders(tmp_path):
+    folder = Folder.objects.create(name="test folder")
+    project = Project.objects.create(name="test project", folder=folder)
+    risk_assessment = RiskAssessment.objects.create(
+        name="test risk assessment",
+        project=project,
+        risk_matrix=RiskMatrix.objects.all()[0],
+    )
+    scenario = RiskScenario.objects.create(
+        name="test scenario", risk_assessment=risk_assessment
+    )
+    entity = Entity.objects.create(name="test entity", folder=folder)
+    representative = Representative.objects.create(
+        entity=entity, email="representative@example.com"
+    )
+    solution = Solution.objects.create(name="test solution", provider_entity=entity)
+
+    # a backup taken before the folder of these objects was denormalized
+    backup = json.loads(
+        serializers.serialize("json", [scenario, representative, solution])
+    )
+    for obj in backup:
+        del obj["fields"]["folder"]
+    path = tmp_path / "backup.json"
+    path.write_text(json.dumps(backup))
+    for obj in (scenario, representative, solution):
+        obj.delete()
+
+    management.call_command("loaddata", str(path), verbosity=0)
+    assert RiskScenario.objects.get(id=scenario.id).folder_id is None
+
+    rebuild_derived_data()
+
+    assert RiskScenario.objects.get(id=scenario.id).folder_id == folder.id
+    assert Representative.objects.get(id=representative.id).folder_id == folder.id
+    assert Solution.objects.get(id=solution.id).folder_id == folder.id
@@ -5,7 +5,9 @@ from django.core import serializers
 from django.db.models import Model
 from django.db.models.deletion import Collector
 
-from iam.models import Folder
+from core.models import RiskScenario, TransitiveRequirementMapping
+from iam.models import Folder, FolderClosure
+from tprm.models import Representative, Solution
 
 
 def get_all_objects():
@@ -91,3 +93,14 @@ def restore_objects(path: str, format: str = "json"):
     for obj in objects:
         obj.save()
     return path
+
+
+def rebuild_derived_data():
+    """
+    Rebuild the data derived from the loaded objects, which is not part of a backup.
+    The denormalized folders are recomputed too, as they are missing from older backups.
+    """
+    FolderClosure.rebuild()
+    for model in (RiskScenario, Representative, Solution):
+        model.rebuild_folders()
+    TransitiveRequirementMapping.rebuild()
@@ -15,6 +15,7 @@ from rest_framework.views import APIView
 
 from ciso_assistant.settings import VERSION, SQLITE_FILE
 from serdes.serializers import LoadBackupSerializer
+from serdes.utils import rebuild_derived_data
 
 import structlog
 
@@ -44,6 +45,9 @@ class ExportBackupView(APIView):
                 "auth.permission",
                 "sessions.session",
                 "iam.ssosettings",
+                "iam.folderclosure",
+                "core.complianceassessmentsummary",
+                "core.transitiverequirementmapping",
                 "knox.authtoken",
             ],
             indent=4,
@@ -80,9 +84,13 @@ class LoadBackupView(APIView):
                     "auth.permission",
                     "sessions.session",
                     "iam.ssosettings",
+                    "iam.folderclosure",
+                    "core.complianceassessmentsummary",
+                    "core.transitiverequirementmapping",
                     "knox.authtoken",
                 ],
             )
+            rebuild_derived_data()
         except Exception as e:
             logger.error("Error while loading backup", exc_info=e)
             with open(SQLITE_FILE, "wb") as database_file:
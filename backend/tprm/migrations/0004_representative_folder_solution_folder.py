@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_entity_related_folders(apps, schema_editor):
+    Entity = apps.get_model("tprm", "Entity")
+    Representative = apps.get_model("tprm", "Representative")
+    Solution = apps.get_model("tprm", "Solution")
+    Representative.objects.update(
+        folder_id=Subquery(
+            Entity.objects.filter(id=OuterRef("entity_id")).values("folder_id")[:1]
+        )
+    )
+    Solution.objects.update(
+        folder_id=Subquery(
+            Entity.objects.filter(id=OuterRef("provider_entity_id")).values(
+                "folder_id"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("iam", "0009_folderclosure"),
+        ("tprm", "0003_entityassessment_representatives"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="representative",
+            name="folder",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="%(class)s_folder",
+                to="iam.folder",
+                verbose_name="Folder",
+            ),
+        ),
+        migrations.AddField(
+            model_name="solution",
+            name="folder",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="%(class)s_folder",
+                to="iam.folder",
+                verbose_name="Folder",
+            ),
+        ),
+        migrations.RunPython(set_entity_related_folders, migrations.RunPython.noop),
+    ]
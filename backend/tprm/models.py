@@ -2,7 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from core.base_models import NameDescriptionMixin, AbstractBaseModel
 from core.models import Assessment, ComplianceAssessment, Evidence
-from iam.models import Folder, FolderMixin, PublishInRootFolderMixin
+from iam.models import Folder, FolderMixin, FolderPathMixin, PublishInRootFolderMixin
 from iam.views import User
 
 
@@ -27,6 +27,11 @@ class Entity(NameDescriptionMixin, FolderMixin, PublishInRootFolderMixin):
         verbose_name = _("Entity")
         verbose_name_plural = _("Entities")
 
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        self.representatives.exclude(folder=self.folder).update(folder=self.folder)
+        self.provided_solutions.exclude(folder=self.folder).update(folder=self.folder)
+
     @classmethod
     def get_main_entity(cls):
         return (
@@ -84,7 +89,7 @@ class EntityAssessment(Assessment):
         verbose_name_plural = _("Entity assessments")
 
 
-class Representative(AbstractBaseModel):
+class Representative(AbstractBaseModel, FolderPathMixin):
     """
     This represents a person that is linked to an entity (typically an employee),
     and that is relevant for the main entity, like a contact person for an assessment
@@ -105,9 +110,14 @@ class Representative(AbstractBaseModel):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
     fields_to_check = ["email"]
+    folder_path = "entity__folder"
+
+    def save(self, *args, **kwargs) -> None:
+        self.folder_id = self.entity.folder_id
+        super().save(*args, **kwargs)
 
 
-class Solution(NameDescriptionMixin):
+class Solution(NameDescriptionMixin, FolderPathMixin):
     """
     A solution represents a product or service that is offered by an entity
     """
@@ -130,7 +140,12 @@ class Solution(NameDescriptionMixin):
     criticality = models.IntegerField(default=0, verbose_name=_("Criticality"))
 
     fields_to_check = ["name"]
+    folder_path = "provider_entity__folder"
 
     class Meta:
         verbose_name = _("Solution")
         verbose_name_plural = _("Solutions")
+
+    def save(self, *args, **kwargs) -> None:
+        self.folder_id = self.provider_entity.folder_id
+        super().save(*args, **kwargs)
@@ -162,6 +162,7 @@ class EntityAssessmentWriteSerializer(BaseModelSerializer):
 
 
 class RepresentativeReadSerializer(BaseModelSerializer):
+    folder = FieldsRelatedField()
     entity = FieldsRelatedField()
     user = FieldsRelatedField()
 
@@ -230,6 +231,7 @@ class RepresentativeWriteSerializer(BaseModelSerializer):
 
 
 class SolutionReadSerializer(BaseModelSerializer):
+    folder = FieldsRelatedField()
     provider_entity = FieldsRelatedField()
     recipient_entity = FieldsRelatedField()
 
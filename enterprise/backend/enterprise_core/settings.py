@@ -168,6 +168,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_structlog.middlewares.RequestMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "iam.middleware.RBACContextMiddleware",
 ]
 
 ROOT_URLCONF = "ciso_assistant.urls"
@@ -353,6 +354,27 @@ else:
 
 logger.info("DATABASE ENGINE: %s", DATABASES["default"]["ENGINE"])
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/ref/settings/#caches
+
+# The default cache is local to each worker process.
+# Compiled RBAC permissions are only kept across requests in the "rbac" cache, which must be
+# shared by all workers (e.g. django.core.cache.backends.redis.RedisCache or
+# django.core.cache.backends.db.DatabaseCache): an RBAC change invalidates them in that cache
+# only, so a per-process cache would keep serving revoked permissions in the other workers.
+# Without a shared "rbac" cache, permissions are compiled once per request.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+if "RBAC_CACHE_BACKEND" in os.environ:
+    CACHES["rbac"] = {
+        "BACKEND": os.environ["RBAC_CACHE_BACKEND"],
+        "LOCATION": os.environ.get("RBAC_CACHE_LOCATION", ""),
+    }
+RBAC_CACHE_TTL = int(os.environ.get("RBAC_CACHE_TTL", default=30))  # seconds
+
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",